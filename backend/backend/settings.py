@@ -21,6 +21,38 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Dónde se guardan los archivos subidos: 'local' (MEDIA_ROOT) o 's3' (cualquier
+# servicio compatible con S3, p. ej. MinIO en desarrollo; usa django-storages)
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'local')
+
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if MEDIA_STORAGE == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.environ.get('MEDIA_S3_BUCKET', 'carwash-media'),
+            'endpoint_url': os.environ.get('MEDIA_S3_ENDPOINT_URL') or None,
+            'access_key': os.environ.get('MEDIA_S3_ACCESS_KEY'),
+            'secret_key': os.environ.get('MEDIA_S3_SECRET_KEY'),
+            'region_name': os.environ.get('MEDIA_S3_REGION') or None,
+            'file_overwrite': False,
+            # URLs firmadas, el bucket no tiene que ser público
+            'querystring_auth': True,
+        },
+    }
+
+# Con almacenamiento local, quién envía los bytes de /media/ (services/media.py):
+# 'nginx' (X-Accel-Redirect a MEDIA_ACCEL_PREFIX, una location internal que apunta
+# a MEDIA_ROOT), 'apache' (X-Sendfile) o '' para que los sirva Django (desarrollo)
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Las subidas se escriben a disco en bloques a medida que llegan, nunca enteras en memoria
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -56,6 +88,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'services.tenant.TenantMiddleware',
+    'services.replicas.ReplicasMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -84,12 +118,120 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgresql usa PostgreSQL con DB_NAME, DB_USER, DB_PASSWORD, DB_HOST y
+# DB_PORT; DB_REPLICAS son los hosts de las réplicas de lectura separados por comas
+# (con SQLite, rutas de archivos copia de la primaria, para probar el router).
+# Las conexiones se reutilizan DB_CONN_MAX_AGE segundos; detrás de PgBouncer en
+# modo transacción poner DB_PGBOUNCER=1 (sin cursores del lado del servidor).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_REPLICAS = [replica.strip() for replica in os.environ.get('DB_REPLICAS', '').split(',') if replica.strip()]
+
+# SQLite para varios workers en un solo nodo (services/sqlite_concurrente): WAL,
+# synchronous=NORMAL, BEGIN IMMEDIATE en las transacciones y estos PRAGMAs por
+# conexión: bytes mapeados en memoria, cache de páginas (negativo = KiB) y
+# milisegundos que se espera un lock antes de "database is locked".
+# Comparar con `manage.py benchmark_sqlite`.
+SQLITE_ALTA_CONCURRENCIA = os.environ.get('SQLITE_ALTA_CONCURRENCIA') == '1'
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE = -64 * 1024
+SQLITE_BUSY_TIMEOUT = 5000
+
+if DB_ENGINE == 'postgresql':
+    _primaria = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'carwash'),
+        'USER': os.environ.get('DB_USER', 'carwash'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+        'OPTIONS': {'connect_timeout': 5},
     }
-}
+    _replicas = [{**_primaria, 'HOST': host} for host in DB_REPLICAS]
+else:
+    _primaria = {
+        'ENGINE': 'services.sqlite_concurrente' if SQLITE_ALTA_CONCURRENCIA else 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+    }
+    _replicas = [{**_primaria, 'NAME': ruta} for ruta in DB_REPLICAS]
+
+DATABASES = {'default': _primaria}
+for _numero, _replica in enumerate(_replicas, start=1):
+    # En los tests las réplicas apuntan a la base de prueba de la primaria
+    DATABASES[f'replica{_numero}'] = {**_replica, 'TEST': {'MIRROR': 'default'}}
+
+# Las vistas con @leer_de_replica (services/replicas.py) leen de las réplicas; quien
+# escribió lee de la primaria los siguientes REPLICAS_PIN_SEGUNDOS. El pin se guarda
+# en el cache: con varios procesos hace falta CACHE_URL para que lo vean todos
+DATABASE_ROUTERS = ['services.replicas.RouterReplicas']
+REPLICAS_PIN_SEGUNDOS = 5
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# CACHE_URL (redis://host:6379/1) usa Redis, compartido por todos los procesos y
+# servidores: el cache de respuestas, los tokens y el pin de las réplicas se
+# invalidan en todos. Sin CACHE_URL cada proceso tiene su propio cache en memoria
+# e invalida solo su copia, lo que solo sirve con un único proceso.
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+            'KEY_PREFIX': 'carwash',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'carwash',
+        }
+    }
+
+# Segundos que se guardan las respuestas de lectura (services/cache.py)
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Máximo de carros por lote en /carros/bulk/ y /carros/bulk-estado/ (services/lotes.py)
+CARROS_BULK_MAX = 500
+
+# Fotos de los carros (services/imagenes.py): tamaño máximo de subida, lado máximo
+# en px de la foto re-codificada y de cada miniatura WebP, e hilos que las procesan
+CARRO_FOTO_MAX_BYTES = 10 * 1024 * 1024
+CARRO_FOTO_LADO_MAX = 2048
+CARRO_FOTO_MINIATURAS = [128, 512]
+CARRO_FOTO_WORKERS = 2
+
+
+# Cola de lavado (services/cola.py): duración en segundos que se asume sin
+# historial, máxima que cuenta como muestra, muestras necesarias para usar el
+# promedio de un precio y días de historial que se leen al reconstruir la cola
+COLA_DURACION_DEFECTO = 30 * 60
+COLA_DURACION_MAX = 6 * 60 * 60
+COLA_MIN_MUESTRAS = 3
+COLA_HISTORIAL_DIAS = 90
+
+# Búsqueda de texto en carros y reclamos (services/busqueda.py). Vacío elige según
+# la base de datos: FTS5 en SQLite, tsvector + GIN en Postgres
+BUSQUEDA_BACKEND = os.environ.get('BUSQUEDA_BACKEND', '')
+
+# Eventos en tiempo real de los carros (services/tiempo_real.py). El broker en
+# memoria solo sirve con un único proceso ASGI; con varios, usar
+# 'services.tiempo_real.BrokerRedis' (pub/sub en CARROS_EVENTOS_REDIS_URL)
+CARROS_EVENTOS_BROKER = os.environ.get('CARROS_EVENTOS_BROKER', 'services.tiempo_real.BrokerLocal')
+CARROS_EVENTOS_REDIS_URL = os.environ.get('CARROS_EVENTOS_REDIS_URL', 'redis://localhost:6379/0')
+# Segundos entre pings, duración máxima de una conexión y eventos pendientes por cliente
+CARROS_EVENTOS_PING = 15
+CARROS_EVENTOS_DURACION_MAX = 300
+CARROS_EVENTOS_COLA = 100
+# Segundos de validez del ticket con el que el navegador abre el stream
+CARROS_EVENTOS_TICKET_TTL = 60
 
 
 # Password validation
@@ -138,15 +280,59 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'services.autenticacion.CachedTokenAuthentication',
     ],
 }
 
+# Tokens de la API (services/autenticacion.py): segundos de validez desde que se
+# emiten (0 = sin vencimiento; login entrega uno nuevo cuando vence), segundos en
+# el cache compartido, y tamaño y TTL del LRU en memoria de cada proceso. El TTL
+# del LRU es lo que tarda otro proceso en enterarse de un logout o de una rotación.
+AUTH_TOKEN_TTL = int(os.environ.get('AUTH_TOKEN_TTL', 7 * 24 * 60 * 60))
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+AUTH_TOKEN_LRU_SIZE = 10000
+AUTH_TOKEN_LRU_TTL = 30
+
+# Modo de tokens: 'db' (rest_framework.authtoken) o 'firmado': tokens de acceso
+# firmados con SECRET_KEY que se validan sin consultas, de AUTH_ACCESO_TTL
+# segundos, más un token de refresco guardado en la base de datos que dura
+# AUTH_REFRESCO_TTL. Cada proceso relee las sesiones revocadas cada
+# AUTH_REVOCADOS_REFRESCO segundos. Los tokens del otro modo se siguen aceptando.
+AUTH_TOKEN_MODO = os.environ.get('AUTH_TOKEN_MODO', 'db')
+AUTH_ACCESO_TTL = 5 * 60
+AUTH_REFRESCO_TTL = 30 * 24 * 60 * 60
+AUTH_REVOCADOS_REFRESCO = 5
+
+
+# Analítica global del administrador (services/analitica.py): antigüedad en
+# segundos tras la cual los resúmenes se recalculan en segundo plano
+PLATFORM_STATS_MAX_AGE = 900
 
 # Culqi settings
 CULQI_PUBLIC_KEY = 'pk_test_d65c942d87301cc5'
 CULQI_PRIVATE_KEY = 'sk_test_3abafd6f33c55c03'
 
+# Cliente HTTP compartido (services/culqi_gateway.py). CULQI_API_BASE_URL se
+# puede apuntar a un servidor falso local para pruebas. Las vistas async reutilizan
+# las conexiones solo bajo ASGI; con WSGI abren y cierran un cliente por request.
+CULQI_API_BASE_URL = 'https://api.culqi.com/v2'
+CULQI_TIMEOUT = (3.05, 15)  # (conexión, lectura) en segundos
+CULQI_MAX_RETRIES = 2  # solo GET/DELETE
+CULQI_CIRCUIT_BREAKER = {
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+# Los planes se leen de la tabla Plan (services/planes.py)
+CULQI_PLANS_CACHE_TIMEOUT = 300  # segundos en cache de la lista de planes
+CULQI_PLANS_MAX_AGE = 3600  # antigüedad tras la cual se refrescan en segundo plano
+
+# Credenciales (Basic auth) configuradas en el webhook del panel de Culqi.
+# Si están vacías el webhook rechaza todos los eventos.
+CULQI_WEBHOOK_USERNAME = os.environ.get('CULQI_WEBHOOK_USERNAME', '')
+CULQI_WEBHOOK_PASSWORD = os.environ.get('CULQI_WEBHOOK_PASSWORD', '')
+CULQI_EVENTS_BATCH_SIZE = 500  # eventos aplicados por lote (manage.py process_culqi_events)
+
 CULQI_PLANS = {
     'plan-mensual-15': 'plan-mensual-15',
     'plan-mensual-10': 'plan-mensual-10',
@@ -17,14 +17,18 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from services.media import servir_media
 from . import views
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    re_path(r'^%s(?P<ruta>.+)$' % settings.MEDIA_URL.lstrip('/'), servir_media),
     path('api/', include('services.urls')),
     re_path('signup', views.signup),
     re_path('login', views.login),
+    re_path('logout', views.logout),
+    re_path('rotate_token', views.rotate_token),
+    re_path('refresh_token', views.refresh_token),
     re_path('test_token', views.test_token),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+]
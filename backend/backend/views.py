@@ -1,16 +1,33 @@
 from rest_framework.decorators import api_view, authentication_classes, permission_classes
-from rest_framework.authentication import SessionAuthentication, TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 
+from services.autenticacion import (
+    CachedTokenAuthentication, cerrar_sesion, iniciar_sesion, refrescar, rotar_token, token_vigente, vencimiento,
+    vencimiento_acceso,
+)
+
 from .serializers import UserSerializer
 
+def _credenciales(user):
+    # Según AUTH_TOKEN_MODO: token de la base de datos, o de acceso firmado más el de refresco
+    if settings.AUTH_TOKEN_MODO == 'firmado':
+        acceso, refresco = iniciar_sesion(user)
+        return {'token': acceso, 'refresh': refresco, 'expires': vencimiento_acceso()}
+    token = token_vigente(user)
+    return {'token': token.key, 'expires': vencimiento(token)}
+
+
 @api_view(['POST'])
+@authentication_classes([])
 def signup(request):
     serializer = UserSerializer(data=request.data)
     if serializer.is_valid():
@@ -18,27 +35,56 @@ def signup(request):
         user = User.objects.get(username=request.data['username'])
         user.set_password(request.data['password'])
         user.save()
-        token = Token.objects.create(user=user)
         user_data = serializer.data
         user_data['is_staff'] = user.is_staff
         user_data['is_superuser'] = user.is_superuser
-        return Response({'token': token.key, 'user': user_data})
+        return Response({**_credenciales(user), 'user': user_data})
     return Response(serializer.errors, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
+@authentication_classes([])
 def login(request):
     user = get_object_or_404(User, username=request.data['username'])
     if not user.check_password(request.data['password']):
         return Response("missing user", status=status.HTTP_404_NOT_FOUND)
-    token, created = Token.objects.get_or_create(user=user)
     serializer = UserSerializer(user)
     user_data = serializer.data
     user_data['is_staff'] = user.is_staff
     user_data['is_superuser'] = user.is_superuser
-    return Response({'token': token.key, 'user': user_data})
+    return Response({**_credenciales(user), 'user': user_data})
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def logout(request):
+    if isinstance(request.auth, dict):
+        # Token firmado: se revoca su sesión
+        cerrar_sesion(request.auth['r'])
+    else:
+        # post_delete del token lo saca de los caches de autenticación
+        Token.objects.filter(user=request.user).delete()
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def rotate_token(request):
+    if isinstance(request.auth, dict):
+        return Response({'error': 'Los tokens firmados se renuevan con /refresh_token'}, status=status.HTTP_400_BAD_REQUEST)
+    token = rotar_token(request.user)
+    return Response({'token': token.key, 'expires': vencimiento(token)})
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def refresh_token(request):
+    # Sin autenticación: el token de acceso ya puede estar vencido
+    try:
+        acceso, refresco = refrescar(request.data.get('refresh'))
+    except AuthenticationFailed as e:
+        return Response({'error': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({'token': acceso, 'refresh': refresco, 'expires': vencimiento_acceso()})
 
 @api_view(['GET'])
-@authentication_classes([SessionAuthentication, TokenAuthentication])
+@authentication_classes([SessionAuthentication, CachedTokenAuthentication])
 @permission_classes([IsAuthenticated])
 def test_token(request):
     return Response("passed!")
\ No newline at end of file
@@ -0,0 +1,160 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import (
+    Carro, Empresa, EmpresaDailyStats, Plan, PlataformaDailyStats, PlataformaResumen, Reclamo, Subscription,
+)
+
+logger = logging.getLogger(__name__)
+
+REFRESCO_LOCK_KEY = 'plataforma-stats:refreshing'
+
+# Estado de Subscription que se cuenta como activa (según culqi 1=activo)
+SUSCRIPCION_ACTIVA = 1
+
+
+def refrescar_estadisticas_plataforma(batch_size=1000):
+    """
+    Recalcula PlataformaDailyStats agregando EmpresaDailyStats (O(empresas x días)
+    filas, nunca Carro) y genera un PlataformaResumen nuevo. Devuelve el resumen.
+    """
+    filas = (
+        EmpresaDailyStats.objects.filter(cantidad__gt=0)
+        .values('fecha', 'estado')
+        .order_by()
+        .annotate(total=Sum('cantidad'), total_ingresos=Sum('ingresos'), total_empresas=Count('empresa', distinct=True))
+    )
+    suscripciones = (
+        Subscription.objects.filter(status=SUSCRIPCION_ACTIVA)
+        .values_list('plan_id')
+        .order_by()
+        .annotate(total=Count('id'))
+    )
+    reclamos = Reclamo.objects.values_list('estado').order_by().annotate(total=Count('id'))
+
+    with transaction.atomic():
+        PlataformaDailyStats.objects.all().delete()
+        PlataformaDailyStats.objects.bulk_create(
+            (
+                PlataformaDailyStats(
+                    fecha=fila['fecha'], estado=fila['estado'], cantidad=fila['total'],
+                    ingresos=fila['total_ingresos'] or 0, empresas=fila['total_empresas'],
+                )
+                for fila in filas
+            ),
+            batch_size=batch_size,
+        )
+        resumen = PlataformaResumen.objects.create(
+            empresas=Empresa.objects.count(),
+            usuarios=get_user_model().objects.count(),
+            suscripciones_por_plan=dict(suscripciones),
+            reclamos_por_estado=dict(reclamos),
+            reclamo_pendiente_mas_antiguo=Reclamo.objects.filter(estado='pendiente').aggregate(fecha=Min('fecha'))['fecha'],
+        )
+        PlataformaResumen.objects.exclude(pk=resumen.pk).delete()
+    logger.info("Estadísticas de la plataforma recalculadas")
+    return resumen
+
+
+def _refrescar():
+    try:
+        refrescar_estadisticas_plataforma()
+    except Exception as e:
+        logger.error(f"No se pudieron recalcular las estadísticas de la plataforma: {e}")
+    finally:
+        cache.delete(REFRESCO_LOCK_KEY)
+        close_old_connections()
+
+
+def refrescar_en_segundo_plano():
+    # cache.add actúa como lock para no lanzar varios recálculos a la vez
+    if cache.add(REFRESCO_LOCK_KEY, True, timeout=300):
+        threading.Thread(target=_refrescar, daemon=True).start()
+
+
+def obtener_resumen():
+    """
+    Último PlataformaResumen. Solo se calcula en línea si todavía no existe; si
+    está desactualizado se devuelve igual y se recalcula en segundo plano.
+    """
+    resumen = PlataformaResumen.objects.order_by('-generado_en').first()
+    if resumen is None:
+        return refrescar_estadisticas_plataforma()
+    if (timezone.now() - resumen.generado_en).total_seconds() > settings.PLATFORM_STATS_MAX_AGE:
+        refrescar_en_segundo_plano()
+    return resumen
+
+
+def analitica_plataforma(desde=None, hasta=None):
+    """
+    Totales globales para el panel de administración, leídos de los resúmenes.
+    `desde`/`hasta` acotan las series de ingresos (por defecto, los últimos 30 días
+    para la serie diaria y los últimos 12 meses para la mensual).
+    """
+    resumen = obtener_resumen()
+    hoy = timezone.localdate()
+    estados = [estado for estado, _ in Carro.ESTADO_CHOICES]
+    terminado = Q(estado='terminado')
+
+    totales = PlataformaDailyStats.objects.aggregate(
+        total=Sum('cantidad'),
+        total_ingresos=Sum('ingresos', filter=terminado),
+        **{f'estado_{estado}': Sum('cantidad', filter=Q(estado=estado)) for estado in estados},
+    )
+
+    def serie(filas, campo):
+        filas = (
+            filas.values(campo)
+            .order_by(campo)
+            .annotate(total=Sum('cantidad'), terminados=Sum('cantidad', filter=terminado),
+                      total_ingresos=Sum('ingresos', filter=terminado))
+        )
+        return [
+            {
+                campo: fila[campo],
+                'carros': fila['total'],
+                'carros_terminados': fila['terminados'] or 0,
+                'ingresos': float(fila['total_ingresos'] or 0),
+            }
+            for fila in filas
+        ]
+
+    diario = PlataformaDailyStats.objects.filter(fecha__gte=desde or hoy - timedelta(days=30))
+    mensual = PlataformaDailyStats.objects.filter(fecha__gte=desde or (hoy - timedelta(days=365)).replace(day=1))
+    if hasta:
+        diario = diario.filter(fecha__lte=hasta)
+        mensual = mensual.filter(fecha__lte=hasta)
+
+    planes = dict(
+        Plan.objects.filter(culqi_id__in=resumen.suscripciones_por_plan).values_list('culqi_id', 'name')
+    )
+    reclamos = {estado: resumen.reclamos_por_estado.get(estado, 0) for estado, _ in Reclamo.ESTADO_CHOICES}
+
+    return {
+        'generado_en': resumen.generado_en,
+        'empresas': resumen.empresas,
+        'usuarios': resumen.usuarios,
+        'carros_registrados': totales['total'] or 0,
+        'carros_por_estado': {estado: totales[f'estado_{estado}'] or 0 for estado in estados},
+        'ingresos_totales': float(totales['total_ingresos'] or 0),
+        'ingresos_por_dia': serie(diario, 'fecha'),
+        'ingresos_por_mes': serie(mensual.annotate(mes=TruncMonth('fecha')), 'mes'),
+        'suscripciones_activas_por_plan': [
+            {'plan_id': plan_id, 'nombre': planes.get(plan_id, ''), 'cantidad': cantidad}
+            for plan_id, cantidad in sorted(resumen.suscripciones_por_plan.items(), key=lambda item: -item[1])
+        ],
+        'reclamos': {
+            'por_estado': reclamos,
+            'pendientes': reclamos['pendiente'],
+            'pendiente_mas_antiguo': resumen.reclamo_pendiente_mas_antiguo,
+        },
+    }
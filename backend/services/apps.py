@@ -5,3 +5,5 @@ class ServicesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'services'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,320 @@
+import copy
+import datetime
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .models import Empresa, TokenRefresco
+
+# Token -> usuario en dos niveles: un LRU en memoria de cada proceso con un TTL
+# corto (un acierto es una búsqueda en un dict, sin consultas) y el cache
+# compartido de Django; solo si no está en ninguno se consulta la base de datos.
+# Al cerrar sesión, rotar el token o cambiar la clave se borra de los dos; los
+# LRU de otros procesos lo siguen aceptando como mucho AUTH_TOKEN_LRU_TTL segundos.
+#
+# Con AUTH_TOKEN_MODO = 'firmado' login entrega en cambio un token de acceso
+# firmado (HMAC con SECRET_KEY) con el usuario, is_staff, la empresa y la sesión,
+# que se valida sin consultas, y un token de refresco guardado en TokenRefresco.
+
+
+class LRUConTTL:
+    """Diccionario acotado a `maximo` entradas que descarta la menos usada y las que pasaron `ttl` segundos."""
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (valor, vence)
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            if entrada[1] <= time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return entrada[0]
+
+    def set(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+
+    def delete(self, clave):
+        with self._lock:
+            self._datos.pop(clave, None)
+
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+
+
+_tokens = LRUConTTL(settings.AUTH_TOKEN_LRU_SIZE, settings.AUTH_TOKEN_LRU_TTL)
+
+
+def _clave_compartida(key):
+    # El token no se usa tal cual como clave para que no aparezca al listar el cache
+    return 'auth-token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def _cargar(key):
+    """Token (con su usuario) del cache compartido o de la base de datos; None si no existe."""
+    clave = _clave_compartida(key)
+    token = cache.get(clave)
+    if token is None:
+        token = Token.objects.select_related('user').filter(key=key).first()
+        if token is None:
+            return None
+        cache.set(clave, token, timeout=settings.AUTH_TOKEN_CACHE_TIMEOUT)
+    _tokens.set(key, token)
+    return token
+
+
+def vencimiento(token):
+    if not settings.AUTH_TOKEN_TTL:
+        return None
+    return token.created + datetime.timedelta(seconds=settings.AUTH_TOKEN_TTL)
+
+
+def token_vencido(token):
+    fin = vencimiento(token)
+    return fin is not None and fin <= timezone.now()
+
+
+def _validar(token):
+    if token is None:
+        raise exceptions.AuthenticationFailed('Token inválido.')
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed('Usuario inactivo o eliminado.')
+    if token_vencido(token):
+        raise exceptions.AuthenticationFailed('Token expirado, vuelve a iniciar sesión.')
+    # Cada request recibe su copia: el usuario cacheado se comparte entre hilos
+    return copy.copy(token.user), token
+
+
+# Tokens de acceso firmados
+
+SAL_ACCESO = 'services.autenticacion.acceso'
+
+
+def es_firmado(key):
+    # Los tokens de la base de datos son hexadecimales; los firmados llevan "payload:fecha:firma"
+    return ':' in key
+
+
+def emitir_acceso(user, sesion_id):
+    """
+    Token de acceso de la sesión: u (usuario), s (is_staff), e (empresa o None),
+    r (sesión) e i (emitido, timestamp).
+    """
+    empresa_id = Empresa.objects.filter(usuario=user).values_list('id', flat=True).first()
+    datos = {'u': user.pk, 's': user.is_staff, 'e': empresa_id, 'r': sesion_id, 'i': time.time()}
+    return signing.dumps(datos, salt=SAL_ACCESO, compress=False)
+
+
+def vencimiento_acceso():
+    return timezone.now() + datetime.timedelta(seconds=settings.AUTH_ACCESO_TTL)
+
+
+def leer_acceso(key):
+    try:
+        return signing.loads(key, salt=SAL_ACCESO, max_age=settings.AUTH_ACCESO_TTL)
+    except signing.SignatureExpired:
+        raise exceptions.AuthenticationFailed('Token expirado, vuelve a iniciar sesión.')
+    except signing.BadSignature:
+        raise exceptions.AuthenticationFailed('Token inválido.')
+
+
+class Revocados:
+    """
+    Sesiones invalidadas hace menos de AUTH_ACCESO_TTL segundos (los tokens de
+    acceso más viejos ya vencieron solos): {sesión: timestamp}. Los tokens de la
+    sesión emitidos antes de ese momento se rechazan.
+    """
+
+    def __init__(self):
+        self.sesiones = {}
+        self.leido = None  # time.monotonic() de la última lectura
+        self._lock = threading.Lock()
+
+    def al_dia(self):
+        return self.leido is not None and time.monotonic() - self.leido < settings.AUTH_REVOCADOS_REFRESCO
+
+    def recargar(self):
+        # Solo un hilo consulta; los demás siguen con la lista anterior salvo la primera vez
+        if not self._lock.acquire(blocking=self.leido is None):
+            return
+        try:
+            if self.al_dia():
+                return
+            desde = timezone.now() - datetime.timedelta(seconds=settings.AUTH_ACCESO_TTL)
+            filas = TokenRefresco.objects.filter(invalido_antes__gte=desde).values_list('id', 'invalido_antes')
+            self.sesiones = {sesion: fecha.timestamp() for sesion, fecha in filas}
+            self.leido = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def agregar(self, sesiones, timestamp):
+        self.sesiones = {**self.sesiones, **{sesion: timestamp for sesion in sesiones}}
+
+    def invalidado(self, datos):
+        return datos['i'] < self.sesiones.get(datos['r'], 0)
+
+
+_revocados = Revocados()
+
+
+def _validar_acceso(datos):
+    if _revocados.invalidado(datos):
+        raise exceptions.AuthenticationFailed('Sesión cerrada, vuelve a iniciar sesión.')
+    # Usuario sin consultar la base de datos: los demás campos se cargan si algo los lee
+    user = User.from_db(None, ['id', 'is_staff', 'is_active'], [datos['u'], datos['s'], True])
+    return user, datos
+
+
+def autenticar_token(key):
+    """
+    (usuario, token) de `key` o AuthenticationFailed si no existe, venció o el
+    usuario está inactivo. Con un token firmado, el "token" son sus datos (dict).
+    """
+    if es_firmado(key):
+        datos = leer_acceso(key)
+        if not _revocados.al_dia():
+            _revocados.recargar()
+        return _validar_acceso(datos)
+    return _validar(_tokens.get(key) or _cargar(key))
+
+
+async def aautenticar_token(key):
+    if es_firmado(key):
+        datos = leer_acceso(key)
+        if not _revocados.al_dia():
+            await sync_to_async(_revocados.recargar)()
+        return _validar_acceso(datos)
+    token = _tokens.get(key)
+    if token is None:
+        token = await sync_to_async(_cargar)(key)
+    return _validar(token)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication ("Authorization: Token <key>") que resuelve los tokens de
+    la base de datos con el cache de este módulo y acepta los de acceso firmados.
+    """
+
+    def authenticate_credentials(self, key):
+        return autenticar_token(key)
+
+
+# Invalidación
+
+def _invalidar(key):
+    _tokens.delete(key)
+    cache.delete(_clave_compartida(key))
+
+
+def invalidar_token(key):
+    """Borra el token de los caches; después del commit, para que no se vuelva a leer la fila vieja."""
+    _invalidar(key)
+    transaction.on_commit(lambda: _invalidar(key))
+
+
+def invalidar_usuario(user_id):
+    # El usuario va dentro del token cacheado (is_active, is_staff...)
+    for key in Token.objects.filter(user_id=user_id).values_list('key', flat=True):
+        invalidar_token(key)
+
+
+# Emisión
+
+def rotar_token(user):
+    """Reemplaza el token del usuario por uno nuevo; el anterior deja de valer en todos los procesos."""
+    with transaction.atomic():
+        # delete() dispara post_delete, que invalida la clave vieja en los caches
+        Token.objects.filter(user=user).delete()
+        return Token.objects.create(user=user)
+
+
+def token_vigente(user):
+    """Token actual del usuario, o uno nuevo si no tenía o el suyo venció."""
+    token = Token.objects.filter(user=user).first()
+    if token is None or token_vencido(token):
+        return rotar_token(user)
+    return token
+
+
+# Sesiones del modo firmado
+
+def _hash(refresco):
+    return hashlib.sha256(refresco.encode('utf-8')).hexdigest()
+
+
+def iniciar_sesion(user):
+    """Crea una sesión y devuelve (token de acceso, token de refresco)."""
+    refresco = secrets.token_urlsafe(32)
+    sesion = TokenRefresco.objects.create(
+        usuario=user,
+        clave=_hash(refresco),
+        vence=timezone.now() + datetime.timedelta(seconds=settings.AUTH_REFRESCO_TTL),
+    )
+    return emitir_acceso(user, sesion.pk), refresco
+
+
+def refrescar(refresco):
+    """Token de acceso nuevo para la sesión de `refresco`, que se reemplaza por otro: (acceso, refresco)."""
+    sesion = (
+        TokenRefresco.objects.select_related('usuario')
+        .filter(clave=_hash(refresco or ''), revocado__isnull=True, vence__gt=timezone.now())
+        .first()
+    )
+    if sesion is None or not sesion.usuario.is_active:
+        raise exceptions.AuthenticationFailed('Token de refresco inválido o vencido.')
+    nuevo = secrets.token_urlsafe(32)
+    # Si dos pedidos usan el mismo refresco a la vez, solo uno lo cambia
+    if not TokenRefresco.objects.filter(pk=sesion.pk, clave=sesion.clave).update(clave=_hash(nuevo)):
+        raise exceptions.AuthenticationFailed('Token de refresco inválido o vencido.')
+    return emitir_acceso(sesion.usuario, sesion.pk), nuevo
+
+
+def invalidar_accesos(sesiones, revocar=False):
+    """
+    Rechaza los tokens de acceso ya emitidos de `sesiones` (queryset de
+    TokenRefresco); con `revocar` tampoco se pueden refrescar. Sin `revocar`
+    el cliente refresca y recibe los datos nuevos (is_staff, empresa).
+    """
+    ahora = timezone.now()
+    ids = list(sesiones.filter(revocado__isnull=True).values_list('id', flat=True))
+    if not ids:
+        return
+    cambios = {'invalido_antes': ahora}
+    if revocar:
+        cambios['revocado'] = ahora
+    TokenRefresco.objects.filter(id__in=ids).update(**cambios)
+    # Este proceso se entera enseguida; los demás en su próxima lectura
+    transaction.on_commit(lambda: _revocados.agregar(ids, ahora.timestamp()))
+
+
+def cerrar_sesion(sesion_id):
+    invalidar_accesos(TokenRefresco.objects.filter(pk=sesion_id), revocar=True)
+
+
+def invalidar_accesos_usuario(user_id, revocar=False):
+    invalidar_accesos(TokenRefresco.objects.filter(usuario_id=user_id), revocar=revocar)
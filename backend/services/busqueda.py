@@ -0,0 +1,151 @@
+import re
+
+from django.conf import settings
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Campos indexados por modelo y configuración de texto de Postgres (con 'simple'
+# no se aplica stemming, mejor para placas, marcas y teléfonos)
+INDICES = {
+    'carro': {'tabla': 'services_carro', 'campos': ['placa', 'marca', 'modelo', 'color', 'numero_telefono'], 'config': 'simple'},
+    'reclamo': {'tabla': 'services_reclamo', 'campos': ['nombre', 'email', 'mensaje'], 'config': 'spanish'},
+}
+
+MAX_TERMINOS = 10
+
+
+def terminos(texto):
+    """Palabras de la búsqueda; se descarta la sintaxis para que nunca sea una consulta inválida."""
+    return re.findall(r'\w+', (texto or '').lower())[:MAX_TERMINOS]
+
+
+def _indice(queryset):
+    return INDICES[queryset.model._meta.model_name]
+
+
+class BusquedaSQLite:
+    """
+    Tabla virtual FTS5 por modelo (busqueda_<modelo>) con contenido externo: los
+    triggers de la tabla del modelo la actualizan en cada INSERT, UPDATE o DELETE,
+    también los de bulk_create/bulk_update. Ordena por bm25.
+    """
+
+    def instalar(self, connection):
+        with connection.cursor() as cursor:
+            for nombre, indice in INDICES.items():
+                fts, tabla, campos = f'busqueda_{nombre}', indice['tabla'], indice['campos']
+                columnas = ', '.join(campos)
+                nuevos = ', '.join(f'new.{campo}' for campo in campos)
+                viejos = ', '.join(f'old.{campo}' for campo in campos)
+                borrar = f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos});"
+                insertar = f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevos});"
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columnas}, content='{tabla}', "
+                    f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+                )
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN {insertar} END")
+                cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN {borrar} END")
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columnas} ON {tabla} "
+                    f"BEGIN {borrar} {insertar} END"
+                )
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def desinstalar(self, connection):
+        with connection.cursor() as cursor:
+            for nombre in INDICES:
+                for sufijo in ('ai', 'ad', 'au'):
+                    cursor.execute(f"DROP TRIGGER IF EXISTS busqueda_{nombre}_{sufijo}")
+                cursor.execute(f"DROP TABLE IF EXISTS busqueda_{nombre}")
+
+    def buscar(self, queryset, palabras):
+        fts = f'busqueda_{queryset.model._meta.model_name}'
+        tabla = _indice(queryset)['tabla']
+        # Cada palabra como prefijo ("pal"*), todas obligatorias
+        consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+        # Un solo MATCH: la tabla FTS entra al FROM unida por rowid y bm25 sale de esa fila
+        return (
+            queryset.extra(
+                select={'rango': f'-bm25({fts})'},
+                tables=[fts],
+                where=[f'{fts} MATCH %s', f'{fts}.rowid = "{tabla}"."id"'],
+                params=[consulta],
+            )
+            .order_by('-rango', '-pk')
+        )
+
+
+class BusquedaPostgres:
+    """Índice GIN sobre to_tsvector(...) de los campos; Postgres lo mantiene solo. Ordena por ts_rank."""
+
+    def documento(self, indice, tabla=None):
+        prefijo = f'"{tabla}".' if tabla else ''
+        texto = " || ' ' || ".join(f"coalesce({prefijo}\"{campo}\", '')" for campo in indice['campos'])
+        return f"to_tsvector('{indice['config']}', {texto})"
+
+    def instalar(self, connection):
+        with connection.cursor() as cursor:
+            for nombre, indice in INDICES.items():
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS busqueda_{nombre}_gin ON {indice['tabla']} "
+                    f"USING GIN (({self.documento(indice)}))"
+                )
+
+    def desinstalar(self, connection):
+        with connection.cursor() as cursor:
+            for nombre in INDICES:
+                cursor.execute(f"DROP INDEX IF EXISTS busqueda_{nombre}_gin")
+
+    def buscar(self, queryset, palabras):
+        indice = _indice(queryset)
+        # La expresión debe ser la misma del índice para que Postgres lo use
+        documento = self.documento(indice, indice['tabla'])
+        consulta = f"to_tsquery('{indice['config']}', %s)"
+        tsquery = ' & '.join(f'{palabra}:*' for palabra in palabras)
+        return (
+            queryset.extra(where=[f"{documento} @@ {consulta}"], params=[tsquery])
+            .alias(rango=RawSQL(f"ts_rank({documento}, {consulta})", [tsquery]))
+            .order_by('-rango', '-pk')
+        )
+
+
+class BusquedaSimple:
+    """Respaldo para otras bases de datos: icontains por palabra, sin índice ni ranking."""
+
+    def instalar(self, connection):
+        pass
+
+    def desinstalar(self, connection):
+        pass
+
+    def buscar(self, queryset, palabras):
+        campos = _indice(queryset)['campos']
+        for palabra in palabras:
+            queryset = queryset.filter(Q(*[Q(**{f'{campo}__icontains': palabra}) for campo in campos], _connector=Q.OR))
+        return queryset
+
+
+BACKENDS = {
+    'sqlite': 'services.busqueda.BusquedaSQLite',
+    'postgresql': 'services.busqueda.BusquedaPostgres',
+}
+
+
+def get_backend(connection=None):
+    """BUSQUEDA_BACKEND si está configurado; si no, el que corresponde a la base de datos."""
+    connection = connection or default_connection
+    ruta = settings.BUSQUEDA_BACKEND or BACKENDS.get(connection.vendor, 'services.busqueda.BusquedaSimple')
+    return import_string(ruta)()
+
+
+def buscar(queryset, texto):
+    """
+    Filtra `queryset` (de Carro o Reclamo) por las palabras de `texto`, como
+    prefijos y todas obligatorias, ordenado por relevancia.
+    """
+    palabras = terminos(texto)
+    if not palabras:
+        return queryset.none()
+    return get_backend().buscar(queryset, palabras)
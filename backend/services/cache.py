@@ -0,0 +1,117 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from .models import Empresa
+
+# Las respuestas se guardan bajo claves que incluyen la "versión" del usuario y
+# de su empresa. Las señales de los modelos incrementan esas versiones, así las
+# entradas viejas dejan de leerse y expiran solas por timeout.
+
+
+def _version_key(scope, pk):
+    return f'cache-version:{scope}:{pk}'
+
+
+def get_version(scope, pk):
+    key = _version_key(scope, pk)
+    version = cache.get(key)
+    if version is None:
+        # Se parte de un timestamp para no reutilizar versiones si el cache se vació
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(scope, pk):
+    def _bump():
+        key = _version_key(scope, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), timeout=None)
+    # Después del commit, para no cachear datos que todavía no son visibles
+    transaction.on_commit(_bump)
+
+
+def invalidate_usuario(user_id):
+    bump_version('usuario', user_id)
+
+
+def invalidate_empresa(empresa_id):
+    bump_version('empresa', empresa_id)
+
+
+def empresa_de_usuario(user):
+    """Empresa del usuario o None, cacheada con la versión del usuario (cualquier cambio de su empresa la incrementa)."""
+    user_version = get_version('usuario', user.pk)
+    empresa = cache.get_or_set(
+        f'empresa-de-usuario:{user.pk}:{user_version}',
+        lambda: Empresa.objects.filter(usuario=user).first() or 0,
+        timeout=settings.RESPONSE_CACHE_TIMEOUT,
+    )
+    return empresa or None
+
+
+def tenant_key(user, empresa_id):
+    """Parte de la clave que identifica al usuario, su empresa y sus versiones actuales."""
+    user_version = get_version('usuario', user.pk)
+    empresa_version = get_version('empresa', empresa_id) if empresa_id else 0
+    return f'{user.pk}.{user_version}:{empresa_id or 0}.{empresa_version}'
+
+
+def compute_etag(data):
+    content = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode('utf-8')
+    return '"%s"' % hashlib.md5(content).hexdigest()
+
+
+def _etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    tags = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return etag in tags or '*' in tags
+
+
+def _with_cache_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
+
+
+def cache_response(view_func):
+    """
+    Cachea las respuestas 200 de una vista de lectura por usuario y empresa, y
+    responde 304 cuando el ETag enviado en If-None-Match sigue vigente.
+    Sirve tanto para métodos de viewsets como para vistas @api_view.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        if request.method != 'GET' or not request.user.is_authenticated:
+            return view_func(*args, **kwargs)
+
+        key = f'response:{tenant_key(request.user, request.tenant.empresa_id)}:{request.get_full_path()}'
+        entry = cache.get(key)
+        if entry is None:
+            response = view_func(*args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = (response.data, compute_etag(response.data))
+            cache.set(key, entry, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+        else:
+            response = None
+
+        data, etag = entry
+        if _etag_matches(request, etag):
+            return _with_cache_headers(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+        return _with_cache_headers(response or Response(data), etag)
+    return wrapper
@@ -0,0 +1,302 @@
+import datetime
+import heapq
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache
+from .models import Carro, Empresa
+
+# Las colas viven en memoria de cada proceso y se reconstruyen desde la base de
+# datos la primera vez que se piden. Las señales de Carro las actualizan en
+# O(log n); si la versión de la empresa en el cache cambió por otra vía (otro
+# proceso, un lote, la empresa) la cola se reconstruye en el siguiente acceso.
+
+
+def _ts(fecha):
+    return fecha.timestamp()
+
+
+def bahias_libres(bahias, ocupadas):
+    """Bahías libres de 1 a `bahias` dadas las bahías de los carros en proceso."""
+    libres = [bahia for bahia in range(1, bahias + 1) if bahia not in set(ocupadas)]
+    # Los carros en proceso sin bahía (cambiados a mano) también ocupan una
+    sin_bahia = sum(1 for bahia in ocupadas if bahia is None)
+    return libres[:max(len(libres) - sin_bahia, 0)]
+
+
+def duracion_servicio(dia_llegada, dia_inicio, dia_salida):
+    """
+    Segundos de servicio de un carro terminado: desde que pasó a proceso o, en
+    los carros anteriores a la cola, desde su llegada. None si no sirve de muestra.
+    """
+    if not dia_salida:
+        return None
+    segundos = (dia_salida - (dia_inicio or dia_llegada)).total_seconds()
+    if segundos <= 0 or segundos > settings.COLA_DURACION_MAX:
+        return None
+    return segundos
+
+
+class ColaEmpresa:
+    """
+    Cola de lavado de una empresa: los carros en espera en un heap ordenado por
+    llegada (con borrado perezoso), los que están en proceso con su bahía, y la
+    duración promedio del servicio por precio (cada precio es un tipo de lavado).
+    """
+
+    def __init__(self, empresa_id, bahias, version):
+        self.empresa_id = empresa_id
+        self.bahias = bahias
+        self.version = version
+        self.lock = threading.Lock()
+        self.heap = []  # (llegada, id); puede tener entradas viejas
+        self.en_espera = {}  # id -> (llegada, precio, placa)
+        self.en_proceso = {}  # id -> (inicio, precio, placa, bahia)
+        self.duraciones = defaultdict(lambda: [0.0, 0])  # precio -> [segundos, muestras]
+        self.duracion_total = [0.0, 0]
+
+    # Muestras de duración
+
+    def agregar_muestra(self, precio, segundos):
+        for acumulado in (self.duraciones[precio], self.duracion_total):
+            acumulado[0] += segundos
+            acumulado[1] += 1
+
+    def duracion(self, precio):
+        segundos, muestras = self.duraciones.get(precio, (0.0, 0))
+        if muestras >= settings.COLA_MIN_MUESTRAS:
+            return segundos / muestras
+        segundos, muestras = self.duracion_total
+        if muestras:
+            return segundos / muestras
+        return settings.COLA_DURACION_DEFECTO
+
+    # Carros
+
+    def quitar(self, carro_id):
+        self.en_proceso.pop(carro_id, None)
+        if self.en_espera.pop(carro_id, None) is not None and len(self.heap) > 2 * len(self.en_espera) + 32:
+            # Demasiadas entradas viejas: se compacta el heap
+            self.heap = [(llegada, i) for i, (llegada, _, _) in self.en_espera.items()]
+            heapq.heapify(self.heap)
+
+    def poner(self, carro_id, estado, placa, precio, dia_llegada, dia_inicio, bahia):
+        self.quitar(carro_id)
+        if estado == 'espera':
+            llegada = _ts(dia_llegada)
+            self.en_espera[carro_id] = (llegada, precio, placa)
+            heapq.heappush(self.heap, (llegada, carro_id))
+        elif estado == 'proceso':
+            self.en_proceso[carro_id] = (_ts(dia_inicio or dia_llegada), precio, placa, bahia)
+
+    def _vigente(self, entrada):
+        llegada, carro_id = entrada
+        datos = self.en_espera.get(carro_id)
+        return datos is not None and datos[0] == llegada
+
+    def espera_ordenada(self):
+        return sorted(entrada for entrada in self.heap if self._vigente(entrada))
+
+    def bahias_libres(self):
+        return bahias_libres(self.bahias, [bahia for _, _, _, bahia in self.en_proceso.values()])
+
+    def estimar(self, ahora=None):
+        """
+        Simula la cola: cada carro en espera entra, en orden de llegada, a la
+        primera bahía que se libera. Devuelve {id: (inicio estimado, fin estimado)}
+        en timestamps, también para los carros en proceso.
+        """
+        ahora = ahora or timezone.now().timestamp()
+        estimados = {}
+        libres_en = []
+        for carro_id, (inicio, precio, _, _) in self.en_proceso.items():
+            fin = max(inicio + self.duracion(precio), ahora)
+            estimados[carro_id] = (inicio, fin)
+            libres_en.append(fin)
+        libres_en.sort()
+        # Las bahías libres quedan al frente; si hay más carros en proceso que
+        # bahías, solo cuentan las que se liberan primero
+        libres_en = [ahora] * max(self.bahias - len(libres_en), 0) + libres_en[:self.bahias]
+        heapq.heapify(libres_en)
+        if not libres_en:
+            return estimados
+        for llegada, carro_id in self.espera_ordenada():
+            precio = self.en_espera[carro_id][1]
+            inicio = max(heapq.heappop(libres_en), ahora)
+            fin = inicio + self.duracion(precio)
+            estimados[carro_id] = (inicio, fin)
+            heapq.heappush(libres_en, fin)
+        return estimados
+
+
+def construir_cola(empresa_id, version):
+    bahias = Empresa.objects.filter(pk=empresa_id).values_list('bahias', flat=True).first() or 1
+    cola = ColaEmpresa(empresa_id, bahias, version)
+    activos = (
+        Carro.objects.filter(empresa_id=empresa_id, estado__in=['espera', 'proceso'])
+        .values_list('id', 'estado', 'placa', 'precio', 'dia_llegada', 'dia_inicio', 'bahia')
+    )
+    for fila in activos.iterator():
+        cola.poner(*fila)
+    desde = timezone.now() - datetime.timedelta(days=settings.COLA_HISTORIAL_DIAS)
+    terminados = (
+        Carro.objects.filter(empresa_id=empresa_id, dia_llegada__gte=desde, estado='terminado', dia_salida__isnull=False)
+        .values_list('precio', 'dia_llegada', 'dia_inicio', 'dia_salida')
+    )
+    for precio, dia_llegada, dia_inicio, dia_salida in terminados.iterator():
+        segundos = duracion_servicio(dia_llegada, dia_inicio, dia_salida)
+        if segundos is not None:
+            cola.agregar_muestra(precio, segundos)
+    return cola
+
+
+_colas = {}
+_colas_lock = threading.Lock()
+
+
+def obtener_cola(empresa_id):
+    """Cola en memoria de la empresa, reconstruida si su versión en el cache cambió."""
+    version = cache.get_version('empresa', empresa_id)
+    with _colas_lock:
+        cola = _colas.get(empresa_id)
+    if cola is not None and cola.version == version:
+        return cola
+    cola = construir_cola(empresa_id, version)
+    with _colas_lock:
+        _colas[empresa_id] = cola
+    return cola
+
+
+def _actualizar(empresa_id, datos, muestra):
+    with _colas_lock:
+        cola = _colas.get(empresa_id)
+    if cola is None:
+        return
+    with cola.lock:
+        cola.poner(*datos)
+        if muestra is not None:
+            cola.agregar_muestra(datos[3], muestra)
+        # Si la única modificación fue esta, la cola sigue al día; si no, se reconstruye
+        if cache.get_version('empresa', empresa_id) == cola.version + 1:
+            cola.version += 1
+
+
+def carro_guardado(carro, estado_anterior=None):
+    """Actualiza la cola de la empresa del carro cuando termina la transacción."""
+    datos = (carro.pk, carro.estado, carro.placa, carro.precio, carro.dia_llegada, carro.dia_inicio, carro.bahia)
+    muestra = None
+    if carro.estado == 'terminado' and estado_anterior != 'terminado':
+        muestra = duracion_servicio(carro.dia_llegada, carro.dia_inicio, carro.dia_salida)
+    transaction.on_commit(lambda: _actualizar(carro.empresa_id, datos, muestra))
+
+
+def carro_eliminado(carro):
+    datos = (carro.pk, 'eliminado', carro.placa, carro.precio, carro.dia_llegada, None, None)
+    transaction.on_commit(lambda: _actualizar(carro.empresa_id, datos, None))
+
+
+def preparar_transicion(carro, estado_anterior, ahora=None):
+    """
+    Completa los campos de la cola al cambiar de estado: al pasar a proceso se
+    registra dia_inicio; al salir de proceso se libera la bahía.
+    """
+    if carro.estado == estado_anterior:
+        return
+    if carro.estado == 'proceso' and carro.dia_inicio is None:
+        carro.dia_inicio = ahora or timezone.now()
+    if carro.estado != 'proceso':
+        carro.bahia = None
+
+
+def asignar_bahias(empresa_id):
+    """
+    Pasa a proceso a los primeros carros en espera, uno por bahía libre, y les
+    asigna la bahía. Devuelve [(carro, bahía)].
+
+    Las bahías ocupadas y los carros en espera se leen de la base de datos dentro
+    de la transacción, no de la cola en memoria, que puede estar atrasada respecto
+    de otro proceso. En PostgreSQL el bloqueo de la fila de la empresa serializa
+    las asignaciones; en SQLite la transacción que intenta escribir sobre una
+    lectura vieja falla (database is locked) en vez de repetir una bahía.
+    """
+    asignados = []
+    ahora = timezone.now()
+    with transaction.atomic():
+        bahias = Empresa.objects.select_for_update().filter(pk=empresa_id).values_list('bahias', flat=True).first()
+        if bahias is None:
+            return []
+        activos = Carro.objects.filter(empresa_id=empresa_id)
+        libres = bahias_libres(bahias, list(activos.filter(estado='proceso').values_list('bahia', flat=True)))
+        if not libres:
+            return []
+        carros = list(
+            activos.select_for_update().filter(estado='espera').order_by('dia_llegada', 'id')[:len(libres)]
+        )
+        for carro, bahia in zip(carros, libres):
+            carro.estado = 'proceso'
+            carro.bahia = bahia
+            carro.dia_inicio = ahora
+            # save() dispara las señales: resúmenes, cache, eventos y la cola
+            carro.save(update_fields=['estado', 'bahia', 'dia_inicio'])
+            asignados.append((carro, bahia))
+    return asignados
+
+
+def _fecha(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def estado_cola(empresa_id):
+    """Carros en proceso y en espera con su bahía, posición y hora estimada de inicio y fin."""
+    cola = obtener_cola(empresa_id)
+    with cola.lock:
+        estimados = cola.estimar()
+        en_proceso = [
+            {
+                'id': carro_id, 'placa': placa, 'bahia': bahia, 'inicio': _fecha(inicio),
+                'fin_estimado': _fecha(estimados[carro_id][1]),
+            }
+            for carro_id, (inicio, _, placa, bahia) in sorted(cola.en_proceso.items(), key=lambda item: item[1][0])
+        ]
+        en_espera = [
+            {
+                'id': carro_id, 'placa': cola.en_espera[carro_id][2], 'posicion': posicion,
+                'dia_llegada': _fecha(llegada),
+                'inicio_estimado': _fecha(estimados[carro_id][0]) if carro_id in estimados else None,
+                'fin_estimado': _fecha(estimados[carro_id][1]) if carro_id in estimados else None,
+            }
+            for posicion, (llegada, carro_id) in enumerate(cola.espera_ordenada(), start=1)
+        ]
+        return {
+            'bahias': cola.bahias,
+            'bahias_libres': cola.bahias_libres(),
+            'en_proceso': en_proceso,
+            'en_espera': en_espera,
+        }
+
+
+def eta_carro(carro):
+    """Posición en la cola y horas estimadas de un carro, o None si ya terminó."""
+    cola = obtener_cola(carro.empresa_id)
+    with cola.lock:
+        if carro.pk not in cola.en_espera and carro.pk not in cola.en_proceso:
+            return None
+        estimados = cola.estimar()
+        posicion = None
+        if carro.pk in cola.en_espera:
+            posicion = next(
+                numero for numero, (_, carro_id) in enumerate(cola.espera_ordenada(), start=1) if carro_id == carro.pk
+            )
+    inicio, fin = estimados.get(carro.pk, (None, None))
+    return {
+        'id': carro.pk,
+        'estado': carro.estado,
+        'posicion': posicion,
+        'bahia': carro.bahia,
+        'inicio_estimado': _fecha(inicio) if inicio else None,
+        'fin_estimado': _fecha(fin) if fin else None,
+    }
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Métodos que se pueden reintentar sin riesgo de cobrar o crear dos veces
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'DELETE'])
+RETRY_STATUS_CODES = frozenset([429, 500, 502, 503, 504])
+
+
+class CulqiUnavailable(requests.exceptions.RequestException):
+    """El circuito está abierto: Culqi falló varias veces seguidas y no se llama por un tiempo."""
+
+
+# Errores de red/HTTP de ambos clientes (síncrono y asíncrono), para los except de las vistas
+CULQI_ERRORS = (requests.exceptions.RequestException, httpx.HTTPError)
+
+
+class CircuitBreaker:
+    """
+    Después de `failure_threshold` fallas seguidas deja de llamar a Culqi durante
+    `reset_timeout` segundos; luego deja pasar una llamada de prueba (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half-open: una sola llamada de prueba, las demás siguen bloqueadas
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.error(f"Circuito de Culqi abierto tras {self.failures} fallas seguidas")
+                self.opened_at = time.monotonic()
+
+
+class CulqiGateway:
+    """
+    Cliente HTTP compartido para la API de Culqi: una sesión con pool de
+    conexiones keep-alive, headers de autenticación fijos, timeouts de conexión
+    y lectura, reintentos con backoff para métodos idempotentes y circuit breaker.
+    """
+
+    def __init__(self, base_url, private_key, timeout=(3.05, 15), max_retries=2,
+                 backoff_factor=0.3, pool_maxsize=20, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {private_key}",
+            "Content-Type": "application/json",
+        })
+
+    def url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, **kwargs):
+        if not self.breaker.allow_request():
+            raise CulqiUnavailable("El servicio de pagos no está disponible temporalmente.")
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, self.url(path), **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def patch(self, path, **kwargs):
+        return self.request('PATCH', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncCulqiGateway:
+    """
+    Versión asíncrona del gateway (httpx.AsyncClient) para las vistas async:
+    mismo pool keep-alive, timeouts, reintentos con backoff para métodos
+    idempotentes y circuit breaker compartido con el cliente síncrono.
+    """
+
+    def __init__(self, base_url, private_key, timeout=(3.05, 15), max_retries=2,
+                 backoff_factor=0.3, pool_maxsize=100, breaker=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker or CircuitBreaker()
+        connect_timeout, read_timeout = timeout
+        self.client = httpx.AsyncClient(
+            base_url=base_url.rstrip('/') + '/',
+            headers={
+                "Authorization": f"Bearer {private_key}",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize),
+        )
+
+    async def request(self, method, path, **kwargs):
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        for attempt in range(retries + 1):
+            if not self.breaker.allow_request():
+                raise CulqiUnavailable("El servicio de pagos no está disponible temporalmente.")
+            try:
+                response = await self.client.request(method, path.lstrip('/'), **kwargs)
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return response
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+
+    async def get(self, path, **kwargs):
+        return await self.request('GET', path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request('POST', path, **kwargs)
+
+    async def patch(self, path, **kwargs):
+        return await self.request('PATCH', path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request('DELETE', path, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_gateway = None
+_gateway_lock = threading.RLock()
+_breaker = None
+# Un AsyncClient solo sirve dentro del event loop donde se creó: uno por loop.
+# Solo se comparten bajo ASGI, donde el loop vive lo que el proceso (ver open_async_gateway)
+_async_gateways = weakref.WeakKeyDictionary()
+
+
+def get_breaker():
+    global _breaker
+    with _gateway_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(**settings.CULQI_CIRCUIT_BREAKER)
+        return _breaker
+
+
+def gateway_options():
+    return {
+        'base_url': settings.CULQI_API_BASE_URL,
+        'private_key': settings.CULQI_PRIVATE_KEY,
+        'timeout': settings.CULQI_TIMEOUT,
+        'max_retries': settings.CULQI_MAX_RETRIES,
+        'breaker': get_breaker(),
+    }
+
+
+def build_gateway():
+    return CulqiGateway(**gateway_options())
+
+
+def get_gateway():
+    """Devuelve el gateway compartido del proceso, creándolo con la configuración actual."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def set_gateway(gateway):
+    """Reemplaza el gateway compartido (por ejemplo por uno que apunte a un servidor falso)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None and _gateway is not gateway:
+            _gateway.close()
+        _gateway = gateway
+
+
+def get_async_gateway():
+    """
+    Devuelve el gateway asíncrono compartido del event loop actual. Pensado para
+    ASGI: su pool de conexiones dura lo que el loop y se cierra con el proceso.
+    """
+    loop = asyncio.get_running_loop()
+    gateway = _async_gateways.get(loop)
+    if gateway is None:
+        gateway = _async_gateways[loop] = AsyncCulqiGateway(**gateway_options())
+    return gateway
+
+
+def set_async_gateway(gateway):
+    """Reemplaza el gateway asíncrono del event loop actual."""
+    _async_gateways[asyncio.get_running_loop()] = gateway
+
+
+@asynccontextmanager
+async def open_async_gateway(request):
+    """
+    Gateway asíncrono para una vista async (`async with open_async_gateway(request) as gateway`).
+
+    Bajo ASGI es el compartido del event loop, con su pool keep-alive. Bajo WSGI
+    cada vista async corre con async_to_sync en un loop nuevo, así que el pool no
+    se reutilizaría: se abre un cliente para el request y se cierra al salir.
+    """
+    gateway = _async_gateways.get(asyncio.get_running_loop())
+    if gateway is None and isinstance(getattr(request, '_request', request), ASGIRequest):
+        gateway = get_async_gateway()
+    if gateway is not None:
+        yield gateway
+        return
+    gateway = AsyncCulqiGateway(**gateway_options())
+    try:
+        yield gateway
+    finally:
+        await gateway.aclose()
+
+
+@receiver(setting_changed)
+def reset_gateway(setting, **kwargs):
+    # override_settings(CULQI_API_BASE_URL=...) en los tests recrea los clientes
+    global _breaker
+    if setting.startswith('CULQI_'):
+        set_gateway(None)
+        _async_gateways.clear()
+        _breaker = None
@@ -0,0 +1,106 @@
+from datetime import timedelta
+
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import Carro, EmpresaDailyStats
+
+PERIODOS = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+def calcular_estadisticas(empresas):
+    """
+    Calcula las estadísticas de varias empresas con una sola consulta sobre el
+    resumen diario (EmpresaDailyStats), que tiene O(días) filas en lugar de
+    O(carros).
+
+    Devuelve un dict {empresa_id: estadisticas} con la misma forma que la
+    respuesta de /empresas/<id>/estadisticas/.
+    """
+    empresas = list(empresas)
+    hace_6_meses = timezone.localdate() - timedelta(days=180)
+    estados = [estado for estado, _ in Carro.ESTADO_CHOICES]
+
+    filas = (
+        EmpresaDailyStats.objects.filter(empresa__in=empresas)
+        .values('empresa')
+        .order_by()
+        .annotate(
+            total=Sum('cantidad'),
+            total_ingresos=Sum('ingresos', filter=Q(estado='terminado')),
+            recientes=Sum('cantidad', filter=Q(fecha__gte=hace_6_meses)),
+            con_salida=Sum('carros_con_salida'),
+            segundos=Sum('segundos_servicio'),
+            **{f'estado_{estado}': Sum('cantidad', filter=Q(estado=estado)) for estado in estados},
+        )
+    )
+    por_empresa = {fila['empresa']: fila for fila in filas}
+
+    resultado = {}
+    for empresa in empresas:
+        fila = por_empresa.get(empresa.id, {})
+        por_estado = {estado: fila.get(f'estado_{estado}') or 0 for estado in estados}
+        terminados = por_estado['terminado']
+        ingresos = fila.get('total_ingresos') or 0
+        con_salida = fila.get('con_salida') or 0
+        resultado[empresa.id] = {
+            'carros_registrados': fila.get('total') or 0,
+            'carros_terminados': terminados,
+            'carros_pendientes': por_estado['espera'] + por_estado['proceso'],
+            'ingresos_totales': float(ingresos),
+            'promedio_por_carro': float(ingresos / terminados) if terminados > 0 else 0,
+            'tiempo_promedio_minutos': round(fila['segundos'] / con_salida / 60, 1) if con_salida else None,
+            'stats_por_estado': [
+                {'estado': estado, 'cantidad': cantidad}
+                for estado, cantidad in sorted(por_estado.items()) if cantidad
+            ],
+            'carros_ultimo_mes': fila.get('recientes') or 0,
+            'empresa_info': {
+                'nombre': empresa.nombre,
+                'ruc': empresa.ruc,
+                'direccion': empresa.direccion
+            }
+        }
+    return resultado
+
+
+def serie_estadisticas(empresa, periodo='dia', desde=None, hasta=None):
+    """
+    Serie temporal (por día, semana o mes de llegada) para los gráficos:
+    cantidad de carros, terminados, ingresos y tiempo promedio de servicio.
+    """
+    filas = EmpresaDailyStats.objects.filter(empresa=empresa, cantidad__gt=0)
+    if desde:
+        filas = filas.filter(fecha__gte=desde)
+    if hasta:
+        filas = filas.filter(fecha__lte=hasta)
+
+    filas = (
+        filas.annotate(periodo=PERIODOS[periodo]('fecha'))
+        .values('periodo')
+        .order_by('periodo')
+        .annotate(
+            total=Sum('cantidad'),
+            terminados=Sum('cantidad', filter=Q(estado='terminado')),
+            total_ingresos=Sum('ingresos', filter=Q(estado='terminado')),
+            con_salida=Sum('carros_con_salida'),
+            segundos=Sum('segundos_servicio'),
+        )
+    )
+    return [
+        {
+            'periodo': fila['periodo'],
+            'carros': fila['total'],
+            'carros_terminados': fila['terminados'] or 0,
+            'ingresos': float(fila['total_ingresos'] or 0),
+            'tiempo_promedio_minutos': (
+                round(fila['segundos'] / fila['con_salida'] / 60, 1) if fila['con_salida'] else None
+            ),
+        }
+        for fila in filas
+    ]
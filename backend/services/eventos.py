@@ -0,0 +1,191 @@
+import base64
+import binascii
+import datetime
+import hmac
+import json
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_usuario
+from .models import Card, Customer, CulqiEvent, Subscription
+from .suscripciones import SUSCRIPCION_INACTIVA, guardar_suscripciones
+
+logger = logging.getLogger(__name__)
+
+CUSTOMER_FIELDS = ['address', 'address_city', 'country_code', 'first_name', 'last_name', 'phone_number', 'email', 'metadata']
+
+
+def webhook_autorizado(request):
+    """Verifica las credenciales Basic auth que Culqi envía con cada evento."""
+    username, password = settings.CULQI_WEBHOOK_USERNAME, settings.CULQI_WEBHOOK_PASSWORD
+    if not username or not password:
+        logger.error("CULQI_WEBHOOK_USERNAME/CULQI_WEBHOOK_PASSWORD no están configurados.")
+        return False
+
+    scheme, _, credentials = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return False
+    try:
+        recibido = base64.b64decode(credentials, validate=True)
+    except (binascii.Error, ValueError):
+        return False
+    esperado = f"{username}:{password}".encode('utf-8')
+    return hmac.compare_digest(recibido, esperado)
+
+
+def leer_evento(data):
+    """Valida el cuerpo del webhook y devuelve el CulqiEvent (sin guardar). Lanza ValueError si no es válido."""
+    if not isinstance(data, dict) or not data.get('id') or not data.get('type'):
+        raise ValueError("El evento no tiene id o type")
+    objeto = data.get('data')
+    # Culqi a veces manda `data` como un string JSON
+    if isinstance(objeto, str):
+        objeto = json.loads(objeto)
+    if not isinstance(objeto, dict):
+        raise ValueError("El evento no tiene data")
+    return CulqiEvent(event_id=str(data['id']), type=str(data['type']), payload={**data, 'data': objeto})
+
+
+def registrar_evento(evento):
+    """Guarda el evento; si Culqi lo reenvía (mismo event_id) se ignora."""
+    CulqiEvent.objects.bulk_create([evento], ignore_conflicts=True)
+
+
+def _es_borrado(evento):
+    return '.delete.' in evento.type
+
+
+def _objeto(evento, tipo):
+    # Solo los eventos del propio tipo (subscription.*, card.*, customer.*). Los de
+    # otros tipos, como los cargos (charge.*), se guardan pero no cambian nada local.
+    if evento.type.split('.')[0] != tipo:
+        return None
+    data = evento.payload['data']
+    if isinstance(data.get(tipo), dict):
+        return data[tipo]
+    if data.get('object', tipo) == tipo and data.get('id'):
+        return data
+    return None
+
+
+def _ultimos(eventos, tipo):
+    """
+    Deduplica por id del objeto: devuelve (objetos a guardar, ids borrados) con
+    la última versión de cada uno según el orden de llegada.
+    """
+    guardar, borrados = {}, set()
+    for evento in eventos:
+        objeto = _objeto(evento, tipo)
+        if objeto is None:
+            continue
+        if _es_borrado(evento):
+            guardar.pop(objeto['id'], None)
+            borrados.add(objeto['id'])
+        else:
+            borrados.discard(objeto['id'])
+            guardar[objeto['id']] = objeto
+    return list(guardar.values()), borrados
+
+
+def aplicar_suscripciones(eventos):
+    datos, borrados = _ultimos(eventos, 'subscription')
+    guardar_suscripciones(datos)
+    if borrados:
+        Subscription.objects.filter(subscription_id__in=borrados).update(status=SUSCRIPCION_INACTIVA)
+
+
+def aplicar_tarjetas(eventos):
+    datos, borrados = _ultimos(eventos, 'card')
+    usuarios = dict(
+        Customer.objects.filter(culqi_id__in={data.get('customer_id') for data in datos})
+        .values_list('culqi_id', 'user_id')
+    )
+    tarjetas = []
+    for data in datos:
+        user_id = usuarios.get(data.get('customer_id'))
+        if user_id is None:
+            logger.warning(f"Tarjeta {data['id']} de un customer desconocido, se ignora")
+            continue
+        creation_timestamp = data.get('creation_date')
+        tarjetas.append(Card(
+            user_id=user_id,
+            card_id=data['id'],
+            customer_id=data['customer_id'],
+            active=data.get('active', True),
+            creation_date=(
+                datetime.datetime.fromtimestamp(creation_timestamp / 1000.0, tz=datetime.timezone.utc)
+                if creation_timestamp else None
+            ),
+            metadata=data.get('metadata') or {},
+        ))
+    Card.objects.bulk_create(
+        tarjetas,
+        update_conflicts=True,
+        unique_fields=['card_id'],
+        update_fields=['customer_id', 'active', 'metadata'],
+    )
+    if borrados:
+        Card.objects.filter(card_id__in=borrados).update(active=False)
+
+
+def aplicar_customers(eventos):
+    datos, _ = _ultimos(eventos, 'customer')
+    por_id = {data['id']: data for data in datos}
+    customers = list(Customer.objects.filter(culqi_id__in=por_id))
+    for customer in customers:
+        data = por_id[customer.culqi_id]
+        # Los datos personales vienen dentro de antifraud_details
+        detalles = {**data, **(data.get('antifraud_details') or {})}
+        detalles.setdefault('phone_number', detalles.get('phone'))
+        for field in CUSTOMER_FIELDS:
+            if detalles.get(field) is not None:
+                setattr(customer, field, detalles[field])
+    Customer.objects.bulk_update(customers, CUSTOMER_FIELDS)
+    # bulk_update no dispara las señales que invalidan el cache de /customers/me/
+    for customer in customers:
+        invalidate_usuario(customer.user_id)
+
+
+def aplicar_eventos(eventos):
+    aplicar_customers(eventos)
+    aplicar_tarjetas(eventos)
+    aplicar_suscripciones(eventos)
+
+
+def procesar_eventos(batch_size=None):
+    """
+    Aplica un lote de eventos pendientes, en orden de llegada, y los marca como
+    procesados. Si el lote falla se reintenta evento por evento para que uno malo
+    no bloquee la cola; su error queda en CulqiEvent.error. Devuelve cuántos se procesaron.
+    """
+    batch_size = batch_size or settings.CULQI_EVENTS_BATCH_SIZE
+    with transaction.atomic():
+        eventos = list(
+            CulqiEvent.objects.filter(processed_at__isnull=True)
+            .order_by('id')
+            .select_for_update(skip_locked=True)[:batch_size]
+        )
+        if not eventos:
+            return 0
+
+        try:
+            with transaction.atomic():
+                aplicar_eventos(eventos)
+        except Exception as e:
+            logger.error(f"Error al aplicar el lote de eventos de Culqi, se aplican uno por uno: {e}")
+            for evento in eventos:
+                try:
+                    with transaction.atomic():
+                        aplicar_eventos([evento])
+                except Exception as e:
+                    logger.error(f"Error al aplicar el evento {evento.event_id}: {e}")
+                    evento.error = str(e)
+
+        ahora = timezone.now()
+        for evento in eventos:
+            evento.processed_at = ahora
+        CulqiEvent.objects.bulk_update(eventos, ['processed_at', 'error'])
+    return len(eventos)
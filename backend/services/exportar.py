@@ -0,0 +1,169 @@
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Carro
+
+COLUMNAS = ['placa', 'marca', 'modelo', 'color', 'precio', 'dia_llegada', 'dia_salida', 'estado']
+ENCABEZADOS = ['Placa', 'Marca', 'Modelo', 'Color', 'Precio', 'Llegada', 'Salida', 'Estado']
+ESTADOS = dict(Carro.ESTADO_CHOICES)
+
+# Filas que se leen de la base de datos (y se envían al cliente) por vez
+CHUNK_SIZE = 2000
+
+
+def _fecha(valor):
+    return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M') if valor else ''
+
+
+def filas_carros(carros):
+    """
+    Filas del reporte (sin encabezado) leídas con values_list + iterator, así la
+    memoria no crece con la cantidad de carros. Al final agrega el total de
+    ingresos de los carros terminados.
+    """
+    ingresos = Decimal(0)
+    filas = carros.order_by('dia_llegada', 'id').values_list(*COLUMNAS).iterator(chunk_size=CHUNK_SIZE)
+    for placa, marca, modelo, color, precio, llegada, salida, estado in filas:
+        if estado == 'terminado':
+            ingresos += precio
+        yield [placa, marca, modelo or '', color or '', precio, _fecha(llegada), _fecha(salida), ESTADOS[estado]]
+    yield ['', '', '', 'Ingresos (terminados)', ingresos, '', '', '']
+
+
+def _en_bloques(filas, size=CHUNK_SIZE):
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) >= size:
+            yield bloque
+            bloque = []
+    if bloque:
+        yield bloque
+
+
+def generar_csv(filas):
+    salida = io.StringIO()
+    writer = csv.writer(salida)
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    yield '\ufeff'
+    writer.writerow(ENCABEZADOS)
+    for bloque in _en_bloques(filas):
+        writer.writerows(bloque)
+        yield salida.getvalue()
+        salida.seek(0)
+        salida.truncate()
+    yield salida.getvalue()
+
+
+class _Salida(io.RawIOBase):
+    # Archivo de solo escritura que el zip va llenando y el generador vacía en cada bloque
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.partes.append(bytes(data))
+        return len(data)
+
+    def vaciar(self):
+        data = b''.join(self.partes)
+        self.partes = []
+        return data
+
+
+XLSX_ARCHIVOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Carros" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _celda(valor):
+    if isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(str(valor))}</t></is></c>'
+
+
+def _fila_xml(fila):
+    return '<row>' + ''.join(_celda(valor) for valor in fila) + '</row>'
+
+
+def generar_xlsx(filas):
+    """
+    Escribe un .xlsx mínimo (una hoja, celdas inline) directamente en un zip en
+    modo streaming: cada bloque de filas se comprime y se envía sin guardar el archivo.
+    """
+    salida = _Salida()
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_DEFLATED) as archivo:
+        for nombre, contenido in XLSX_ARCHIVOS.items():
+            archivo.writestr(nombre, contenido)
+        with archivo.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as hoja:
+            hoja.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            hoja.write(_fila_xml(ENCABEZADOS).encode('utf-8'))
+            for bloque in _en_bloques(filas):
+                hoja.write(''.join(_fila_xml(fila) for fila in bloque).encode('utf-8'))
+                yield salida.vaciar()
+            hoja.write(b'</sheetData></worksheet>')
+    yield salida.vaciar()
+
+
+FORMATOS = {
+    'csv': (generar_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (generar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+async def _iterar_async(iterator):
+    # Bajo ASGI, Django consumiría entero un iterador síncrono antes de enviarlo.
+    # Cada bloque se pide en el hilo de la conexión a la base de datos.
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    while (bloque := await siguiente(iterator, None)) is not None:
+        yield bloque
+
+
+def respuesta_exportacion(request, carros, formato, nombre):
+    """StreamingHttpResponse con el reporte de carros en CSV o XLSX."""
+    generar, content_type = FORMATOS[formato]
+    contenido = generar(filas_carros(carros))
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        contenido = _iterar_async(contenido)
+    response = StreamingHttpResponse(contenido, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return response
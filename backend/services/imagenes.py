@@ -0,0 +1,122 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import cache
+from .models import Carro
+
+logger = logging.getLogger(__name__)
+
+CARPETA_MINIATURAS = 'carros/miniaturas'
+CALIDAD_WEBP = 80
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _storage():
+    return Carro._meta.get_field('foto').storage
+
+
+def abrir_imagen(archivo):
+    """
+    Decodifica la imagen completa (así se detectan archivos truncados o que no son
+    imágenes), la rota según su orientación EXIF y la deja en RGB/RGBA.
+    Lanza ValueError si no es una imagen válida.
+    """
+    try:
+        imagen = Image.open(archivo)
+        imagen.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f"La foto no es una imagen válida: {e}")
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode not in ('RGB', 'RGBA'):
+        transparente = 'A' in imagen.mode or 'transparency' in imagen.info
+        imagen = imagen.convert('RGBA' if transparente else 'RGB')
+    return imagen
+
+
+def a_webp(imagen, lado):
+    """WebP de `imagen` reducida para caber en un cuadrado de `lado` px, sin metadatos."""
+    copia = imagen.copy()
+    copia.thumbnail((lado, lado), Image.LANCZOS)
+    salida = io.BytesIO()
+    # Sin exif= ni icc_profile= Pillow no copia los metadatos del original
+    copia.save(salida, format='WEBP', quality=CALIDAD_WEBP, method=4)
+    return ContentFile(salida.getvalue())
+
+
+def procesar_foto(carro_id):
+    """
+    Re-codifica la foto del carro como WebP (sin EXIF, con un lado máximo de
+    CARRO_FOTO_LADO_MAX) y genera las miniaturas de CARRO_FOTO_MINIATURAS en
+    carros/miniaturas/. Reemplaza el archivo subido y guarda las rutas en
+    Carro.foto_miniaturas. Devuelve las miniaturas, o None si no había nada que hacer.
+    """
+    fila = Carro.objects.filter(pk=carro_id).values_list('foto', 'empresa_id', 'foto_miniaturas').first()
+    if not fila or not fila[0]:
+        return None
+    nombre, empresa_id, anteriores = fila
+    storage = _storage()
+
+    try:
+        with storage.open(nombre, 'rb') as archivo:
+            imagen = abrir_imagen(archivo)
+    except (ValueError, OSError) as e:
+        logger.warning(f"No se pudo procesar la foto del carro {carro_id}: {e}")
+        Carro.objects.filter(pk=carro_id, foto=nombre).update(foto_miniaturas={'error': str(e)})
+        return None
+
+    base = os.path.splitext(os.path.basename(nombre))[0]
+    original = storage.save(f'carros/{base}.webp', a_webp(imagen, settings.CARRO_FOTO_LADO_MAX))
+    miniaturas = {
+        str(lado): storage.save(f'{CARPETA_MINIATURAS}/{base}_{lado}.webp', a_webp(imagen, lado))
+        for lado in settings.CARRO_FOTO_MINIATURAS
+    }
+
+    # Solo si la foto no cambió mientras se procesaba; si cambió, la nueva tendrá su propia tarea
+    actualizados = Carro.objects.filter(pk=carro_id, foto=nombre).update(foto=original, foto_miniaturas=miniaturas)
+    if not actualizados:
+        for ruta in [original, *miniaturas.values()]:
+            storage.delete(ruta)
+        return None
+    for ruta in [nombre, *(ruta for lado, ruta in (anteriores or {}).items() if lado.isdigit())]:
+        storage.delete(ruta)
+    # update() no dispara las señales que invalidan el cache de la empresa
+    cache.invalidate_empresa(empresa_id)
+    return miniaturas
+
+
+def _procesar(carro_id):
+    try:
+        procesar_foto(carro_id)
+    except Exception as e:
+        logger.error(f"Error al procesar la foto del carro {carro_id}: {e}")
+    finally:
+        close_old_connections()
+
+
+def encolar_foto(carro_id):
+    """Procesa la foto del carro en un hilo de fondo, fuera del request."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.CARRO_FOTO_WORKERS, thread_name_prefix='carro-foto')
+    _executor.submit(_procesar, carro_id)
+
+
+def miniaturas_urls(carro):
+    """{lado: url} de las miniaturas ya generadas ({} mientras la foto está pendiente)."""
+    storage = _storage()
+    return {
+        lado: storage.url(ruta)
+        for lado, ruta in (carro.foto_miniaturas or {}).items()
+        if lado.isdigit()
+    }
@@ -0,0 +1,141 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache, cola, rollups, tiempo_real
+from .models import Carro, normalizar_placa
+from .serializer import CarroBulkSerializer, CarroSerializer
+
+CSV_COLUMNAS = ['placa', 'marca', 'color', 'modelo', 'numero_telefono', 'precio', 'estado', 'dia_llegada', 'empresa']
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+def leer_csv(archivo):
+    """Filas de un CSV con encabezado (columnas de CSV_COLUMNAS); las celdas vacías se omiten."""
+    try:
+        texto = io.TextIOWrapper(archivo, encoding='utf-8-sig')
+        return [
+            {columna: valor.strip() for columna, valor in fila.items() if columna in CSV_COLUMNAS and valor and valor.strip()}
+            for fila in csv.DictReader(texto)
+        ]
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise LoteInvalido(f"CSV inválido: {e}")
+
+
+def _validar_tamano(filas):
+    if not isinstance(filas, list) or not filas:
+        raise LoteInvalido("Se esperaba una lista de carros no vacía.")
+    if len(filas) > settings.CARROS_BULK_MAX:
+        raise LoteInvalido(f"Se pueden enviar como máximo {settings.CARROS_BULK_MAX} carros por lote.")
+
+
+def _invalidar_empresas(empresa_ids):
+    # bulk_create/bulk_update no disparan las señales que invalidan el cache
+    for empresa_id in set(empresa_ids):
+        cache.invalidate_empresa(empresa_id)
+
+
+def crear_carros(empresa_id, filas, empresa_por_defecto=None):
+    """
+    Registra varios carros de la empresa `empresa_id` (la del usuario, que ya
+    resolvió request.tenant; None si no tiene) en una sola transacción. Valida
+    todas las filas en una pasada; si alguna tiene errores no se guarda ninguna.
+    Devuelve (ok, resultados) con un resultado por fila.
+    """
+    _validar_tamano(filas)
+    if empresa_por_defecto is not None:
+        filas = [{'empresa': empresa_por_defecto, **fila} if isinstance(fila, dict) else fila for fila in filas]
+
+    empresas = {empresa_id} if empresa_id is not None else set()
+    serializer = CarroBulkSerializer(data=filas, many=True, context={'empresas': empresas})
+    if not serializer.is_valid():
+        errores = serializer.errors
+        if not isinstance(errores, list):
+            raise LoteInvalido("Se esperaba una lista de carros.")
+        return False, [
+            {'fila': numero, 'ok': not error, **({'errores': error} if error else {})}
+            for numero, error in enumerate(errores, start=1)
+        ]
+
+    carros = []
+    for datos in serializer.validated_data:
+        empresa_id = datos.pop('empresa')
+        carro = Carro(empresa_id=empresa_id, placa_normalizada=normalizar_placa(datos.get('placa')), **datos)
+        cola.preparar_transicion(carro, None)
+        carros.append(carro)
+
+    with transaction.atomic():
+        Carro.objects.bulk_create(carros)
+        rollups.aplicar_lote([rollups.contribucion_de(carro) for carro in carros], signo=1)
+        _invalidar_empresas(carro.empresa_id for carro in carros)
+        tiempo_real.publicar([tiempo_real.mensaje_creado(carro) for carro in carros])
+
+    return True, [
+        {'fila': numero, 'ok': True, 'carro': CarroSerializer(carro).data}
+        for numero, carro in enumerate(carros, start=1)
+    ]
+
+
+def cambiar_estados(empresa_id, cambios):
+    """
+    Cambia el estado de varios carros de la empresa `empresa_id` en una sola
+    transacción. Cada cambio es {'id': ..., 'estado': ...}; al pasar a
+    'terminado' se completa dia_salida si estaba vacío. Si algún cambio es
+    inválido no se aplica ninguno. Devuelve (ok, resultados) con un resultado por cambio.
+    """
+    _validar_tamano(cambios)
+    estados_validos = dict(Carro.ESTADO_CHOICES)
+    cambios = [cambio if isinstance(cambio, dict) else {} for cambio in cambios]
+    ids = [cambio.get('id') for cambio in cambios]
+    carros = Carro.objects.filter(empresa_id=empresa_id, id__in=[i for i in ids if type(i) is int]).in_bulk()
+
+    resultados = []
+    vistos = set()
+    for cambio in cambios:
+        errores = {}
+        carro_id, estado = cambio.get('id'), cambio.get('estado')
+        if type(carro_id) is not int or carro_id not in carros:
+            errores['id'] = "Carro no encontrado."
+        elif carro_id in vistos:
+            errores['id'] = "Carro repetido en el lote."
+        else:
+            vistos.add(carro_id)
+        if not isinstance(estado, str) or estado not in estados_validos:
+            errores['estado'] = f"Debe ser uno de: {', '.join(estados_validos)}."
+        resultados.append({'id': carro_id, 'ok': not errores, **({'errores': errores} if errores else {})})
+
+    if not all(resultado['ok'] for resultado in resultados):
+        return False, resultados
+
+    ahora = timezone.now()
+    anteriores, modificados, mensajes = [], [], []
+    for cambio in cambios:
+        carro = carros[cambio['id']]
+        anterior = rollups.contribucion_de(carro)
+        valores_anteriores = {campo: getattr(carro, campo) for campo in ['estado', 'dia_salida', 'dia_inicio', 'bahia']}
+        carro.estado = cambio['estado']
+        if carro.estado == 'terminado' and carro.dia_salida is None:
+            carro.dia_salida = ahora
+        cola.preparar_transicion(carro, valores_anteriores['estado'], ahora)
+        if rollups.contribucion_de(carro) != anterior:
+            anteriores.append(anterior)
+            modificados.append(carro)
+            mensajes.append(tiempo_real.mensaje_actualizado(carro, valores_anteriores))
+
+    with transaction.atomic():
+        Carro.objects.bulk_update(modificados, ['estado', 'dia_salida', 'dia_inicio', 'bahia'])
+        rollups.aplicar_lote(anteriores, signo=-1)
+        rollups.aplicar_lote([rollups.contribucion_de(carro) for carro in modificados], signo=1)
+        _invalidar_empresas(carro.empresa_id for carro in modificados)
+        tiempo_real.publicar([mensaje for mensaje in mensajes if mensaje])
+
+    for resultado in resultados:
+        carro = carros[resultado['id']]
+        resultado.update(estado=carro.estado, dia_salida=carro.dia_salida)
+    return True, resultados
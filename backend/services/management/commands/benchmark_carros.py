@@ -0,0 +1,141 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from services.models import Carro, Empresa, normalizar_placa
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea una base de datos temporal, la llena con carros de prueba y mide "
+        "las consultas más frecuentes sin y con los índices de Carro."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=1_000_000, help='Cantidad de carros a generar.')
+        parser.add_argument('--empresas', type=int, default=200, help='Cantidad de empresas entre las que repartirlos.')
+        parser.add_argument('--repeat', type=int, default=5, help='Repeticiones por consulta.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keepdb', action='store_true', help='No eliminar la base de datos temporal al terminar.')
+
+    def handle(self, *args, **options):
+        # Nunca se toca la base de datos real: se usa la misma base temporal que los tests
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False, keepdb=options['keepdb'])
+        try:
+            empresa = self.seed(options['cars'], options['empresas'], options['batch_size'])
+            queries = self.get_queries(empresa)
+
+            self.drop_indexes()
+            self.stdout.write(self.style.MIGRATE_HEADING('\nSin índices'))
+            before = self.run_queries(queries, options['repeat'])
+
+            self.create_indexes()
+            self.stdout.write(self.style.MIGRATE_HEADING('\nCon índices'))
+            after = self.run_queries(queries, options['repeat'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nResumen (mediana)'))
+            for name in queries:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f"  {name:<24} {before[name]:>10.2f} ms -> {after[name]:>8.2f} ms  (x{speedup:.1f})")
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def seed(self, total, n_empresas, batch_size):
+        self.stdout.write(f"Generando {n_empresas} empresas y {total} carros...")
+        start = time.perf_counter()
+        users = User.objects.bulk_create(
+            User(username=f'bench{i}') for i in range(n_empresas)
+        )
+        Empresa.objects.bulk_create(
+            Empresa(nombre=f'Empresa {i}', usuario=user) for i, user in enumerate(users)
+        )
+        empresas = list(Empresa.objects.order_by('id'))
+
+        rng = random.Random(42)
+        now = timezone.now()
+        estados = [choice for choice, _ in Carro.ESTADO_CHOICES]
+        batch = []
+        for i in range(total):
+            llegada = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 3))
+            estado = rng.choice(estados)
+            placa = f'{chr(65 + i % 26)}{chr(65 + (i // 26) % 26)}{chr(65 + (i // 676) % 26)}-{i % 1000:03d}'
+            batch.append(Carro(
+                placa=placa,
+                placa_normalizada=normalizar_placa(placa),
+                marca='Toyota',
+                numero_telefono='999999999',
+                precio=Decimal(rng.randint(15, 80)),
+                estado=estado,
+                dia_llegada=llegada,
+                dia_salida=llegada + timedelta(minutes=rng.randint(20, 180)) if estado == 'terminado' else None,
+                empresa=empresas[rng.randrange(len(empresas))],
+            ))
+            if len(batch) >= batch_size:
+                Carro.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Carro.objects.bulk_create(batch)
+        self.stdout.write(f"  listo en {time.perf_counter() - start:.1f} s")
+        return empresas[0]
+
+    def get_queries(self, empresa):
+        carros = Carro.objects.filter(empresa=empresa)
+        hace_6_meses = timezone.now() - timedelta(days=180)
+        return {
+            'listado_paginado': lambda: list(carros.order_by('-dia_llegada', '-id')[:50]),
+            'conteo_por_estado': lambda: carros.filter(estado='terminado').count(),
+            'ultimos_6_meses': lambda: carros.filter(dia_llegada__gte=hace_6_meses).count(),
+            'placa_prefijo': lambda: list(carros.placa_prefijo('ABC')[:20]),
+        }
+
+    def run_queries(self, queries, repeat):
+        results = {}
+        for name, run in queries.items():
+            with connection.execute_wrapper(self.capture_sql):
+                self.last_sql = None
+                run()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(timings)
+            self.stdout.write(self.style.SQL_KEYWORD(f"\n{name}: {results[name]:.2f} ms (mediana de {repeat})"))
+            for line in self.explain(*self.last_sql):
+                self.stdout.write(f"    {line}")
+        return results
+
+    def capture_sql(self, execute, sql, params, many, context):
+        self.last_sql = (sql, params)
+        return execute(sql, params, many, context)
+
+    def explain(self, sql, params):
+        prefix = 'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for index in Carro._meta.indexes:
+                editor.remove_index(Carro, index)
+        self.analyze()
+
+    def create_indexes(self):
+        with connection.schema_editor() as editor:
+            for index in Carro._meta.indexes:
+                editor.add_index(Carro, index)
+        self.analyze()
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,160 @@
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.utils import timezone
+
+from services.models import Carro, Empresa, normalizar_placa
+
+MODOS = [
+    ('normal', 'django.db.backends.sqlite3'),
+    ('alta concurrencia', 'services.sqlite_concurrente'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide altas y lecturas de carros por segundo con varios hilos a la vez sobre "
+        "bases SQLite temporales, con la configuración normal y con SQLITE_ALTA_CONCURRENCIA."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--segundos', type=float, default=5, help='Duración de cada medición.')
+        parser.add_argument('--escritores', type=int, default=4, help='Hilos que registran carros.')
+        parser.add_argument('--lectores', type=int, default=4, help='Hilos que leen el listado.')
+        parser.add_argument('--carros', type=int, default=5000, help='Carros iniciales en la base.')
+        parser.add_argument('--empresas', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Este benchmark es solo para SQLite.")
+        # Nunca se toca la base de datos real: cada modo usa su propio archivo temporal
+        settings_dict = connection.settings_dict
+        original = {'ENGINE': settings_dict['ENGINE'], 'NAME': settings_dict['NAME']}
+        resultados = {}
+        with tempfile.TemporaryDirectory() as directorio:
+            try:
+                for modo, engine in MODOS:
+                    self.stdout.write(self.style.MIGRATE_HEADING(f'\nModo {modo}'))
+                    self.usar_base(engine, os.path.join(directorio, f"{modo.replace(' ', '_')}.sqlite3"))
+                    call_command('migrate', verbosity=0, interactive=False)
+                    empresas = self.seed(options['carros'], options['empresas'])
+                    resultados[modo] = self.medir(empresas, options['segundos'], options['escritores'], options['lectores'])
+            finally:
+                self.usar_base(original['ENGINE'], original['NAME'])
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nResumen'))
+        for modo, resultado in resultados.items():
+            self.stdout.write(
+                f"  {modo:<18} {resultado['altas']:>8.1f} altas/s  {resultado['lecturas']:>8.1f} lecturas/s  "
+                f"p95 alta {resultado['p95_alta']:>7.1f} ms  errores {resultado['errores']}"
+            )
+
+    def usar_base(self, engine, nombre):
+        # Los hilos abren conexiones nuevas con estos datos; la de este hilo se reabre
+        connections.close_all()
+        connection.settings_dict['ENGINE'] = engine
+        connection.settings_dict['NAME'] = nombre
+        del connections['default']
+
+    def seed(self, total, n_empresas):
+        users = User.objects.bulk_create(User(username=f'bench{i}') for i in range(n_empresas))
+        Empresa.objects.bulk_create(Empresa(nombre=f'Empresa {i}', usuario=user) for i, user in enumerate(users))
+        empresas = list(Empresa.objects.values_list('id', flat=True))
+        rng = random.Random(42)
+        ahora = timezone.now()
+        Carro.objects.bulk_create(
+            (
+                self.carro(rng, empresas, ahora - timedelta(minutes=rng.randint(0, 60 * 24 * 365)), i)
+                for i in range(total)
+            ),
+            batch_size=1000,
+        )
+        return empresas
+
+    def carro(self, rng, empresas, llegada, numero):
+        placa = f'{chr(65 + numero % 26)}{chr(65 + (numero // 26) % 26)}{chr(65 + (numero // 676) % 26)}-{numero % 1000:03d}'
+        return Carro(
+            placa=placa,
+            placa_normalizada=normalizar_placa(placa),
+            marca='Toyota',
+            numero_telefono='999999999',
+            precio=Decimal(rng.randint(15, 80)),
+            estado='espera',
+            dia_llegada=llegada,
+            empresa_id=rng.choice(empresas),
+        )
+
+    def medir(self, empresas, segundos, escritores, lectores):
+        fin = time.perf_counter() + segundos
+        latencias, lecturas, errores = [], [0], [0]
+        lock = threading.Lock()
+
+        def escribir(semilla):
+            # Como un check-in: lee la empresa y registra el carro en la misma transacción
+            rng = random.Random(semilla)
+            numero = semilla * 1_000_000
+            try:
+                while time.perf_counter() < fin:
+                    inicio = time.perf_counter()
+                    try:
+                        with transaction.atomic():
+                            empresa_id = Empresa.objects.filter(pk=rng.choice(empresas)).values_list('id', flat=True).get()
+                            Carro.objects.bulk_create([self.carro(rng, [empresa_id], timezone.now(), numero)])
+                    except OperationalError:
+                        with lock:
+                            errores[0] += 1
+                        continue
+                    numero += 1
+                    with lock:
+                        latencias.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                connections.close_all()
+
+        def leer(semilla):
+            rng = random.Random(semilla)
+            try:
+                while time.perf_counter() < fin:
+                    try:
+                        list(Carro.objects.filter(empresa_id=rng.choice(empresas)).order_by('-dia_llegada', '-id')[:50])
+                    except OperationalError:
+                        with lock:
+                            errores[0] += 1
+                        continue
+                    with lock:
+                        lecturas[0] += 1
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=escribir, args=(i + 1,)) for i in range(escritores)]
+        hilos += [threading.Thread(target=leer, args=(i + 1,)) for i in range(lectores)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal = cursor.fetchone()[0]
+        resultado = {
+            'altas': len(latencias) / duracion,
+            'lecturas': lecturas[0] / duracion,
+            'p95_alta': statistics.quantiles(latencias, n=20)[-1] if len(latencias) >= 2 else 0.0,
+            'errores': errores[0],
+        }
+        self.stdout.write(
+            f"  journal_mode={journal}: {resultado['altas']:.1f} altas/s, {resultado['lecturas']:.1f} lecturas/s, "
+            f"p95 alta {resultado['p95_alta']:.1f} ms, {resultado['errores']} errores (database is locked)"
+        )
+        return resultado
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.imagenes import procesar_foto
+from services.models import Carro
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-codifica las fotos de carros pendientes y genera sus miniaturas (las que "
+        "quedaron sin procesar, p. ej. si el servidor se reinició). Con --todas "
+        "regenera las de todos los carros con foto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help='Procesar todas las fotos, no solo las pendientes.')
+        parser.add_argument('--every', type=int, metavar='SEGUNDOS',
+                            help='Quedarse corriendo y buscar pendientes cada SEGUNDOS.')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        while True:
+            carros = Carro.objects.exclude(foto='').exclude(foto__isnull=True)
+            if not options['todas']:
+                carros = carros.filter(foto_miniaturas={})
+            procesadas = sum(
+                1 for carro_id in list(carros.values_list('id', flat=True)) if procesar_foto(carro_id)
+            )
+            self.stdout.write(self.style.SUCCESS(f"{procesadas} fotos procesadas"))
+            if not every:
+                return
+            time.sleep(every)
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.eventos import procesar_eventos
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica en lotes los eventos del webhook de Culqi pendientes (CulqiEvent) a "
+        "Subscription, Card y Customer. Con --every se queda corriendo como worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, metavar='SEGUNDOS',
+                            help='Cuando la cola queda vacía, volver a revisarla cada SEGUNDOS.')
+        parser.add_argument('--batch-size', type=int,
+                            help='Eventos por lote (por defecto CULQI_EVENTS_BATCH_SIZE).')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        while True:
+            total = 0
+            while procesados := procesar_eventos(options['batch_size']):
+                total += procesados
+            if total or not every:
+                self.stdout.write(self.style.SUCCESS(f"{total} eventos procesados"))
+            if not every:
+                return
+            time.sleep(every)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.rollups import reconstruir_estadisticas_diarias
+
+
+class Command(BaseCommand):
+    help = "Reconstruye desde cero el resumen diario de estadísticas (EmpresaDailyStats) a partir de Carro."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', dest='empresas',
+                            help='Reconstruir solo esta empresa (se puede repetir).')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        creadas = reconstruir_estadisticas_diarias(options['empresas'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{creadas} filas de resumen creadas en {time.perf_counter() - start:.1f} s"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from services.busqueda import get_backend
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea (si falta) y reconstruye el índice de búsqueda de carros y reclamos. "
+        "En SQLite hay que correrlo después de una migración que reconstruya las "
+        "tablas services_carro o services_reclamo, porque eso borra sus triggers."
+    )
+
+    def handle(self, *args, **options):
+        backend = get_backend(connection)
+        backend.instalar(connection)
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido ({type(backend).__name__})"))
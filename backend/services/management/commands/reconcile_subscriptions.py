@@ -0,0 +1,33 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from services.suscripciones import reconciliar_suscripciones
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconcilia la tabla Subscription con las suscripciones de Culqi. Con --every "
+        "se queda corriendo y reconcilia periódicamente (para usar como tarea programada)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, metavar='SEGUNDOS',
+                            help='Repetir la reconciliación cada SEGUNDOS.')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        while True:
+            try:
+                guardadas, inactivadas = reconciliar_suscripciones()
+                self.stdout.write(self.style.SUCCESS(
+                    f"{guardadas} suscripciones sincronizadas, {inactivadas} marcadas como inactivas"
+                ))
+            except requests.exceptions.RequestException as e:
+                if not every:
+                    raise CommandError(f"No se pudieron obtener las suscripciones de Culqi: {e}")
+                self.stderr.write(f"No se pudieron obtener las suscripciones de Culqi: {e}")
+            if not every:
+                return
+            time.sleep(every)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.analitica import refrescar_estadisticas_plataforma
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula los resúmenes globales de la plataforma (PlataformaDailyStats y "
+        "PlataformaResumen). Con --every se queda corriendo y los recalcula periódicamente."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, metavar='SEGUNDOS',
+                            help='Repetir el cálculo cada SEGUNDOS.')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        while True:
+            start = time.perf_counter()
+            refrescar_estadisticas_plataforma()
+            self.stdout.write(self.style.SUCCESS(
+                f"Estadísticas de la plataforma recalculadas en {time.perf_counter() - start:.1f} s"
+            ))
+            if not every:
+                return
+            time.sleep(every)
@@ -0,0 +1,31 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from services.planes import sincronizar_planes
+
+
+class Command(BaseCommand):
+    help = (
+        "Sincroniza los planes de Culqi en la tabla Plan. Con --every se queda "
+        "corriendo y sincroniza periódicamente (para usar como tarea programada)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, metavar='SEGUNDOS',
+                            help='Repetir la sincronización cada SEGUNDOS.')
+
+    def handle(self, *args, **options):
+        every = options['every']
+        while True:
+            try:
+                total = sincronizar_planes()
+                self.stdout.write(self.style.SUCCESS(f"{total} planes sincronizados"))
+            except requests.exceptions.RequestException as e:
+                if not every:
+                    raise CommandError(f"No se pudieron obtener los planes de Culqi: {e}")
+                self.stderr.write(f"No se pudieron obtener los planes de Culqi: {e}")
+            if not every:
+                return
+            time.sleep(every)
@@ -0,0 +1,62 @@
+import mimetypes
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Los archivos subidos no cambian de contenido (cada versión tiene otro nombre)
+MEDIA_CACHE_CONTROL = 'public, max-age=604800'
+
+
+def _ruta_normalizada(ruta):
+    ruta = posixpath.normpath(ruta).lstrip('/')
+    if ruta in ('', '.') or ruta.startswith('..'):
+        raise Http404
+    return ruta
+
+
+def _respuesta_proxy(ruta, absoluta):
+    """
+    Respuesta vacía con la cabecera que le indica al proxy (nginx o Apache) que
+    envíe el archivo él mismo, sin que los bytes pasen por el worker de Python.
+    """
+    response = HttpResponse(content_type=mimetypes.guess_type(ruta)[0] or 'application/octet-stream')
+    if settings.MEDIA_SENDFILE == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + ruta
+    else:
+        response['X-Sendfile'] = absoluta
+    return response
+
+
+@require_safe
+def servir_media(request, ruta):
+    """
+    Entrega un archivo de MEDIA_URL. Con almacenamiento local lo manda el proxy
+    (MEDIA_SENDFILE) o, en desarrollo, Django en bloques con FileResponse; con
+    un almacenamiento remoto (S3) redirige a su URL.
+    """
+    ruta = _ruta_normalizada(ruta)
+    if not isinstance(default_storage, FileSystemStorage):
+        if not default_storage.exists(ruta):
+            raise Http404
+        return HttpResponseRedirect(default_storage.url(ruta))
+
+    try:
+        absoluta = safe_join(default_storage.location, ruta)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(absoluta):
+        raise Http404
+
+    if settings.MEDIA_SENDFILE:
+        response = _respuesta_proxy(ruta, absoluta)
+    else:
+        response = FileResponse(open(absoluta, 'rb'))
+        response['Last-Modified'] = http_date(os.path.getmtime(absoluta))
+    response['Cache-Control'] = MEDIA_CACHE_CONTROL
+    return response
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0013_empresa_direccion_empresa_ruc'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['empresa', 'estado'], name='carro_empresa_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['empresa', 'dia_llegada'], name='carro_empresa_llegada_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['placa'], name='carro_placa_idx'),
+        ),
+    ]
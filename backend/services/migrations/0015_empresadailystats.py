@@ -0,0 +1,66 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:17
+
+from django.db import migrations, models
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def poblar_resumen(apps, schema_editor):
+    # Copia de services.rollups.filas_agregadas de esta fecha: la migración no debe
+    # depender del código actual de la app, que puede cambiar después
+    Carro = apps.get_model('services', 'Carro')
+    EmpresaDailyStats = apps.get_model('services', 'EmpresaDailyStats')
+    duracion = ExpressionWrapper(F('dia_salida') - F('dia_llegada'), output_field=DurationField())
+    con_salida = Q(dia_salida__isnull=False, dia_salida__gte=F('dia_llegada'))
+    filas = (
+        Carro.objects.annotate(fecha=TruncDate('dia_llegada', tzinfo=timezone.get_current_timezone()))
+        .values('empresa_id', 'fecha', 'estado')
+        .order_by()
+        .annotate(
+            cantidad=Count('id'),
+            ingresos=Sum('precio'),
+            carros_con_salida=Count('id', filter=con_salida),
+            duracion=Sum(duracion, filter=con_salida),
+        )
+    )
+
+    def resumen():
+        for fila in filas:
+            duracion_total = fila.pop('duracion')
+            yield EmpresaDailyStats(
+                ingresos=fila.pop('ingresos') or 0,
+                segundos_servicio=int(duracion_total.total_seconds()) if duracion_total else 0,
+                **fila,
+            )
+
+    EmpresaDailyStats.objects.bulk_create(resumen(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0014_carro_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmpresaDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('espera', 'En Espera'), ('proceso', 'En Proceso'), ('terminado', 'Terminado')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('carros_con_salida', models.IntegerField(default=0)),
+                ('segundos_servicio', models.BigIntegerField(default=0)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas_diarias', to='services.empresa')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='empresadailystats',
+            constraint=models.UniqueConstraint(fields=('empresa', 'fecha', 'estado'), name='empresa_fecha_estado_unique'),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
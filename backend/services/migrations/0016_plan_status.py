@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0015_empresadailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plan',
+            name='status',
+            field=models.IntegerField(default=1),
+        ),
+    ]
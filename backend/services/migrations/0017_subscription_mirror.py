@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0016_plan_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='customer_id',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(fields=['user', '-creation_date'], name='subscription_user_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0018_culqievent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reclamo',
+            index=models.Index(fields=['-fecha'], name='reclamo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reclamo',
+            index=models.Index(fields=['estado', '-fecha'], name='reclamo_estado_fecha_idx'),
+        ),
+    ]
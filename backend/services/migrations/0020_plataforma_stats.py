@@ -0,0 +1,40 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0019_reclamo_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlataformaDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('estado', models.CharField(choices=[('espera', 'En Espera'), ('proceso', 'En Proceso'), ('terminado', 'Terminado')], max_length=10)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('empresas', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlataformaResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generado_en', models.DateTimeField(auto_now_add=True)),
+                ('empresas', models.IntegerField(default=0)),
+                ('usuarios', models.IntegerField(default=0)),
+                ('suscripciones_por_plan', models.JSONField(default=dict)),
+                ('reclamos_por_estado', models.JSONField(default=dict)),
+                ('reclamo_pendiente_mas_antiguo', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='plataformadailystats',
+            constraint=models.UniqueConstraint(fields=('fecha', 'estado'), name='plataforma_fecha_estado_unique'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0020_plataforma_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='foto_miniaturas',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0021_carro_foto_miniaturas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='carro',
+            name='bahia',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='carro',
+            name='dia_inicio',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='bahias',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Bahías de lavado'),
+        ),
+    ]
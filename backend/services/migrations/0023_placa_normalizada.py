@@ -0,0 +1,44 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+def normalizar_placa(placa):
+    # Copia de services.models.normalizar_placa de esta fecha: la migración no debe
+    # depender del código actual de la app, que puede cambiar después
+    return ''.join(caracter for caracter in (placa or '').upper() if caracter.isalnum())
+
+
+def normalizar_placas(apps, schema_editor):
+    Carro = apps.get_model('services', 'Carro')
+    carros = []
+    for carro in Carro.objects.only('id', 'placa').iterator(chunk_size=2000):
+        carro.placa_normalizada = normalizar_placa(carro.placa)
+        carros.append(carro)
+        if len(carros) >= 2000:
+            Carro.objects.bulk_update(carros, ['placa_normalizada'])
+            carros = []
+    Carro.objects.bulk_update(carros, ['placa_normalizada'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0022_cola_lavado'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='carro',
+            name='carro_placa_idx',
+        ),
+        migrations.AddField(
+            model_name='carro',
+            name='placa_normalizada',
+            field=models.CharField(default='', editable=False, max_length=10),
+        ),
+        migrations.RunPython(normalizar_placas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='carro',
+            index=models.Index(fields=['empresa', 'placa_normalizada', 'dia_llegada'], name='carro_empresa_placa_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+from django.db import migrations
+
+# DDL de services.busqueda de esta fecha, copiado aquí: la migración no debe
+# depender del código actual de la app, que puede cambiar después. Para
+# reinstalar el índice con el código actual está rebuild_search_index.
+SQL = {
+    # Tablas FTS5 con contenido externo que los triggers mantienen al día
+    'sqlite': {
+        'instalar': [
+            "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_carro USING fts5("
+            "placa, marca, modelo, color, numero_telefono, content='services_carro', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_carro_ai AFTER INSERT ON services_carro BEGIN "
+            "INSERT INTO busqueda_carro(rowid, placa, marca, modelo, color, numero_telefono) "
+            "VALUES (new.id, new.placa, new.marca, new.modelo, new.color, new.numero_telefono); END",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_carro_ad AFTER DELETE ON services_carro BEGIN "
+            "INSERT INTO busqueda_carro(busqueda_carro, rowid, placa, marca, modelo, color, numero_telefono) "
+            "VALUES ('delete', old.id, old.placa, old.marca, old.modelo, old.color, old.numero_telefono); END",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_carro_au AFTER UPDATE OF placa, marca, modelo, color, numero_telefono "
+            "ON services_carro BEGIN "
+            "INSERT INTO busqueda_carro(busqueda_carro, rowid, placa, marca, modelo, color, numero_telefono) "
+            "VALUES ('delete', old.id, old.placa, old.marca, old.modelo, old.color, old.numero_telefono); "
+            "INSERT INTO busqueda_carro(rowid, placa, marca, modelo, color, numero_telefono) "
+            "VALUES (new.id, new.placa, new.marca, new.modelo, new.color, new.numero_telefono); END",
+            "INSERT INTO busqueda_carro(busqueda_carro) VALUES ('rebuild')",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS busqueda_reclamo USING fts5("
+            "nombre, email, mensaje, content='services_reclamo', "
+            "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_reclamo_ai AFTER INSERT ON services_reclamo BEGIN "
+            "INSERT INTO busqueda_reclamo(rowid, nombre, email, mensaje) "
+            "VALUES (new.id, new.nombre, new.email, new.mensaje); END",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_reclamo_ad AFTER DELETE ON services_reclamo BEGIN "
+            "INSERT INTO busqueda_reclamo(busqueda_reclamo, rowid, nombre, email, mensaje) "
+            "VALUES ('delete', old.id, old.nombre, old.email, old.mensaje); END",
+            "CREATE TRIGGER IF NOT EXISTS busqueda_reclamo_au AFTER UPDATE OF nombre, email, mensaje "
+            "ON services_reclamo BEGIN "
+            "INSERT INTO busqueda_reclamo(busqueda_reclamo, rowid, nombre, email, mensaje) "
+            "VALUES ('delete', old.id, old.nombre, old.email, old.mensaje); "
+            "INSERT INTO busqueda_reclamo(rowid, nombre, email, mensaje) "
+            "VALUES (new.id, new.nombre, new.email, new.mensaje); END",
+            "INSERT INTO busqueda_reclamo(busqueda_reclamo) VALUES ('rebuild')",
+        ],
+        'desinstalar': [
+            "DROP TRIGGER IF EXISTS busqueda_carro_ai",
+            "DROP TRIGGER IF EXISTS busqueda_carro_ad",
+            "DROP TRIGGER IF EXISTS busqueda_carro_au",
+            "DROP TABLE IF EXISTS busqueda_carro",
+            "DROP TRIGGER IF EXISTS busqueda_reclamo_ai",
+            "DROP TRIGGER IF EXISTS busqueda_reclamo_ad",
+            "DROP TRIGGER IF EXISTS busqueda_reclamo_au",
+            "DROP TABLE IF EXISTS busqueda_reclamo",
+        ],
+    },
+    # Índices GIN sobre la misma expresión que usa BusquedaPostgres.buscar
+    'postgresql': {
+        'instalar': [
+            "CREATE INDEX IF NOT EXISTS busqueda_carro_gin ON services_carro USING GIN ((to_tsvector('simple', "
+            "coalesce(\"placa\", '') || ' ' || coalesce(\"marca\", '') || ' ' || coalesce(\"modelo\", '') || ' ' || "
+            "coalesce(\"color\", '') || ' ' || coalesce(\"numero_telefono\", ''))))",
+            "CREATE INDEX IF NOT EXISTS busqueda_reclamo_gin ON services_reclamo USING GIN ((to_tsvector('spanish', "
+            "coalesce(\"nombre\", '') || ' ' || coalesce(\"email\", '') || ' ' || coalesce(\"mensaje\", ''))))",
+        ],
+        'desinstalar': [
+            "DROP INDEX IF EXISTS busqueda_carro_gin",
+            "DROP INDEX IF EXISTS busqueda_reclamo_gin",
+        ],
+    },
+}
+
+
+def ejecutar(paso):
+    def operacion(apps, schema_editor):
+        # Otras bases de datos buscan con icontains, sin índice
+        sentencias = SQL.get(schema_editor.connection.vendor, {}).get(paso, [])
+        with schema_editor.connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0023_placa_normalizada'),
+    ]
+
+    operations = [
+        migrations.RunPython(ejecutar('instalar'), ejecutar('desinstalar')),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-17 23:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('services', '0024_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRefresco',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('vence', models.DateTimeField()),
+                ('revocado', models.DateTimeField(blank=True, null=True)),
+                ('invalido_antes', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens_refresco', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0025_token_refresco'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subscription',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
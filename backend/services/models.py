@@ -9,10 +9,29 @@ class Empresa(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='empresa')
     ruc = models.CharField(max_length=15, blank=True, null=True, verbose_name="RUC")  # Nuevo campo opcional
     direccion = models.CharField(max_length=255, blank=True, null=True, verbose_name="Dirección")  # Nuevo campo para dirección
+    bahias = models.PositiveSmallIntegerField(default=1, verbose_name="Bahías de lavado")  # carros que se lavan a la vez
 
     def __str__(self):
         return self.nombre
 
+def normalizar_placa(placa):
+    """Placa en mayúsculas y sin guiones ni espacios: 'abc-123' y 'ABC123' son la misma."""
+    return ''.join(caracter for caracter in (placa or '').upper() if caracter.isalnum())
+
+class CarroQuerySet(models.QuerySet):
+    def placa_prefijo(self, prefijo):
+        # Rango [prefijo, siguiente) en lugar de LIKE 'prefijo%': LIKE no usa el
+        # índice de placa en SQLite (es case-insensitive) ni en Postgres sin
+        # varchar_pattern_ops, el rango sí.
+        prefijo = normalizar_placa(prefijo)
+        if not prefijo:
+            return self
+        siguiente = prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+        return self.filter(placa_normalizada__gte=prefijo, placa_normalizada__lt=siguiente)
+
+    def de_placa(self, placa):
+        return self.filter(placa_normalizada=normalizar_placa(placa))
+
 class Carro(models.Model):
     ESTADO_CHOICES = [
         ('espera', 'En Espera'),
@@ -21,20 +40,105 @@ class Carro(models.Model):
     ]
 
     placa = models.CharField(max_length=10, validators=[RegexValidator(r'^[A-Z0-9-]+$','Ingrese una placa válida.')])
+    # normalizar_placa(placa), se completa al guardar; es la que se usa para buscar
+    placa_normalizada = models.CharField(max_length=10, editable=False, default='')
     marca = models.CharField(max_length=50)
     color = models.CharField(max_length=30, blank=True, null=True)
     modelo = models.CharField(max_length=30, blank=True, null=True)
     foto = models.ImageField(upload_to='carros/', blank=True, null=True, verbose_name="Foto del carro")
+    # {lado en px: ruta de la miniatura WebP}; vacío mientras la foto está pendiente (services/imagenes.py)
+    foto_miniaturas = models.JSONField(default=dict, blank=True)
     dia_llegada = models.DateTimeField(default=timezone.now)
     dia_salida = models.DateTimeField(null=True, blank=True)
+    # Cola de lavado (services/cola.py): cuándo pasó a proceso y en qué bahía
+    dia_inicio = models.DateTimeField(null=True, blank=True)
+    bahia = models.PositiveSmallIntegerField(null=True, blank=True)
     numero_telefono = models.CharField(max_length=15, validators=[RegexValidator(r'^\+?1?\d{9,15}$','Número de teléfono no válido.')])
     precio = models.DecimalField(max_digits=8, decimal_places=2)
     estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='espera')
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='carros')
 
+    objects = CarroQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Conteos por estado en las estadísticas de la empresa
+            models.Index(fields=['empresa', 'estado'], name='carro_empresa_estado_idx'),
+            # Listado paginado por llegada y rangos de fechas
+            models.Index(fields=['empresa', 'dia_llegada'], name='carro_empresa_llegada_idx'),
+            # Búsqueda por placa (prefijo e historial del cliente)
+            models.Index(fields=['empresa', 'placa_normalizada', 'dia_llegada'], name='carro_empresa_placa_idx'),
+        ]
+
     def __str__(self):
         return f"{self.marca} ({self.placa})"
 
+class EmpresaDailyStats(models.Model):
+    """
+    Resumen diario de los carros de una empresa por estado, mantenido por las
+    señales de Carro (ver services/signals.py). Se reconstruye con
+    `manage.py rebuild_empresa_stats`.
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='estadisticas_diarias')
+    fecha = models.DateField()  # día de llegada
+    estado = models.CharField(max_length=10, choices=Carro.ESTADO_CHOICES)
+    cantidad = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Para el tiempo promedio llegada -> salida, solo carros con dia_salida
+    carros_con_salida = models.IntegerField(default=0)
+    segundos_servicio = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'fecha', 'estado'], name='empresa_fecha_estado_unique'),
+        ]
+
+    @property
+    def tiempo_promedio(self):
+        if not self.carros_con_salida:
+            return None
+        return self.segundos_servicio / self.carros_con_salida
+
+    def __str__(self):
+        return f"{self.empresa} {self.fecha} {self.estado}: {self.cantidad}"
+
+
+class PlataformaDailyStats(models.Model):
+    """
+    Resumen diario de todos los carros de la plataforma por estado, para la
+    analítica del administrador. Se recalcula periódicamente desde
+    EmpresaDailyStats con `manage.py refresh_platform_stats`.
+    """
+    fecha = models.DateField()  # día de llegada
+    estado = models.CharField(max_length=10, choices=Carro.ESTADO_CHOICES)
+    cantidad = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    empresas = models.IntegerField(default=0)  # empresas con carros ese día y estado
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'estado'], name='plataforma_fecha_estado_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.estado}: {self.cantidad}"
+
+
+class PlataformaResumen(models.Model):
+    """
+    Foto de los totales globales de la plataforma, generada junto con
+    PlataformaDailyStats. Solo se conserva la última.
+    """
+    generado_en = models.DateTimeField(auto_now_add=True)
+    empresas = models.IntegerField(default=0)
+    usuarios = models.IntegerField(default=0)
+    suscripciones_por_plan = models.JSONField(default=dict)  # {plan_id: suscripciones activas}
+    reclamos_por_estado = models.JSONField(default=dict)
+    reclamo_pendiente_mas_antiguo = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Resumen de la plataforma {self.generado_en:%Y-%m-%d %H:%M}"
+
 class Plan(models.Model):
     culqi_id = models.CharField(max_length=100, unique=True)
     name = models.CharField(max_length=255)
@@ -44,6 +148,7 @@ class Plan(models.Model):
     currency = models.CharField(max_length=10)
     interval_unit_time = models.CharField(max_length=50)
     interval_count = models.IntegerField()
+    status = models.IntegerField(default=1)  # según culqi (1=activo, 2=inactivo)
     metadata = models.JSONField(default=dict, blank=True)
 
     def __str__(self):
@@ -82,14 +187,45 @@ class Subscription(models.Model):
     subscription_id = models.CharField(max_length=50, unique=True)
     plan_id = models.CharField(max_length=50)
     card_id = models.CharField(max_length=50)
+    customer_id = models.CharField(max_length=50, blank=True, null=True)  # id del customer en Culqi
     status = models.IntegerField()  # según culqi (1=activo,2=inactivo,3=otro)
     creation_date = models.DateTimeField(blank=True, null=True)
     next_billing_date = models.DateTimeField(blank=True, null=True)
     metadata = models.JSONField(blank=True, null=True, default=dict)
+    # Último guardado local; la reconciliación solo inactiva las que no cambiaron desde que empezó
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Listado "mis suscripciones": filtra por usuario y ordena por fecha
+            models.Index(fields=['user', '-creation_date'], name='subscription_user_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"Subscription {self.subscription_id} - User {self.user}"
 
+
+class CulqiEvent(models.Model):
+    """
+    Evento recibido por el webhook de Culqi, guardado tal cual llegó (solo se
+    agrega). Un worker los aplica después en lotes; processed_at marca los ya aplicados.
+    """
+    event_id = models.CharField(max_length=100, unique=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [
+            # Cola de pendientes: processed_at nulo, en orden de llegada
+            models.Index(fields=['processed_at', 'id'], name='culqievent_pendientes_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} {self.event_id}"
+
 class Reclamo(models.Model):
     ESTADO_CHOICES = [
         ('pendiente', 'Pendiente'),
@@ -105,5 +241,29 @@ class Reclamo(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
     respuesta = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Panel de administración: últimos reclamos, con o sin filtro por estado
+            models.Index(fields=['-fecha'], name='reclamo_fecha_idx'),
+            models.Index(fields=['estado', '-fecha'], name='reclamo_estado_fecha_idx'),
+        ]
+
     def __str__(self):
         return f"Reclamo de {self.nombre} - {self.fecha.strftime('%Y-%m-%d')}"
+
+
+class TokenRefresco(models.Model):
+    """
+    Sesión del modo de tokens firmados (services/autenticacion.py). Se guarda
+    solo el sha256 del token de refresco, que cambia cada vez que se usa. Los
+    tokens de acceso de la sesión emitidos antes de invalido_antes se rechazan.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tokens_refresco')
+    clave = models.CharField(max_length=64, unique=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    vence = models.DateTimeField()
+    revocado = models.DateTimeField(blank=True, null=True)
+    invalido_antes = models.DateTimeField(blank=True, null=True, db_index=True)
+
+    def __str__(self):
+        return f"Sesión {self.pk} de {self.usuario_id}"
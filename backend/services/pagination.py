@@ -0,0 +1,136 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class CarroCursorPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (dia_llegada, id), del más reciente al más antiguo.
+
+    El cursor guarda la última fila entregada, así cada página es un
+    `WHERE (dia_llegada, id) < (x, y) ORDER BY ... LIMIT n` que usa el índice
+    y cuesta lo mismo sin importar cuántos carros tenga la empresa.
+    """
+    cursor_query_param = 'cursor'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        if reverse:
+            queryset = queryset.order_by('dia_llegada', 'id')
+        else:
+            queryset = queryset.order_by('-dia_llegada', '-id')
+
+        if self.cursor:
+            llegada, pk = self.cursor['position']
+            if reverse:
+                queryset = queryset.filter(Q(dia_llegada__gt=llegada) | Q(dia_llegada=llegada, id__gt=pk))
+            else:
+                queryset = queryset.filter(Q(dia_llegada__lt=llegada) | Q(dia_llegada=llegada, id__lt=pk))
+
+        # Se pide una fila extra para saber si existe otra página sin hacer count()
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii'))
+            llegada = parse_datetime(data['d'])
+            pk = int(data['i'])
+            if llegada is None:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return {'position': (llegada, pk), 'reverse': bool(data.get('r'))}
+
+    def encode_cursor(self, carro, reverse):
+        data = {'d': carro.dia_llegada.isoformat(), 'i': carro.pk}
+        if reverse:
+            data['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Página vacía al retroceder más allá del inicio: volver a la primera
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AdminPagination(PageNumberPagination):
+    """
+    Paginación por número de página para los listados del panel de administración.
+    Devuelve `count` para que el panel muestre el total sin descargar todas las filas.
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class BusquedaPagination(PageNumberPagination):
+    """Resultados de búsqueda ordenados por relevancia, por número de página."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,114 @@
+import threading
+from bisect import bisect_left, insort
+
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+
+from . import cache
+from .models import Carro, normalizar_placa
+
+# Placas de cada empresa ordenadas en memoria para autocompletar con búsqueda
+# binaria. Igual que la cola de lavado (services/cola.py): se arma en el primer
+# pedido, las señales agregan las placas nuevas y si la versión de la empresa
+# cambió por otra vía se vuelve a armar.
+
+
+class IndicePlacas:
+    def __init__(self, version, placas):
+        self.version = version
+        self.lock = threading.Lock()
+        self.originales = dict(placas)  # normalizada -> placa tal como se escribió la última vez
+        self.ordenadas = sorted(self.originales)
+
+    def agregar(self, normalizada, placa):
+        if normalizada not in self.originales:
+            insort(self.ordenadas, normalizada)
+        self.originales[normalizada] = placa
+
+    def buscar(self, prefijo, limite):
+        inicio = bisect_left(self.ordenadas, prefijo)
+        resultado = []
+        for normalizada in self.ordenadas[inicio:inicio + limite]:
+            if not normalizada.startswith(prefijo):
+                break
+            resultado.append({'placa': self.originales[normalizada], 'placa_normalizada': normalizada})
+        return resultado
+
+
+_indices = {}
+_indices_lock = threading.Lock()
+
+
+def construir_indice(empresa_id, version):
+    placas = (
+        Carro.objects.filter(empresa_id=empresa_id)
+        .order_by('dia_llegada')
+        .values_list('placa_normalizada', 'placa')
+    )
+    return IndicePlacas(version, placas.iterator())
+
+
+def obtener_indice(empresa_id):
+    version = cache.get_version('empresa', empresa_id)
+    with _indices_lock:
+        indice = _indices.get(empresa_id)
+    if indice is not None and indice.version == version:
+        return indice
+    indice = construir_indice(empresa_id, version)
+    with _indices_lock:
+        _indices[empresa_id] = indice
+    return indice
+
+
+def autocompletar(empresa_id, prefijo, limite=10):
+    """Placas de la empresa que empiezan con `prefijo` (sin distinguir guiones ni mayúsculas)."""
+    prefijo = normalizar_placa(prefijo)
+    if not prefijo:
+        return []
+    indice = obtener_indice(empresa_id)
+    with indice.lock:
+        return indice.buscar(prefijo, limite)
+
+
+def _agregar(empresa_id, normalizada, placa):
+    with _indices_lock:
+        indice = _indices.get(empresa_id)
+    if indice is None:
+        return
+    with indice.lock:
+        indice.agregar(normalizada, placa)
+        # Misma regla que la cola: solo sigue al día si este fue el único cambio
+        if cache.get_version('empresa', empresa_id) == indice.version + 1:
+            indice.version += 1
+
+
+def carro_guardado(carro):
+    transaction.on_commit(lambda: _agregar(carro.empresa_id, carro.placa_normalizada, carro.placa))
+
+
+def historial(carros, placa):
+    """
+    Visitas, gasto (carros terminados) y última visita de una placa en una sola
+    consulta por el índice de placa_normalizada, más los datos del último carro
+    para precargar el formulario.
+    """
+    visitas = carros.de_placa(placa)
+    resumen = visitas.aggregate(
+        visitas=Count('id'),
+        gasto_total=Sum('precio', filter=Q(estado='terminado')),
+        ultima_visita=Max('dia_llegada'),
+    )
+    ultimo = None
+    if resumen['visitas']:
+        ultimo = (
+            visitas.order_by('-dia_llegada')
+            .values('placa', 'marca', 'modelo', 'color', 'numero_telefono')
+            .first()
+        )
+    return {
+        'placa': normalizar_placa(placa),
+        'visitas': resumen['visitas'],
+        'gasto_total': float(resumen['gasto_total'] or 0),
+        'ultima_visita': resumen['ultima_visita'],
+        'ultimo_carro': ultimo,
+    }
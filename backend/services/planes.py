@@ -0,0 +1,156 @@
+import logging
+import threading
+import time
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .culqi_gateway import get_gateway
+from .models import Plan
+
+logger = logging.getLogger(__name__)
+
+CULQI_PLANS_PATH = "recurrent/plans"
+
+PLANES_CACHE_KEY = 'culqi-plans:data'
+SINCRONIZADO_CACHE_KEY = 'culqi-plans:synced-at'
+REFRESCO_LOCK_KEY = 'culqi-plans:refreshing'
+
+PLAN_FIELDS = ['name', 'short_name', 'description', 'amount', 'currency', 'interval_unit_time', 'interval_count', 'status', 'metadata']
+
+
+def obtener_planes_culqi(page_size=100):
+    """Descarga todos los planes de Culqi recorriendo los cursores de paginación."""
+    planes = []
+    params = {'limit': page_size}
+    while True:
+        response = get_gateway().get(CULQI_PLANS_PATH, params=params)
+        response.raise_for_status()
+        culqi_response = response.json()
+        data = culqi_response.get('data')
+        if isinstance(data, dict):
+            data = [data]
+        planes.extend(data or [])
+
+        after = (culqi_response.get('cursors') or {}).get('after')
+        if not data or not after or not culqi_response.get('remaining_items'):
+            return planes
+        params['after'] = after
+
+
+def plan_desde_culqi(data):
+    return Plan(
+        culqi_id=data['id'],
+        name=data.get('name') or '',
+        short_name=data.get('short_name') or '',
+        description=data.get('description') or '',
+        amount=Decimal(data.get('amount') or 0),
+        currency=data.get('currency') or '',
+        interval_unit_time=str(data.get('interval_unit_time') or ''),
+        interval_count=data.get('interval_count') or 0,
+        status=data.get('status') or 1,
+        metadata=data.get('metadata') or {},
+    )
+
+
+def sincronizar_planes():
+    """
+    Trae los planes de Culqi y los guarda en Plan con un solo upsert masivo.
+    Los planes que ya no existen en Culqi se eliminan. Devuelve la cantidad sincronizada.
+    """
+    planes = [plan_desde_culqi(data) for data in obtener_planes_culqi()]
+    with transaction.atomic():
+        Plan.objects.bulk_create(
+            planes,
+            update_conflicts=True,
+            unique_fields=['culqi_id'],
+            update_fields=PLAN_FIELDS,
+        )
+        Plan.objects.exclude(culqi_id__in=[plan.culqi_id for plan in planes]).delete()
+    cache.set(SINCRONIZADO_CACHE_KEY, time.time(), timeout=None)
+    cache.delete(PLANES_CACHE_KEY)
+    logger.info(f"Planes de Culqi sincronizados: {len(planes)}")
+    return len(planes)
+
+
+def plan_a_dict(plan):
+    # Misma forma que devuelve Culqi, que es la que usa el frontend
+    amount = plan.amount
+    return {
+        'id': plan.culqi_id,
+        'name': plan.name,
+        'short_name': plan.short_name,
+        'description': plan.description,
+        'amount': int(amount) if amount == amount.to_integral_value() else float(amount),
+        'currency': plan.currency,
+        'interval_unit_time': plan.interval_unit_time,
+        'interval_count': plan.interval_count,
+        'status': plan.status,
+        'metadata': plan.metadata,
+    }
+
+
+def _refrescar():
+    try:
+        sincronizar_planes()
+    except requests.exceptions.RequestException as e:
+        logger.warning(f"No se pudieron refrescar los planes de Culqi: {e}")
+    finally:
+        cache.delete(REFRESCO_LOCK_KEY)
+        close_old_connections()
+
+
+def refrescar_en_segundo_plano():
+    # cache.add actúa como lock para no lanzar varias sincronizaciones a la vez
+    if cache.add(REFRESCO_LOCK_KEY, True, timeout=60):
+        threading.Thread(target=_refrescar, daemon=True).start()
+
+
+def esta_desactualizado():
+    sincronizado = cache.get(SINCRONIZADO_CACHE_KEY)
+    return sincronizado is None or time.time() - sincronizado > settings.CULQI_PLANS_MAX_AGE
+
+
+def listar_planes():
+    """
+    Planes servidos desde la base de datos con un cache de CULQI_PLANS_CACHE_TIMEOUT.
+    Culqi solo se consulta en línea si todavía no hay planes locales; si están
+    desactualizados se devuelven igual y se refrescan en segundo plano.
+    """
+    planes = cache.get(PLANES_CACHE_KEY)
+    if planes is not None:
+        return planes
+
+    planes = [plan_a_dict(plan) for plan in Plan.objects.order_by('amount', 'id')]
+    if not planes:
+        sincronizar_planes()
+        planes = [plan_a_dict(plan) for plan in Plan.objects.order_by('amount', 'id')]
+    elif esta_desactualizado():
+        refrescar_en_segundo_plano()
+    cache.set(PLANES_CACHE_KEY, planes, timeout=settings.CULQI_PLANS_CACHE_TIMEOUT)
+    return planes
+
+
+def filtrar_planes(planes, params):
+    """Aplica los filtros que aceptaba la API de Culqi: amount, min_amount, max_amount, status y limit."""
+    def numero(name):
+        value = params.get(name)
+        return float(value) if value not in (None, '') else None
+
+    amount, min_amount, max_amount = numero('amount'), numero('min_amount'), numero('max_amount')
+    status = numero('status')
+    limit = numero('limit')
+
+    resultado = [
+        plan for plan in planes
+        if (amount is None or plan['amount'] == amount)
+        and (min_amount is None or plan['amount'] >= min_amount)
+        and (max_amount is None or plan['amount'] <= max_amount)
+        and (status is None or plan['status'] == status)
+    ]
+    if limit is not None:
+        resultado = resultado[:int(limit)]
+    return resultado
@@ -0,0 +1,115 @@
+import contextvars
+import random
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpRequest
+from rest_framework.request import Request
+
+# Réplicas de lectura: toda base de datos de DATABASES distinta de 'default'.
+# Solo leen de ellas las vistas marcadas con @leer_de_replica (listados,
+# estadísticas y panel de administración); el resto sigue en la primaria. Un
+# usuario que escribió lee de la primaria durante REPLICAS_PIN_SEGUNDOS, así ve
+# sus cambios aunque la réplica vaya atrasada.
+
+_en_replica = contextvars.ContextVar('en_replica', default=False)
+_escribio = contextvars.ContextVar('escribio', default=False)
+
+
+def replicas():
+    return [alias for alias in settings.DATABASES if alias != DEFAULT_DB_ALIAS]
+
+
+def _pin_key(user_id):
+    return f'replicas-pin:{user_id}'
+
+
+def fijar_a_primaria(user_id):
+    cache.set(_pin_key(user_id), True, timeout=settings.REPLICAS_PIN_SEGUNDOS)
+
+
+def fijado_a_primaria(user):
+    return user.is_authenticated and cache.get(_pin_key(user.pk)) is not None
+
+
+class RouterReplicas:
+    def __init__(self):
+        self.replicas = replicas()
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or not _en_replica.get() or _escribio.get():
+            return DEFAULT_DB_ALIAS
+        # Dentro de una transacción se lee lo que ella misma escribió
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        # Desde aquí el request lee de la primaria; el middleware fija al usuario
+        _escribio.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primaria y réplicas tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por la replicación
+        return db == DEFAULT_DB_ALIAS
+
+
+def leer_de_replica(view_func):
+    """
+    Las lecturas de la vista van a una réplica, salvo que el usuario haya escrito
+    hace menos de REPLICAS_PIN_SEGUNDOS. Sirve para métodos de viewsets y vistas
+    @api_view; debajo de @cache_response para no mirar el pin si hay respuesta cacheada.
+    """
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, (Request, HttpRequest)))
+        if not replicas() or fijado_a_primaria(request.user):
+            return view_func(*args, **kwargs)
+        token = _en_replica.set(True)
+        try:
+            return view_func(*args, **kwargs)
+        finally:
+            _en_replica.reset(token)
+    return wrapper
+
+
+class ReplicasMiddleware:
+    """Si el request escribió en la base de datos, fija al usuario a la primaria por un rato."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _despues(self, request, token):
+        escribio = _escribio.get()
+        _escribio.reset(token)
+        user = getattr(request, 'user', None)
+        if escribio and user is not None and user.is_authenticated:
+            fijar_a_primaria(user.pk)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _escribio.set(False)
+        try:
+            return self.get_response(request)
+        finally:
+            self._despues(request, token)
+
+    async def __acall__(self, request):
+        token = _escribio.set(False)
+        try:
+            return await self.get_response(request)
+        finally:
+            self._despues(request, token)
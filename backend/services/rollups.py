@@ -0,0 +1,106 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Carro, EmpresaDailyStats
+
+
+def contribucion(empresa_id, dia_llegada, dia_salida, estado, precio):
+    """Clave (empresa, día, estado) y valores que aporta un carro al resumen diario."""
+    clave = (empresa_id, timezone.localdate(dia_llegada), estado)
+    segundos = 0
+    con_salida = 0
+    if dia_salida and dia_salida >= dia_llegada:
+        segundos = int((dia_salida - dia_llegada).total_seconds())
+        con_salida = 1
+    return clave, (Decimal(precio or 0), con_salida, segundos)
+
+
+def contribucion_de(carro):
+    return contribucion(carro.empresa_id, carro.dia_llegada, carro.dia_salida, carro.estado, carro.precio)
+
+
+def aplicar(clave, valores, signo, cantidad=1):
+    """
+    Suma (signo=1) o resta (signo=-1) la contribución de un carro con un UPDATE
+    atómico. Con `cantidad` los valores son la suma de varios carros (ver aplicar_lote).
+    """
+    empresa_id, fecha, estado = clave
+    precio, con_salida, segundos = valores
+    filas = EmpresaDailyStats.objects.filter(empresa_id=empresa_id, fecha=fecha, estado=estado)
+    cambios = {
+        'cantidad': F('cantidad') + signo * cantidad,
+        'ingresos': F('ingresos') + signo * precio,
+        'carros_con_salida': F('carros_con_salida') + signo * con_salida,
+        'segundos_servicio': F('segundos_servicio') + signo * segundos,
+    }
+    if filas.update(**cambios) or signo < 0:
+        return
+    try:
+        with transaction.atomic():
+            EmpresaDailyStats.objects.create(
+                empresa_id=empresa_id, fecha=fecha, estado=estado, cantidad=cantidad,
+                ingresos=precio, carros_con_salida=con_salida, segundos_servicio=segundos,
+            )
+    except IntegrityError:
+        # Otro proceso creó la fila entre el UPDATE y el INSERT
+        filas.update(**cambios)
+
+
+def aplicar_lote(contribuciones, signo):
+    """
+    Aplica las contribuciones de muchos carros (p. ej. después de un bulk_create o
+    bulk_update, que no disparan las señales) con un UPDATE por (empresa, día, estado).
+    """
+    agrupadas = defaultdict(lambda: [0, Decimal(0), 0, 0])
+    for clave, (precio, con_salida, segundos) in contribuciones:
+        total = agrupadas[clave]
+        total[0] += 1
+        total[1] += precio
+        total[2] += con_salida
+        total[3] += segundos
+    for clave, (cantidad, precio, con_salida, segundos) in agrupadas.items():
+        aplicar(clave, (precio, con_salida, segundos), signo, cantidad=cantidad)
+
+
+def filas_agregadas(carros):
+    """Agrega un queryset de carros por (empresa, día, estado) en una sola consulta."""
+    duracion = ExpressionWrapper(F('dia_salida') - F('dia_llegada'), output_field=DurationField())
+    con_salida = Q(dia_salida__isnull=False, dia_salida__gte=F('dia_llegada'))
+    filas = (
+        carros.annotate(fecha=TruncDate('dia_llegada', tzinfo=timezone.get_current_timezone()))
+        .values('empresa_id', 'fecha', 'estado')
+        .order_by()
+        .annotate(
+            cantidad=Count('id'),
+            ingresos=Sum('precio'),
+            carros_con_salida=Count('id', filter=con_salida),
+            duracion=Sum(duracion, filter=con_salida),
+        )
+    )
+    for fila in filas:
+        duracion_total = fila.pop('duracion')
+        fila['ingresos'] = fila['ingresos'] or 0
+        fila['segundos_servicio'] = int(duracion_total.total_seconds()) if duracion_total else 0
+        yield fila
+
+
+def reconstruir_estadisticas_diarias(empresa_ids=None, batch_size=1000):
+    """Borra y recalcula el resumen diario desde Carro. Devuelve la cantidad de filas creadas."""
+    carros = Carro.objects.all()
+    resumen = EmpresaDailyStats.objects.all()
+    if empresa_ids is not None:
+        carros = carros.filter(empresa_id__in=empresa_ids)
+        resumen = resumen.filter(empresa_id__in=empresa_ids)
+
+    with transaction.atomic():
+        resumen.delete()
+        creadas = EmpresaDailyStats.objects.bulk_create(
+            (EmpresaDailyStats(**fila) for fila in filas_agregadas(carros)),
+            batch_size=batch_size,
+        )
+    return len(creadas)
@@ -1,17 +1,40 @@
+from django.conf import settings
 from rest_framework import serializers
+from .imagenes import miniaturas_urls
 from .models import Carro, Empresa, Plan, Customer, Card, Subscription, Reclamo
 
 class EmpresaSerializer(serializers.ModelSerializer):
     class Meta:
         model = Empresa
-        fields = ['id', 'nombre', 'ruc', 'direccion']
+        fields = ['id', 'nombre', 'ruc', 'direccion', 'bahias']
+
+    def validate_bahias(self, value):
+        if value < 1:
+            raise serializers.ValidationError("La empresa debe tener al menos una bahía.")
+        return value
 
 class CarroSerializer(serializers.ModelSerializer):
     empresa = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), write_only=True)
+    foto_miniaturas = serializers.SerializerMethodField()
 
     class Meta:
         model = Carro
-        fields = ['id', 'placa', 'marca', 'color', 'modelo', 'foto', 'dia_llegada', 'dia_salida', 'numero_telefono', 'precio', 'estado', 'empresa']
+        fields = ['id', 'placa', 'marca', 'color', 'modelo', 'foto', 'foto_miniaturas', 'dia_llegada', 'dia_salida', 'dia_inicio', 'bahia', 'numero_telefono', 'precio', 'estado', 'empresa']
+        read_only_fields = ['dia_inicio', 'bahia']
+
+    def get_foto_miniaturas(self, obj):
+        urls = miniaturas_urls(obj)
+        request = self.context.get('request')
+        if request is not None:
+            return {lado: request.build_absolute_uri(url) for lado, url in urls.items()}
+        return urls
+
+    def validate_foto(self, value):
+        if value and value.size > settings.CARRO_FOTO_MAX_BYTES:
+            raise serializers.ValidationError(
+                f"La foto no puede pesar más de {settings.CARRO_FOTO_MAX_BYTES // (1024 * 1024)} MB."
+            )
+        return value
 
     def validate_precio(self, value):
         if value < 0:
@@ -32,11 +55,26 @@ class CarroSerializer(serializers.ModelSerializer):
         empresa = validated_data.pop('empresa', None)
         if empresa is not None:
             instance.empresa = empresa
+        if 'foto' in validated_data:
+            # Las miniaturas de la foto anterior ya no sirven; se generan de nuevo
+            instance.foto_miniaturas = {}
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         return instance
 
+class CarroBulkSerializer(CarroSerializer):
+    """
+    Fila del alta masiva de carros. La empresa se valida contra la del usuario,
+    que viene en el contexto, sin una consulta por fila.
+    """
+    empresa = serializers.IntegerField(write_only=True)
+
+    def validate_empresa(self, value):
+        if value not in self.context['empresas']:
+            raise serializers.ValidationError("Empresa no encontrada.")
+        return value
+
 class PlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = Plan
@@ -0,0 +1,153 @@
+from functools import partial
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import autenticacion, cache, cola, imagenes, placas, rollups, tiempo_real
+from .models import Carro, Customer, Empresa, normalizar_placa
+
+
+@receiver(pre_save, sender=Carro)
+def guardar_contribucion_anterior(sender, instance, raw=False, **kwargs):
+    # Se lee la fila actual para poder restar lo que aportaba antes del cambio
+    # y para publicar solo los campos que cambiaron
+    instance._contribucion_anterior = None
+    instance._valores_anteriores = None
+    instance.placa_normalizada = normalizar_placa(instance.placa)
+    if raw:
+        return
+    anterior = None
+    if not instance._state.adding and instance.pk is not None:
+        anterior = Carro.objects.filter(pk=instance.pk).values('empresa_id', *tiempo_real.CAMPOS_EVENTO).first()
+    if anterior:
+        instance._valores_anteriores = anterior
+        instance._contribucion_anterior = rollups.contribucion(
+            anterior['empresa_id'], anterior['dia_llegada'], anterior['dia_salida'], anterior['estado'], anterior['precio'],
+        )
+    cola.preparar_transicion(instance, anterior['estado'] if anterior else None)
+
+
+@receiver(post_save, sender=Carro)
+def actualizar_resumen_diario(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, '_contribucion_anterior', None)
+    nueva = rollups.contribucion_de(instance)
+    if anterior == nueva:
+        return
+    if anterior:
+        rollups.aplicar(*anterior, signo=-1)
+    rollups.aplicar(*nueva, signo=1)
+
+
+@receiver(post_delete, sender=Carro)
+def descontar_resumen_diario(sender, instance, **kwargs):
+    rollups.aplicar(*rollups.contribucion_de(instance), signo=-1)
+
+
+@receiver(post_save, sender=Carro)
+@receiver(post_delete, sender=Carro)
+def invalidar_cache_carro(sender, instance, **kwargs):
+    cache.invalidate_empresa(instance.empresa_id)
+    anterior = getattr(instance, '_contribucion_anterior', None)
+    if anterior and anterior[0][0] != instance.empresa_id:
+        # El carro se movió de empresa
+        cache.invalidate_empresa(anterior[0][0])
+
+
+@receiver(post_save, sender=Carro)
+def publicar_cambios_carro(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    tiempo_real.publicar_carro_guardado(instance, None if created else getattr(instance, '_valores_anteriores', None))
+
+
+@receiver(post_delete, sender=Carro)
+def publicar_carro_eliminado(sender, instance, **kwargs):
+    tiempo_real.publicar([tiempo_real.mensaje_eliminado(instance.empresa_id, instance.pk)])
+
+
+@receiver(post_save, sender=Carro)
+def actualizar_cola_y_placas(sender, instance, raw=False, **kwargs):
+    # Después de invalidar_cache_carro, para que la cola vea la versión nueva de la empresa
+    if raw:
+        return
+    anterior = getattr(instance, '_valores_anteriores', None)
+    cola.carro_guardado(instance, anterior['estado'] if anterior else None)
+    placas.carro_guardado(instance)
+
+
+@receiver(post_delete, sender=Carro)
+def quitar_de_cola(sender, instance, **kwargs):
+    cola.carro_eliminado(instance)
+
+
+@receiver(post_save, sender=Carro)
+def procesar_foto_nueva(sender, instance, raw=False, **kwargs):
+    # Foto recién subida: se re-codifica y se generan las miniaturas cuando el
+    # carro ya está guardado, en un hilo aparte para no demorar el request
+    if raw or not instance.foto or instance.foto_miniaturas:
+        return
+    transaction.on_commit(partial(imagenes.encolar_foto, instance.pk))
+
+
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_cache_empresa(sender, instance, **kwargs):
+    cache.invalidate_empresa(instance.pk)
+    cache.invalidate_usuario(instance.usuario_id)
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidar_cache_customer(sender, instance, **kwargs):
+    cache.invalidate_usuario(instance.user_id)
+
+
+@receiver(post_delete, sender=Token)
+def invalidar_token(sender, instance, **kwargs):
+    # Logout, rotación o usuario borrado
+    autenticacion.invalidar_token(instance.key)
+
+
+@receiver(pre_save, sender=User)
+def detectar_cambio_de_clave(sender, instance, raw=False, **kwargs):
+    instance._clave_cambiada = False
+    instance._datos_token_cambiados = False
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    anterior = User.objects.filter(pk=instance.pk).values('password', 'is_active', 'is_staff').first()
+    if anterior is None:
+        return
+    instance._clave_cambiada = anterior['password'] != instance.password
+    # Datos que llevan los tokens de acceso firmados
+    instance._datos_token_cambiados = (anterior['is_active'], anterior['is_staff']) != (instance.is_active, instance.is_staff)
+
+
+@receiver(post_save, sender=User)
+def invalidar_tokens_usuario(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    if getattr(instance, '_clave_cambiada', False):
+        # Con la clave nueva hay que volver a iniciar sesión
+        Token.objects.filter(user=instance).delete()
+        autenticacion.invalidar_accesos_usuario(instance.pk, revocar=True)
+        return
+    autenticacion.invalidar_usuario(instance.pk)
+    if getattr(instance, '_datos_token_cambiados', False):
+        autenticacion.invalidar_accesos_usuario(instance.pk, revocar=not instance.is_active)
+
+
+@receiver(post_save, sender=Empresa)
+def refrescar_accesos_empresa_nueva(sender, instance, created, raw=False, **kwargs):
+    # Los tokens firmados llevan la empresa del usuario: al crearla o borrarla se refrescan
+    if created and not raw:
+        autenticacion.invalidar_accesos_usuario(instance.usuario_id)
+
+
+@receiver(post_delete, sender=Empresa)
+def refrescar_accesos_empresa_borrada(sender, instance, **kwargs):
+    autenticacion.invalidar_accesos_usuario(instance.usuario_id)
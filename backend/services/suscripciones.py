@@ -0,0 +1,155 @@
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from .culqi_gateway import get_gateway
+from .models import Customer, Plan, Subscription
+from .planes import plan_a_dict
+
+logger = logging.getLogger(__name__)
+
+CULQI_SUBSCRIPTIONS_PATH = "recurrent/subscriptions"
+
+# Estado local de una suscripción cancelada o que ya no existe en Culqi
+SUSCRIPCION_INACTIVA = 2
+
+SUBSCRIPTION_FIELDS = ['user', 'plan_id', 'card_id', 'customer_id', 'status', 'creation_date', 'next_billing_date', 'metadata', 'updated_at']
+
+
+def _id(value):
+    # Culqi devuelve plan, card y customer a veces como objeto y a veces solo el id
+    if isinstance(value, dict):
+        return value.get('id')
+    return value
+
+
+def _fecha(timestamp):
+    # Según la documentación, son timestamps en segundos, no ms
+    if timestamp is None:
+        return None
+    return datetime.datetime.fromtimestamp(timestamp, tz=datetime.timezone.utc)
+
+
+def _timestamp(fecha):
+    if fecha is None:
+        return None
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return int(fecha.timestamp())
+
+
+def suscripcion_desde_culqi(data, user_id):
+    return Subscription(
+        user_id=user_id,
+        subscription_id=data['id'],
+        plan_id=_id(data.get('plan')) or data.get('plan_id') or '',
+        card_id=_id(data.get('card')) or data.get('card_id') or '',
+        customer_id=_id(data.get('customer')) or data.get('customer_id'),
+        status=data.get('status', 3),
+        creation_date=_fecha(data.get('creation_date')),
+        next_billing_date=_fecha(data.get('next_billing_date')),
+        metadata=data.get('metadata') or {},
+    )
+
+
+def guardar_suscripciones(datos):
+    """
+    Guarda (insert o update) suscripciones en el formato de Culqi con un solo
+    upsert masivo. Las de customers que no existen localmente se ignoran.
+    Devuelve la lista de subscription_id guardados.
+    """
+    customer_ids = {_id(data.get('customer')) or data.get('customer_id') for data in datos}
+    usuarios = dict(
+        Customer.objects.filter(culqi_id__in=customer_ids - {None}).values_list('culqi_id', 'user_id')
+    )
+
+    suscripciones = {}
+    for data in datos:
+        user_id = usuarios.get(_id(data.get('customer')) or data.get('customer_id'))
+        if user_id is None:
+            logger.warning(f"Suscripción {data.get('id')} de un customer desconocido, se ignora")
+            continue
+        # Si llega dos veces la misma suscripción gana la última versión
+        suscripciones[data['id']] = suscripcion_desde_culqi(data, user_id)
+
+    Subscription.objects.bulk_create(
+        suscripciones.values(),
+        update_conflicts=True,
+        unique_fields=['subscription_id'],
+        update_fields=SUBSCRIPTION_FIELDS,
+    )
+    return list(suscripciones)
+
+
+def obtener_suscripciones_culqi(page_size=100):
+    """Descarga todas las suscripciones de Culqi recorriendo los cursores de paginación."""
+    params = {'limit': page_size}
+    while True:
+        response = get_gateway().get(CULQI_SUBSCRIPTIONS_PATH, params=params)
+        response.raise_for_status()
+        culqi_response = response.json()
+        data = culqi_response.get('data') or []
+        yield data
+
+        after = (culqi_response.get('cursors') or {}).get('after')
+        if not data or not after or not culqi_response.get('remaining_items'):
+            return
+        params['after'] = after
+
+
+def reconciliar_suscripciones():
+    """
+    Compara la tabla Subscription con Culqi: guarda lo que llegó de Culqi y marca
+    como inactivas las suscripciones locales que Culqi ya no devuelve.
+    Complementa a los webhooks por si alguno se perdió. Devuelve (guardadas, inactivadas).
+
+    Si falla cualquier página la excepción corta la reconciliación antes de
+    inactivar nada, y si Culqi no devuelve ninguna tampoco se inactiva nada.
+    Las guardadas localmente mientras se recorría Culqi (una suscripción recién
+    creada) no se tocan: solo se inactivan las que no cambiaron desde el inicio.
+    """
+    inicio = timezone.now()
+    vistas = []
+    for pagina in obtener_suscripciones_culqi():
+        with transaction.atomic():
+            vistas.extend(guardar_suscripciones(pagina))
+
+    if not vistas:
+        logger.warning("Culqi no devolvió suscripciones de customers locales; no se inactiva ninguna")
+        return 0, 0
+
+    inactivadas = (
+        Subscription.objects.filter(updated_at__lt=inicio)
+        .exclude(subscription_id__in=vistas)
+        .exclude(status=SUSCRIPCION_INACTIVA)
+        .update(status=SUSCRIPCION_INACTIVA)
+    )
+    logger.info(f"Suscripciones reconciliadas: {len(vistas)} guardadas, {inactivadas} inactivadas")
+    return len(vistas), inactivadas
+
+
+def suscripciones_a_dict(suscripciones):
+    """
+    Suscripciones locales con la misma forma que devuelve Culqi (la que usa el
+    frontend), incluido el plan, que se lee de la tabla Plan en una sola consulta.
+    """
+    suscripciones = list(suscripciones)
+    planes = {
+        plan.culqi_id: plan_a_dict(plan)
+        for plan in Plan.objects.filter(culqi_id__in={s.plan_id for s in suscripciones})
+    }
+    return [
+        {
+            'id': suscripcion.subscription_id,
+            'status': suscripcion.status,
+            'creation_date': _timestamp(suscripcion.creation_date),
+            'next_billing_date': _timestamp(suscripcion.next_billing_date),
+            'plan': planes.get(suscripcion.plan_id, {'id': suscripcion.plan_id}),
+            'card': {'id': suscripcion.card_id},
+            'customer': {'id': suscripcion.customer_id},
+            'metadata': suscripcion.metadata or {},
+        }
+        for suscripcion in suscripciones
+    ]
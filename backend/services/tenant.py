@@ -0,0 +1,59 @@
+from functools import cached_property
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .cache import empresa_de_usuario
+
+# Cada usuario tiene a lo sumo una empresa (Empresa.usuario es OneToOne). El
+# middleware deja en request.tenant el acceso a ella para que los viewsets no
+# la vuelvan a buscar: se resuelve una sola vez por request, la primera vez que
+# se usa (después de que DRF autenticó al usuario), y entre requests queda en el
+# cache con la versión del usuario.
+
+
+class Tenant:
+    def __init__(self, request):
+        self._request = request
+
+    @cached_property
+    def empresa(self):
+        """Empresa del usuario autenticado, o None."""
+        user = self._request.user
+        if not user.is_authenticated:
+            return None
+        return empresa_de_usuario(user)
+
+    @cached_property
+    def empresa_id(self):
+        # Los tokens de acceso firmados ya traen la empresa: sin consultas ni cache
+        auth = getattr(self._request, 'auth', None)
+        if isinstance(auth, dict):
+            return auth['e']
+        empresa = self.empresa
+        return empresa.pk if empresa else None
+
+    def es_suya(self, empresa_id):
+        """Si `empresa_id` (como venga en la URL o en los datos) es la empresa del usuario."""
+        return self.empresa_id is not None and str(empresa_id) == str(self.empresa_id)
+
+
+class TenantMiddleware:
+    """Pone request.tenant (services.tenant.Tenant). Sirve para vistas síncronas y asíncronas."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.tenant = Tenant(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.tenant = Tenant(request)
+        return await self.get_response(request)
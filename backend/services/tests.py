@@ -1,3 +1,931 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import warnings
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections, transaction
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+
+from . import autenticacion, views
+from .cola import asignar_bahias, bahias_libres
+from .culqi_gateway import AsyncCulqiGateway, CircuitBreaker, CulqiGateway, CulqiUnavailable, set_gateway
+from .eventos import procesar_eventos
+from .lotes import cambiar_estados, crear_carros
+from .models import Carro, CulqiEvent, Customer, Empresa, EmpresaDailyStats, Subscription, TokenRefresco, normalizar_placa
+from .planes import obtener_planes_culqi
+from .replicas import ReplicasMiddleware, leer_de_replica
+from .rollups import filas_agregadas
+from .suscripciones import SUSCRIPCION_INACTIVA, reconciliar_suscripciones
+from .tiempo_real import emitir_ticket, leer_ticket
+
+
+def crear_carro(empresa, placa, **datos):
+    datos = {'marca': 'Toyota', 'numero_telefono': '999999999', 'precio': 20, **datos}
+    return Carro.objects.create(empresa=empresa, placa=placa, **datos)
+
+
+class RouterReplicasTests(TransactionTestCase):
+    """
+    RouterReplicas con la primaria y una réplica SQLite en otro archivo. La réplica
+    es una copia de la primaria tomada en setUp: lo escrito después solo está en
+    la primaria, así cada respuesta dice de qué base leyó.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=self.usuario)
+        crear_carro(self.empresa, 'AAA-111')
+        self.otro = User.objects.create_user('vecino', password='clave-segura-123')
+        crear_carro(Empresa.objects.create(nombre='Lavado Norte', usuario=self.otro), 'CCC-333')
+
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        ruta = os.path.join(directorio, 'replica.sqlite3')
+        destino = sqlite3.connect(ruta)
+        connections['default'].ensure_connection()
+        connections['default'].connection.backup(destino)
+        destino.close()
+
+        # La réplica solo existe durante el test: se registra la conexión y se
+        # vuelve a crear el router para que la vea
+        replica = connections.configure_settings({'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ruta}})['default']
+        connections.settings['replica1'] = replica
+        self.addCleanup(self.quitar_replica)
+        override = override_settings(
+            DATABASES={**settings.DATABASES, 'replica1': replica},
+            DATABASE_ROUTERS=list(settings.DATABASE_ROUTERS),
+        )
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            override.enable()
+        self.addCleanup(override.disable)
+
+        # Solo en la primaria, como si la réplica fuera atrasada
+        crear_carro(self.empresa, 'BBB-222')
+        crear_carro(Empresa.objects.get(usuario=self.otro), 'DDD-444')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def quitar_replica(self):
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+
+    def placas(self, response):
+        self.assertEqual(response.status_code, 200)
+        return sorted(carro['placa'] for carro in response.data['results'])
+
+    def test_vista_marcada_lee_de_la_replica(self):
+        self.assertEqual(self.placas(self.client.get('/api/carros/')), ['AAA-111'])
+
+    def test_lecturas_despues_de_escribir_van_a_la_primaria(self):
+        @leer_de_replica
+        def vista(request):
+            antes = Carro.objects.count()
+            Empresa.objects.filter(pk=self.empresa.pk).update(nombre='Lavado Centro')
+            return JsonResponse({'antes': antes, 'despues': Carro.objects.count()})
+
+        request = RequestFactory().get('/')
+        request.user = self.usuario
+        response = ReplicasMiddleware(vista)(request)
+        self.assertEqual(json.loads(response.content), {'antes': 2, 'despues': 4})
+
+    def editar(self, client, placa, **datos):
+        carro = Carro.objects.get(placa=placa)
+        response = client.patch(f'/api/carros/{carro.pk}/', datos, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_usuario_que_escribio_lee_de_la_primaria(self):
+        self.editar(self.client, 'BBB-222', color='Rojo')
+        self.assertEqual(self.placas(self.client.get('/api/carros/')), ['AAA-111', 'BBB-222'])
+
+        # El pin es por usuario: otro que no escribió sigue leyendo de la réplica
+        otro = APIClient()
+        otro.force_authenticate(self.otro)
+        self.assertEqual(self.placas(otro.get('/api/carros/')), ['CCC-333'])
+
+    @override_settings(REPLICAS_PIN_SEGUNDOS=1)
+    def test_usuario_vuelve_a_la_replica_cuando_vence_el_pin(self):
+        self.editar(self.client, 'BBB-222', color='Rojo')
+        self.assertEqual(self.placas(self.client.get('/api/carros/')), ['AAA-111', 'BBB-222'])
+        time.sleep(1.1)
+        self.assertEqual(self.placas(self.client.get('/api/carros/')), ['AAA-111'])
+
+    def test_vistas_sin_marcar_y_transacciones_usan_la_primaria(self):
+        carro = Carro.objects.get(placa='BBB-222')
+        response = self.client.get(f'/api/carros/{carro.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['placa'], 'BBB-222')
+
+        @leer_de_replica
+        def vista(request):
+            fuera = Carro.objects.count()
+            with transaction.atomic():
+                dentro = Carro.objects.count()
+            return JsonResponse({'fuera': fuera, 'dentro': dentro})
+
+        request = RequestFactory().get('/')
+        request.user = self.usuario
+        response = ReplicasMiddleware(vista)(request)
+        self.assertEqual(json.loads(response.content), {'fuera': 2, 'dentro': 4})
+
+
+class AutenticacionTests(TestCase):
+    """Tokens de la base de datos con cache (AUTH_TOKEN_MODO = 'db')."""
+
+    def setUp(self):
+        cache.clear()
+        autenticacion._tokens.clear()
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.client = APIClient()
+
+    def login(self, clave='clave-segura-123'):
+        response = self.client.post('/login', {'username': 'dueno', 'password': clave}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['token']
+
+    def estado(self, token):
+        return self.client.get('/api/empresas/', HTTP_AUTHORIZATION=f'Token {token}').status_code
+
+    def test_login_devuelve_token_con_vencimiento(self):
+        response = self.client.post('/login', {'username': 'dueno', 'password': 'clave-segura-123'}, format='json')
+        token = Token.objects.get(user=self.usuario)
+        self.assertEqual(response.data['token'], token.key)
+        self.assertEqual(response.data['expires'], token.created + timedelta(seconds=settings.AUTH_TOKEN_TTL))
+        self.assertEqual(self.estado(token.key), 200)
+
+    def test_token_vencido_se_rechaza_y_login_entrega_otro(self):
+        token = self.login()
+        Token.objects.filter(key=token).update(created=timezone.now() - timedelta(seconds=settings.AUTH_TOKEN_TTL + 1))
+        self.assertEqual(self.estado(token), 401)
+
+        nuevo = self.login()
+        self.assertNotEqual(nuevo, token)
+        self.assertEqual(self.estado(nuevo), 200)
+
+    def test_rotar_invalida_el_token_anterior_aunque_este_en_cache(self):
+        token = self.login()
+        self.assertEqual(self.estado(token), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/rotate_token', HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.estado(token), 401)
+        self.assertEqual(self.estado(response.data['token']), 200)
+
+    def test_logout_invalida_el_token_aunque_este_en_cache(self):
+        token = self.login()
+        self.assertEqual(self.estado(token), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/logout', HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.estado(token), 401)
+
+    def test_cambio_de_clave_y_desactivacion_invalidan_el_token(self):
+        token = self.login()
+        self.assertEqual(self.estado(token), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.set_password('otra-clave-segura-456')
+            self.usuario.save()
+        self.assertEqual(self.estado(token), 401)
+
+        token = self.login('otra-clave-segura-456')
+        self.assertEqual(self.estado(token), 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.is_active = False
+            self.usuario.save()
+        self.assertEqual(self.estado(token), 401)
+
+
+@override_settings(AUTH_TOKEN_MODO='firmado')
+class TokensFirmadosTests(TestCase):
+    """Tokens de acceso firmados con sesiones de refresco (AUTH_TOKEN_MODO = 'firmado')."""
+
+    def setUp(self):
+        cache.clear()
+        revocados = mock.patch.object(autenticacion, '_revocados', autenticacion.Revocados())
+        revocados.start()
+        self.addCleanup(revocados.stop)
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.client = APIClient()
+        response = self.client.post('/login', {'username': 'dueno', 'password': 'clave-segura-123'}, format='json')
+        self.acceso, self.refresco = response.data['token'], response.data['refresh']
+
+    def estado(self, token):
+        return self.client.get('/api/empresas/', HTTP_AUTHORIZATION=f'Token {token}').status_code
+
+    def refrescar(self, refresco):
+        return self.client.post('/refresh_token', {'refresh': refresco}, format='json')
+
+    def test_acceso_firmado_no_consulta_la_base_de_datos(self):
+        self.assertTrue(autenticacion.es_firmado(self.acceso))
+        self.assertEqual(self.estado(self.acceso), 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/test_token', HTTP_AUTHORIZATION=f'Token {self.acceso}').status_code, 200)
+
+    def test_token_alterado_se_rechaza(self):
+        datos, firma = self.acceso.rsplit(':', 1)
+        self.assertEqual(self.estado(f'{datos}:{firma[::-1]}'), 401)
+
+    def test_logout_revoca_la_sesion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/logout', HTTP_AUTHORIZATION=f'Token {self.acceso}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.estado(self.acceso), 401)
+        self.assertEqual(self.refrescar(self.refresco).status_code, 401)
+
+        # Otro proceso se entera al releer las sesiones revocadas de la base de datos
+        with mock.patch.object(autenticacion, '_revocados', autenticacion.Revocados()):
+            self.assertEqual(self.estado(self.acceso), 401)
+
+    def test_cambio_de_clave_revoca_las_sesiones(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.set_password('otra-clave-segura-456')
+            self.usuario.save()
+        self.assertEqual(self.estado(self.acceso), 401)
+        self.assertEqual(self.refrescar(self.refresco).status_code, 401)
+
+    def test_refresco_entrega_otro_par_y_el_anterior_deja_de_valer(self):
+        response = self.refrescar(self.refresco)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresco)
+        self.assertEqual(self.estado(response.data['token']), 200)
+
+        self.assertEqual(self.refrescar(self.refresco).status_code, 401)
+        self.assertEqual(self.refrescar(response.data['refresh']).status_code, 200)
+
+    def test_dos_refrescos_a_la_vez_solo_uno_gana(self):
+        sesion = TokenRefresco.objects.get(usuario=self.usuario)
+        token_urlsafe = autenticacion.secrets.token_urlsafe
+
+        def otro_refresco_gana(nbytes):
+            # Entre la lectura de la sesión y el UPDATE otro request ya la cambió
+            TokenRefresco.objects.filter(pk=sesion.pk).update(clave=autenticacion._hash('del-otro-request'))
+            return token_urlsafe(nbytes)
+
+        with mock.patch.object(autenticacion.secrets, 'token_urlsafe', side_effect=otro_refresco_gana):
+            with self.assertRaises(AuthenticationFailed):
+                autenticacion.refrescar(self.refresco)
+        self.assertEqual(TokenRefresco.objects.get(pk=sesion.pk).clave, autenticacion._hash('del-otro-request'))
+
+
+@override_settings(CULQI_WEBHOOK_USERNAME='culqi', CULQI_WEBHOOK_PASSWORD='clave-del-webhook')
+class WebhookCulqiTests(TestCase):
+    def setUp(self):
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        Customer.objects.create(user=usuario, culqi_id='cus_1')
+
+    def enviar(self, evento, usuario='culqi', clave='clave-del-webhook', esquema='Basic'):
+        credenciales = base64.b64encode(f'{usuario}:{clave}'.encode()).decode()
+        return self.client.post(
+            '/api/culqi/webhook/', evento, content_type='application/json',
+            HTTP_AUTHORIZATION=f'{esquema} {credenciales}',
+        )
+
+    def evento(self, event_id, estado):
+        return {
+            'id': event_id,
+            'type': 'subscription.update.succeeded',
+            # Culqi a veces manda data como un string JSON
+            'data': json.dumps({
+                'object': 'subscription', 'id': 'sub_1', 'customer_id': 'cus_1', 'plan_id': 'pln_1', 'status': estado,
+            }),
+        }
+
+    def test_credenciales_invalidas_se_rechazan(self):
+        evento = self.evento('evt_1', 1)
+        self.assertEqual(self.client.post('/api/culqi/webhook/', evento, content_type='application/json').status_code, 401)
+        self.assertEqual(self.enviar(evento, clave='otra').status_code, 401)
+        self.assertEqual(self.enviar(evento, usuario='otro').status_code, 401)
+        self.assertEqual(self.enviar(evento, esquema='Bearer').status_code, 401)
+        self.assertFalse(CulqiEvent.objects.exists())
+
+    @override_settings(CULQI_WEBHOOK_PASSWORD='')
+    def test_sin_credenciales_configuradas_se_rechaza_todo(self):
+        with self.assertLogs('services.eventos', 'ERROR'):
+            self.assertEqual(self.enviar(self.evento('evt_1', 1), clave='').status_code, 401)
+        self.assertFalse(CulqiEvent.objects.exists())
+
+    def test_evento_invalido(self):
+        with self.assertLogs('services.views', 'ERROR'):
+            self.assertEqual(self.enviar({'id': 'evt_1'}).status_code, 400)
+        self.assertFalse(CulqiEvent.objects.exists())
+
+    def test_evento_repetido_se_guarda_y_aplica_una_vez(self):
+        self.assertEqual(self.enviar(self.evento('evt_1', 1)).status_code, 200)
+        self.assertEqual(self.enviar(self.evento('evt_1', 1)).status_code, 200)
+        self.assertEqual(CulqiEvent.objects.count(), 1)
+        self.assertEqual(procesar_eventos(), 1)
+
+        # Culqi lo reenvía después de procesado: no se vuelve a aplicar
+        self.assertEqual(self.enviar(self.evento('evt_1', 1)).status_code, 200)
+        self.assertEqual(procesar_eventos(), 0)
+        self.assertEqual(Subscription.objects.get(subscription_id='sub_1').status, 1)
+
+    def test_en_un_lote_gana_la_ultima_version_de_cada_objeto(self):
+        self.enviar(self.evento('evt_1', 1))
+        self.enviar(self.evento('evt_2', 3))
+        self.assertEqual(procesar_eventos(), 2)
+        self.assertEqual(Subscription.objects.get(subscription_id='sub_1').status, 3)
+        self.assertFalse(CulqiEvent.objects.filter(processed_at__isnull=True).exists())
+
+
+class EmpresaAjenaTests(TestCase):
+    """Un usuario no ve ni modifica la empresa ni los carros de otro: siempre 404."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=self.usuario)
+        self.carro = crear_carro(self.empresa, 'AAA-111')
+        vecino = User.objects.create_user('vecino', password='clave-segura-123')
+        self.ajena = Empresa.objects.create(nombre='Lavado Norte', usuario=vecino)
+        self.carro_ajeno = crear_carro(self.ajena, 'BBB-222')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_empresa_ajena(self):
+        self.assertEqual(self.client.get(f'/api/empresas/{self.empresa.pk}/').status_code, 200)
+        for ruta in ('', 'estadisticas/', 'serie/', 'exportar/'):
+            self.assertEqual(self.client.get(f'/api/empresas/{self.ajena.pk}/{ruta}').status_code, 404, ruta)
+        self.assertEqual(self.client.patch(f'/api/empresas/{self.ajena.pk}/', {'nombre': 'Mía'}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(f'/api/empresas/{self.ajena.pk}/').status_code, 404)
+        self.assertEqual(Empresa.objects.get(pk=self.ajena.pk).nombre, 'Lavado Norte')
+
+        response = self.client.get('/api/empresas/estadisticas/', {'ids': f'{self.empresa.pk},{self.ajena.pk}'})
+        self.assertEqual(list(response.data), [str(self.empresa.pk)])
+
+    def test_carro_ajeno(self):
+        ruta = f'/api/carros/{self.carro_ajeno.pk}/'
+        self.assertEqual(self.client.get(ruta).status_code, 404)
+        self.assertEqual(self.client.patch(ruta, {'color': 'Rojo'}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(ruta).status_code, 404)
+        self.carro_ajeno.refresh_from_db()
+        self.assertIsNone(self.carro_ajeno.color)
+
+        placas = [carro['placa'] for carro in self.client.get('/api/carros/').data['results']]
+        self.assertEqual(placas, ['AAA-111'])
+
+    def test_no_se_registran_carros_en_empresa_ajena(self):
+        datos = {'placa': 'CCC-333', 'marca': 'Kia', 'numero_telefono': '999999999', 'precio': '25.00'}
+        response = self.client.post('/api/carros/', {**datos, 'empresa': self.ajena.pk}, format='json')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(f'/api/carros/bulk/?empresa={self.ajena.pk}', [datos], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Carro.objects.filter(placa='CCC-333').exists())
+
+    def test_no_se_cambia_el_estado_de_carros_ajenos(self):
+        cambios = {'ids': [self.carro.pk, self.carro_ajeno.pk], 'estado': 'terminado'}
+        response = self.client.post('/api/carros/bulk-estado/', cambios, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Carro.objects.get(pk=self.carro_ajeno.pk).estado, 'espera')
+        self.assertEqual(Carro.objects.get(pk=self.carro.pk).estado, 'espera')
+
+    @override_settings(AUTH_TOKEN_MODO='firmado')
+    @mock.patch.object(autenticacion, '_revocados', autenticacion.Revocados())
+    def test_empresa_del_token_firmado(self):
+        client = APIClient()
+        response = client.post('/login', {'username': 'dueno', 'password': 'clave-segura-123'}, format='json')
+        client.credentials(HTTP_AUTHORIZATION=f"Token {response.data['token']}")
+        self.assertEqual(client.get(f'/api/carros/{self.carro.pk}/').status_code, 200)
+        self.assertEqual(client.get(f'/api/carros/{self.carro_ajeno.pk}/').status_code, 404)
+        self.assertEqual(client.get(f'/api/empresas/{self.ajena.pk}/').status_code, 404)
+
+
+class TicketEventosTests(TestCase):
+    """El stream SSE se abre con un ticket de corta duración, nunca con el token en la URL."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=self.usuario)
+        vecino = User.objects.create_user('vecino', password='clave-segura-123')
+        self.ajena = Empresa.objects.create(nombre='Lavado Norte', usuario=vecino)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def abrir_stream(self, pk, query='', headers=()):
+        scope = {
+            'type': 'http', 'method': 'GET', 'path': f'/api/empresas/{pk}/eventos/',
+            'query_string': query.encode(), 'headers': list(headers),
+        }
+        return async_to_sync(views.eventos_empresa)(ASGIRequest(scope, io.BytesIO()), pk)
+
+    def test_emite_ticket_solo_para_su_empresa(self):
+        response = self.client.post(f'/api/empresas/{self.empresa.pk}/eventos/ticket/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(leer_ticket(response.data['ticket'], self.empresa.pk), self.usuario.pk)
+        self.assertIsNone(leer_ticket(response.data['ticket'], self.ajena.pk))
+        self.assertEqual(self.client.post(f'/api/empresas/{self.ajena.pk}/eventos/ticket/').status_code, 404)
+        self.assertEqual(APIClient().post(f'/api/empresas/{self.empresa.pk}/eventos/ticket/').status_code, 401)
+
+    def test_ticket_vencido_o_alterado(self):
+        ticket = emitir_ticket(self.usuario, self.empresa.pk)
+        self.assertIsNone(leer_ticket(ticket + 'x', self.empresa.pk))
+        with override_settings(CARROS_EVENTOS_TICKET_TTL=-1):
+            self.assertIsNone(leer_ticket(ticket, self.empresa.pk))
+
+    def test_stream_no_acepta_el_token_en_la_url(self):
+        token = Token.objects.create(user=self.usuario)
+        self.assertEqual(self.abrir_stream(self.empresa.pk, f'token={token.key}').status_code, 401)
+
+        response = self.abrir_stream(self.empresa.pk, headers=[(b'authorization', f'Token {token.key}'.encode())])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+    def test_stream_con_ticket(self):
+        ticket = emitir_ticket(self.usuario, self.empresa.pk)
+        self.assertEqual(self.abrir_stream(self.empresa.pk, f'ticket={ticket}').status_code, 200)
+        self.assertEqual(self.abrir_stream(self.ajena.pk, f'ticket={ticket}').status_code, 401)
+        self.assertEqual(self.abrir_stream(self.empresa.pk, 'ticket=falso').status_code, 401)
+
+
+class ReconciliarSuscripcionesTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        Customer.objects.create(user=self.usuario, culqi_id='cus_1')
+        for subscription_id in ('sub_1', 'sub_2'):
+            Subscription.objects.create(
+                user=self.usuario, subscription_id=subscription_id, plan_id='pln_1', card_id='crd_1',
+                customer_id='cus_1', status=1,
+            )
+
+    def culqi(self, *paginas):
+        def obtener():
+            for pagina in paginas:
+                if isinstance(pagina, Exception):
+                    raise pagina
+                if callable(pagina):
+                    pagina = pagina()
+                yield pagina
+        return mock.patch('services.suscripciones.obtener_suscripciones_culqi', obtener)
+
+    def suscripcion(self, subscription_id):
+        return {'id': subscription_id, 'customer_id': 'cus_1', 'plan_id': 'pln_1', 'status': 1}
+
+    def estados(self):
+        return dict(Subscription.objects.values_list('subscription_id', 'status'))
+
+    def test_inactiva_las_que_culqi_ya_no_devuelve(self):
+        with self.culqi([self.suscripcion('sub_1')]):
+            self.assertEqual(reconciliar_suscripciones(), (1, 1))
+        self.assertEqual(self.estados(), {'sub_1': 1, 'sub_2': SUSCRIPCION_INACTIVA})
+
+    def test_listado_vacio_no_inactiva_nada(self):
+        with self.culqi([]), self.assertLogs('services.suscripciones', 'WARNING'):
+            self.assertEqual(reconciliar_suscripciones(), (0, 0))
+        self.assertEqual(self.estados(), {'sub_1': 1, 'sub_2': 1})
+
+    def test_error_en_una_pagina_corta_la_reconciliacion(self):
+        with self.culqi([self.suscripcion('sub_1')], requests.exceptions.ConnectionError('caída')):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                reconciliar_suscripciones()
+        self.assertEqual(self.estados(), {'sub_1': 1, 'sub_2': 1})
+
+    def test_no_inactiva_las_creadas_mientras_recorre_culqi(self):
+        def crear_durante_la_reconciliacion():
+            # Como SubscriptionViewSet.create entre dos páginas de Culqi
+            Subscription.objects.create(
+                user=self.usuario, subscription_id='sub_3', plan_id='pln_1', card_id='crd_1',
+                customer_id='cus_1', status=1,
+            )
+            return [self.suscripcion('sub_1')]
+
+        with self.culqi([self.suscripcion('sub_1')], crear_durante_la_reconciliacion):
+            self.assertEqual(reconciliar_suscripciones(), (2, 1))
+        self.assertEqual(self.estados(), {'sub_1': 1, 'sub_2': SUSCRIPCION_INACTIVA, 'sub_3': 1})
+
+
+class CulqiFalso:
+    """
+    Servidor HTTP local que responde como Culqi con la lista de `respuestas`
+    (status, cuerpo JSON, segundos de espera), una por request; la última se repite.
+    """
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.requests = []
+        culqi = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def responder(self):
+                culqi.requests.append((self.command, self.path))
+                status, cuerpo, espera = culqi.respuestas.pop(0) if len(culqi.respuestas) > 1 else culqi.respuestas[0]
+                time.sleep(espera)
+                contenido = json.dumps(cuerpo).encode()
+                try:
+                    self.send_response(status)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(contenido)))
+                    self.end_headers()
+                    self.wfile.write(contenido)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # El cliente ya cortó por timeout
+
+            do_GET = do_POST = responder
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}/v2'
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+
+class CulqiGatewayTests(TestCase):
+    """Timeouts, reintentos y circuit breaker del gateway de Culqi contra un transporte falso."""
+
+    def gateway(self, culqi, **opciones):
+        opciones = {'timeout': (1, 1), 'backoff_factor': 0, 'max_retries': 2, **opciones}
+        gateway = CulqiGateway(culqi.url, 'sk_test', **opciones)
+        # Todo el código que usa get_gateway() pasa por este gateway
+        set_gateway(gateway)
+        self.addCleanup(set_gateway, None)
+        return gateway
+
+    def test_reintenta_solo_metodos_idempotentes(self):
+        planes = {'data': [{'id': 'pln_1'}], 'cursors': {}, 'remaining_items': 0}
+        with CulqiFalso((503, {}, 0), (502, {}, 0), (200, planes, 0)) as culqi:
+            self.gateway(culqi)
+            self.assertEqual(obtener_planes_culqi(), [{'id': 'pln_1'}])
+        self.assertEqual([metodo for metodo, _ in culqi.requests], ['GET', 'GET', 'GET'])
+
+        with CulqiFalso((503, {}, 0), (201, {}, 0)) as culqi:
+            response = self.gateway(culqi).post('recurrent/subscriptions/create', json={})
+        # Un POST repetido podría cobrar o crear dos veces
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(culqi.requests), 1)
+
+    def test_timeout_de_lectura(self):
+        with CulqiFalso((200, {}, 0.5)) as culqi:
+            gateway = self.gateway(culqi, timeout=(1, 0.1), max_retries=1)
+            # Con reintentos configurados, urllib3 reporta el timeout como ConnectionError (MaxRetryError)
+            with self.assertRaisesRegex(requests.exceptions.ConnectionError, 'Read timed out'):
+                gateway.get('recurrent/plans')
+        self.assertEqual(len(culqi.requests), 2)
+        self.assertEqual(gateway.breaker.failures, 1)
+
+    def test_circuito_abierto_no_llama_a_culqi(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        with CulqiFalso((500, {}, 0)) as culqi, self.assertLogs('services.culqi_gateway', 'ERROR'):
+            gateway = self.gateway(culqi, max_retries=0, breaker=breaker)
+            for _ in range(2):
+                self.assertEqual(gateway.get('recurrent/plans').status_code, 500)
+            with self.assertRaises(CulqiUnavailable):
+                gateway.get('recurrent/plans')
+        self.assertEqual(len(culqi.requests), 2)
+
+    def test_circuito_deja_pasar_una_prueba_y_se_cierra(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+        with CulqiFalso((500, {}, 0), (200, {}, 0)) as culqi, self.assertLogs('services.culqi_gateway', 'ERROR'):
+            gateway = self.gateway(culqi, max_retries=0, breaker=breaker)
+            gateway.get('recurrent/plans')
+            self.assertFalse(breaker.allow_request())
+            with mock.patch('services.culqi_gateway.time.monotonic', return_value=time.monotonic() + 61):
+                self.assertEqual(gateway.get('recurrent/plans').status_code, 200)
+        self.assertEqual(breaker.failures, 0)
+        self.assertTrue(breaker.allow_request())
+
+    def test_gateway_async(self):
+        respuestas = [httpx.Response(502), httpx.Response(200, json={'id': 'cus_1'})]
+        llamadas = []
+
+        def transporte(request):
+            llamadas.append(request.method)
+            if request.method == 'POST':
+                raise httpx.ConnectTimeout('sin respuesta', request=request)
+            return respuestas.pop(0)
+
+        async def usar_gateway():
+            gateway = AsyncCulqiGateway('https://culqi.test/v2', 'sk_test', backoff_factor=0, breaker=CircuitBreaker(failure_threshold=3))
+            gateway.client = httpx.AsyncClient(base_url='https://culqi.test/v2/', transport=httpx.MockTransport(transporte))
+            try:
+                self.assertEqual((await gateway.get('customers/cus_1')).json(), {'id': 'cus_1'})
+                with self.assertRaises(httpx.ConnectTimeout):
+                    await gateway.post('customers', json={})
+                return gateway.breaker.failures
+            finally:
+                await gateway.aclose()
+
+        self.assertEqual(async_to_sync(usar_gateway)(), 1)
+        self.assertEqual(llamadas, ['GET', 'GET', 'POST'])
+
+
+class ListadoCarrosTests(TestCase):
+    """Paginación por cursor de /api/carros/ y sus filtros."""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=usuario)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        inicio = timezone.make_aware(datetime(2026, 10, 1, 12))
+        # Días repetidos: el cursor desempata por id
+        self.carros = [
+            crear_carro(self.empresa, placa, dia_llegada=inicio + timedelta(days=dia), estado=estado)
+            for placa, dia, estado in [
+                ('ABC-101', 0, 'espera'), ('ABC-102', 0, 'terminado'), ('ABD-103', 1, 'espera'),
+                ('XYZ-104', 1, 'proceso'), ('ABC-105', 1, 'espera'), ('XYZ-106', 2, 'terminado'),
+                ('ABC-107', 3, 'espera'),
+            ]
+        ]
+
+    def placas(self, response):
+        return [carro['placa'] for carro in response.data['results']]
+
+    def recorrer(self, url, enlace='next'):
+        paginas = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            paginas.append(self.placas(response))
+            url = response.data[enlace]
+        return paginas
+
+    def test_cursor_ida_y_vuelta(self):
+        esperadas = [carro.placa for carro in sorted(self.carros, key=lambda carro: (carro.dia_llegada, carro.pk), reverse=True)]
+        paginas = self.recorrer(f'/api/carros/?empresa={self.empresa.pk}&page_size=3')
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual(sum(paginas, []), esperadas)
+
+        # Desde la última página, previous devuelve las mismas páginas en orden inverso
+        ultima = self.client.get(f'/api/carros/?empresa={self.empresa.pk}&page_size=3')
+        for _ in range(2):
+            ultima = self.client.get(ultima.data['next'])
+        self.assertIsNone(ultima.data['next'])
+        anteriores = self.recorrer(ultima.data['previous'], enlace='previous')
+        self.assertEqual(anteriores, paginas[-2::-1])
+
+    def test_cursor_estable_con_carros_nuevos(self):
+        primera = self.client.get(f'/api/carros/?empresa={self.empresa.pk}&page_size=3')
+        crear_carro(self.empresa, 'NEW-999')
+        siguientes = sum(self.recorrer(primera.data['next']), [])
+        self.assertEqual(self.placas(primera) + siguientes, [
+            'ABC-107', 'XYZ-106', 'ABC-105', 'XYZ-104', 'ABD-103', 'ABC-102', 'ABC-101',
+        ])
+
+    def test_filtros(self):
+        base = f'/api/carros/?empresa={self.empresa.pk}'
+        self.assertEqual(self.placas(self.client.get(f'{base}&estado=espera')), ['ABC-107', 'ABC-105', 'ABD-103', 'ABC-101'])
+        # La placa es un prefijo y no importan mayúsculas ni guiones
+        self.assertEqual(self.placas(self.client.get(f'{base}&placa=abc1')), ['ABC-107', 'ABC-105', 'ABC-102', 'ABC-101'])
+        rango = self.client.get(f'{base}&llegada_desde=2026-10-02&llegada_hasta=2026-10-03')
+        self.assertEqual(self.placas(rango), ['XYZ-106', 'ABC-105', 'XYZ-104', 'ABD-103'])
+
+        # El cursor conserva los filtros en todas las páginas
+        paginas = self.recorrer(f'{base}&estado=espera&placa=ABC&page_size=2')
+        self.assertEqual(paginas, [['ABC-107', 'ABC-105'], ['ABC-101']])
+
+    def test_parametros_invalidos(self):
+        base = f'/api/carros/?empresa={self.empresa.pk}'
+        self.assertEqual(self.client.get(f'{base}&estado=lavando').status_code, 400)
+        self.assertEqual(self.client.get(f'{base}&llegada_desde=ayer').status_code, 400)
+        self.assertEqual(self.client.get(f'{base}&cursor=no-es-un-cursor').status_code, 404)
+
+
+class ResumenDiarioTests(TestCase):
+    """EmpresaDailyStats, mantenido por señales y lotes, coincide siempre con recalcularlo desde Carro."""
+
+    def setUp(self):
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=usuario)
+        vecino = User.objects.create_user('vecino', password='clave-segura-123')
+        self.otra = Empresa.objects.create(nombre='Lavado Norte', usuario=vecino)
+        self.ayer = timezone.now() - timedelta(days=1)
+
+    def assertResumenCorrecto(self):
+        campos = ['empresa_id', 'fecha', 'estado', 'cantidad', 'ingresos', 'carros_con_salida', 'segundos_servicio']
+        # Las filas que quedaron en cero (carros borrados o movidos) no aportan nada
+        resumen = EmpresaDailyStats.objects.exclude(cantidad=0).values_list(*campos)
+        esperado = [tuple(fila[campo] for campo in campos) for fila in filas_agregadas(Carro.objects.all())]
+        self.assertCountEqual(resumen, esperado)
+        vacias = EmpresaDailyStats.objects.filter(cantidad=0)
+        self.assertFalse(vacias.exclude(ingresos=0, carros_con_salida=0, segundos_servicio=0).exists())
+
+    def test_crear_actualizar_y_borrar(self):
+        carro = crear_carro(self.empresa, 'AAA-111')
+        crear_carro(self.empresa, 'BBB-222', dia_llegada=self.ayer)
+        crear_carro(self.otra, 'CCC-333', estado='proceso')
+        self.assertResumenCorrecto()
+
+        carro.estado = 'terminado'
+        carro.dia_salida = carro.dia_llegada + timedelta(minutes=45)
+        carro.precio = 35
+        carro.save()
+        self.assertResumenCorrecto()
+
+        # Cambio de día y de empresa
+        carro.dia_llegada = self.ayer
+        carro.dia_salida = self.ayer + timedelta(minutes=30)
+        carro.empresa = self.otra
+        carro.save()
+        self.assertResumenCorrecto()
+
+        carro.delete()
+        self.assertResumenCorrecto()
+
+    def test_lotes(self):
+        datos = {'marca': 'Kia', 'numero_telefono': '999999999', 'precio': '25.00', 'empresa': self.empresa.pk}
+        ok, _ = crear_carros(self.empresa.pk, [{**datos, 'placa': 'AAA-111'}, {**datos, 'placa': 'BBB-222'}])
+        self.assertTrue(ok)
+        self.assertResumenCorrecto()
+
+        ids = list(Carro.objects.values_list('id', flat=True))
+        ok, _ = cambiar_estados(self.empresa.pk, [{'id': ids[0], 'estado': 'proceso'}, {'id': ids[1], 'estado': 'terminado'}])
+        self.assertTrue(ok)
+        self.assertResumenCorrecto()
+
+
+class LotesCarrosTests(TestCase):
+    """Los lotes son todo o nada: una fila inválida rechaza el lote completo."""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=usuario)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        self.datos = {'marca': 'Kia', 'numero_telefono': '999999999', 'precio': '25.00'}
+
+    def test_lote_valido(self):
+        filas = [{**self.datos, 'placa': 'AAA-111'}, {**self.datos, 'placa': 'BBB-222'}]
+        response = self.client.post(f'/api/carros/bulk/?empresa={self.empresa.pk}', filas, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['creados'], 2)
+        self.assertEqual(Carro.objects.filter(empresa=self.empresa).count(), 2)
+
+    def test_fila_invalida_rechaza_el_lote(self):
+        filas = [{**self.datos, 'placa': 'AAA-111'}, {**self.datos, 'placa': 'no válida'}, {**self.datos, 'placa': 'CCC-333'}]
+        response = self.client.post(f'/api/carros/bulk/?empresa={self.empresa.pk}', filas, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([resultado['ok'] for resultado in response.data['resultados']], [True, False, True])
+        self.assertIn('placa', response.data['resultados'][1]['errores'])
+        self.assertFalse(Carro.objects.exists())
+        self.assertFalse(EmpresaDailyStats.objects.exists())
+
+    def test_csv_con_fila_invalida(self):
+        archivo = SimpleUploadedFile('carros.csv', (
+            'placa,marca,numero_telefono,precio\n'
+            'AAA-111,Kia,999999999,25.00\n'
+            'BBB-222,Kia,999999999,gratis\n'
+        ).encode())
+        response = self.client.post('/api/carros/bulk/', {'archivo': archivo, 'empresa': self.empresa.pk}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('precio', response.data['resultados'][1]['errores'])
+        self.assertFalse(Carro.objects.exists())
+
+    @override_settings(CARROS_BULK_MAX=2)
+    def test_lote_demasiado_grande(self):
+        filas = [{**self.datos, 'placa': f'AAA-{numero}'} for numero in range(3)]
+        response = self.client.post(f'/api/carros/bulk/?empresa={self.empresa.pk}', filas, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Carro.objects.exists())
+
+    def test_cambio_de_estado_invalido_rechaza_el_lote(self):
+        primero, segundo = crear_carro(self.empresa, 'AAA-111'), crear_carro(self.empresa, 'BBB-222')
+        cambios = [{'id': primero.pk, 'estado': 'terminado'}, {'id': segundo.pk, 'estado': 'lavando'}]
+        response = self.client.post('/api/carros/bulk-estado/', cambios, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([resultado['ok'] for resultado in response.data['resultados']], [True, False])
+        primero.refresh_from_db()
+        self.assertEqual(primero.estado, 'espera')
+        self.assertIsNone(primero.dia_salida)
+
+        cambios = [{'id': primero.pk, 'estado': 'terminado'}, {'id': primero.pk, 'estado': 'proceso'}]
+        response = self.client.post('/api/carros/bulk-estado/', cambios, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['resultados'][1]['errores'], {'id': 'Carro repetido en el lote.'})
+        self.assertEqual(Carro.objects.get(pk=primero.pk).estado, 'espera')
+
+
+class BahiasTests(TestCase):
+    """Asignación de bahías de la cola de lavado."""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=usuario, bahias=2)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        inicio = timezone.now() - timedelta(hours=1)
+        self.lavando = crear_carro(self.empresa, 'AAA-111', dia_llegada=inicio, estado='proceso', bahia=1)
+        # Creados en otro orden que el de llegada: se atiende primero al que llegó antes
+        self.tercero = crear_carro(self.empresa, 'DDD-444', dia_llegada=inicio + timedelta(minutes=30))
+        self.primero = crear_carro(self.empresa, 'BBB-222', dia_llegada=inicio + timedelta(minutes=10))
+        self.segundo = crear_carro(self.empresa, 'CCC-333', dia_llegada=inicio + timedelta(minutes=20))
+
+    def test_bahias_libres(self):
+        self.assertEqual(bahias_libres(3, [2]), [1, 3])
+        # Un carro en proceso sin bahía también ocupa una
+        self.assertEqual(bahias_libres(3, [2, None]), [1])
+        self.assertEqual(bahias_libres(2, [1, 2, None]), [])
+        self.assertEqual(bahias_libres(2, []), [1, 2])
+
+    def test_asigna_las_bahias_libres_por_orden_de_llegada(self):
+        asignados = asignar_bahias(self.empresa.pk)
+        self.assertEqual([(carro.pk, bahia) for carro, bahia in asignados], [(self.primero.pk, 2)])
+        self.primero.refresh_from_db()
+        self.assertEqual((self.primero.estado, self.primero.bahia), ('proceso', 2))
+        self.assertIsNotNone(self.primero.dia_inicio)
+        # Sin bahías libres no se asigna nada
+        self.assertEqual(asignar_bahias(self.empresa.pk), [])
+
+        # Al terminar, el carro libera su bahía para el siguiente en espera
+        self.lavando.estado = 'terminado'
+        self.lavando.save()
+        self.lavando.refresh_from_db()
+        self.assertIsNone(self.lavando.bahia)
+        asignados = asignar_bahias(self.empresa.pk)
+        self.assertEqual([(carro.pk, bahia) for carro, bahia in asignados], [(self.segundo.pk, 1)])
+        self.assertEqual(Carro.objects.get(pk=self.tercero.pk).estado, 'espera')
+
+    def test_endpoint_asignar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/carros/cola/asignar/?empresa={self.empresa.pk}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['asignados'], [{'id': self.primero.pk, 'placa': 'BBB-222', 'bahia': 2}])
+        self.assertEqual(response.data['cola']['bahias_libres'], [])
+        self.assertEqual([carro['id'] for carro in response.data['cola']['en_espera']], [self.segundo.pk, self.tercero.pk])
+
+
+class PlacasTests(TestCase):
+    """'abc-123', 'ABC 123' y 'ABC123' son la misma placa en búsquedas, historial y autocompletado."""
+
+    def setUp(self):
+        cache.clear()
+        usuario = User.objects.create_user('dueno', password='clave-segura-123')
+        self.empresa = Empresa.objects.create(nombre='Lavado Sur', usuario=usuario)
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+
+    def test_normalizar_placa(self):
+        self.assertEqual(normalizar_placa('abc-123'), 'ABC123')
+        self.assertEqual(normalizar_placa(' ab c-1 '), 'ABC1')
+        self.assertEqual(normalizar_placa('--'), '')
+        self.assertEqual(normalizar_placa(None), '')
+
+    def test_se_normaliza_al_guardar(self):
+        carro = crear_carro(self.empresa, 'abc-123')
+        self.assertEqual(Carro.objects.get(pk=carro.pk).placa_normalizada, 'ABC123')
+        carro.placa = 'XYZ-9'
+        carro.save()
+        self.assertEqual(Carro.objects.get(pk=carro.pk).placa_normalizada, 'XYZ9')
+
+        datos = {'placa': 'DEF-456', 'marca': 'Kia', 'numero_telefono': '999999999', 'precio': '25.00', 'empresa': self.empresa.pk}
+        ok, _ = crear_carros(self.empresa.pk, [datos])
+        self.assertTrue(ok)
+        self.assertEqual(Carro.objects.get(placa='DEF-456').placa_normalizada, 'DEF456')
+
+    def test_consultas_por_placa(self):
+        for placa in ('ABC-123', 'ABC-124', 'AB-999', 'ABD-100', 'AZ-1'):
+            crear_carro(self.empresa, placa)
+        carros = Carro.objects.filter(empresa=self.empresa)
+        prefijo = lambda texto: sorted(carros.placa_prefijo(texto).values_list('placa', flat=True))
+        self.assertEqual(prefijo('abc-12'), ['ABC-123', 'ABC-124'])
+        self.assertEqual(prefijo('ab'), ['AB-999', 'ABC-123', 'ABC-124', 'ABD-100'])
+        self.assertEqual(prefijo('a-z'), ['AZ-1'])
+        self.assertEqual(prefijo('-'), sorted(carros.values_list('placa', flat=True)))
+        self.assertEqual(list(carros.de_placa('abc 123').values_list('placa', flat=True)), ['ABC-123'])
+
+    def test_historial_y_autocompletado(self):
+        crear_carro(self.empresa, 'ABC-123', estado='terminado', precio=30)
+        crear_carro(self.empresa, 'ABC123', estado='espera')
+        crear_carro(self.empresa, 'ABD-100')
+
+        response = self.client.get('/api/carros/historial/abc-123/', {'empresa': self.empresa.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['placa'], response.data['visitas'], response.data['gasto_total']), ('ABC123', 2, 30.0))
+
+        response = self.client.get('/api/carros/placas/', {'empresa': self.empresa.pk, 'q': 'a-b'})
+        self.assertEqual([placa['placa_normalizada'] for placa in response.data['resultados']], ['ABC123', 'ABD100'])
@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.core import signing
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Campos de Carro que se envían en los eventos (la foto se ve al recargar)
+CAMPOS_EVENTO = [
+    'placa', 'marca', 'color', 'modelo', 'dia_llegada', 'dia_salida', 'dia_inicio', 'bahia', 'numero_telefono', 'precio', 'estado',
+]
+
+# Sal de los tickets del stream: una firma de otro uso (p. ej. un token de acceso) no sirve aquí
+SAL_TICKET = 'services.tiempo_real.ticket'
+
+# Mensaje que reemplaza a los pendientes de un cliente que no los lee a tiempo
+RESINCRONIZAR = json.dumps({'tipo': 'resincronizar'})
+
+
+def canal_empresa(empresa_id):
+    return f'empresa:{empresa_id}'
+
+
+def emitir_ticket(usuario, empresa_id):
+    """
+    Ticket firmado para abrir el stream de la empresa desde el navegador, que no
+    puede enviar cabeceras con EventSource. Vale CARROS_EVENTOS_TICKET_TTL segundos
+    y solo para ese stream, así el token de acceso nunca va en la URL.
+    """
+    return signing.dumps({'u': usuario.pk, 'e': empresa_id}, salt=SAL_TICKET)
+
+
+def leer_ticket(ticket, empresa_id):
+    """Id del usuario del ticket, o None si es inválido, venció o es de otra empresa."""
+    try:
+        datos = signing.loads(ticket, salt=SAL_TICKET, max_age=settings.CARROS_EVENTOS_TICKET_TTL)
+    except signing.BadSignature:
+        return None
+    if datos.get('e') != empresa_id:
+        return None
+    return datos.get('u')
+
+
+class SuscripcionLocal:
+    def __init__(self, broker, canal):
+        self.broker = broker
+        self.canal = canal
+        self.cola = asyncio.Queue(maxsize=settings.CARROS_EVENTOS_COLA)
+        self.loop = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        self.broker._agregar(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.broker._quitar(self)
+
+    def _entregar(self, mensaje):
+        # Corre en el loop del suscriptor
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(RESINCRONIZAR)
+
+    async def recibir(self, timeout):
+        """Siguiente mensaje (texto JSON), o None si no llegó ninguno en `timeout` segundos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class BrokerLocal:
+    """
+    Broker en memoria: solo llegan los eventos publicados en este mismo proceso.
+    Sirve con un único proceso ASGI; con varios nodos usar BrokerRedis.
+    """
+
+    def __init__(self):
+        self._suscripciones = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def _agregar(self, suscripcion):
+        with self._lock:
+            self._suscripciones[suscripcion.canal].add(suscripcion)
+
+    def _quitar(self, suscripcion):
+        with self._lock:
+            self._suscripciones[suscripcion.canal].discard(suscripcion)
+            if not self._suscripciones[suscripcion.canal]:
+                del self._suscripciones[suscripcion.canal]
+
+    def publicar(self, canal, mensaje):
+        # Se puede llamar desde cualquier hilo; cada cola se llena en el loop de su suscriptor
+        with self._lock:
+            suscripciones = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscripciones:
+            try:
+                suscripcion.loop.call_soon_threadsafe(suscripcion._entregar, mensaje)
+            except RuntimeError:
+                # El loop ya se cerró
+                self._quitar(suscripcion)
+
+    def suscribir(self, canal):
+        return SuscripcionLocal(self, canal)
+
+
+class SuscripcionRedis:
+    def __init__(self, url, canal):
+        self.url = url
+        self.canal = canal
+
+    async def __aenter__(self):
+        import redis.asyncio
+
+        self.cliente = redis.asyncio.from_url(self.url)
+        self.pubsub = self.cliente.pubsub(ignore_subscribe_messages=True)
+        await self.pubsub.subscribe(self.canal)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.pubsub.unsubscribe(self.canal)
+        await self.pubsub.aclose()
+        await self.cliente.aclose()
+
+    async def recibir(self, timeout):
+        mensaje = await self.pubsub.get_message(timeout=timeout)
+        if mensaje is None:
+            return None
+        data = mensaje['data']
+        return data.decode('utf-8') if isinstance(data, bytes) else data
+
+
+class BrokerRedis:
+    """Broker con pub/sub de Redis (CARROS_EVENTOS_REDIS_URL), para varios procesos o nodos."""
+
+    def __init__(self):
+        import redis
+
+        self.url = settings.CARROS_EVENTOS_REDIS_URL
+        self.cliente = redis.Redis.from_url(self.url)
+
+    def publicar(self, canal, mensaje):
+        self.cliente.publish(canal, mensaje)
+
+    def suscribir(self, canal):
+        return SuscripcionRedis(self.url, canal)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Broker configurado en CARROS_EVENTOS_BROKER (uno por proceso)."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.CARROS_EVENTOS_BROKER)()
+        return _broker
+
+
+def _publicar(mensajes):
+    broker = get_broker()
+    for empresa_id, mensaje in mensajes:
+        try:
+            broker.publicar(canal_empresa(empresa_id), json.dumps(mensaje, cls=DjangoJSONEncoder))
+        except Exception as e:
+            # Un broker caído no debe romper el guardado del carro
+            logger.error(f"No se pudo publicar el evento del carro {mensaje.get('id')}: {e}")
+
+
+def publicar(mensajes):
+    """Publica [(empresa_id, mensaje)] cuando termina la transacción en curso."""
+    if mensajes:
+        transaction.on_commit(partial(_publicar, mensajes))
+
+
+def datos_carro(carro):
+    from .serializer import CarroSerializer
+
+    datos = CarroSerializer(carro).data
+    return {'id': carro.pk, **{campo: datos[campo] for campo in CAMPOS_EVENTO}}
+
+
+def mensaje_creado(carro):
+    return carro.empresa_id, {'tipo': 'creado', 'id': carro.pk, 'carro': datos_carro(carro)}
+
+
+def mensaje_eliminado(empresa_id, carro_id):
+    return empresa_id, {'tipo': 'eliminado', 'id': carro_id}
+
+
+def mensaje_actualizado(carro, anterior):
+    """
+    Evento con solo los campos que cambiaron respecto de `anterior` (dict con
+    los valores previos de algunos de CAMPOS_EVENTO), o None si no cambió ninguno.
+    """
+    cambiados = [campo for campo in CAMPOS_EVENTO if campo in anterior and anterior[campo] != getattr(carro, campo)]
+    if not cambiados:
+        return None
+    datos = datos_carro(carro)
+    mensaje = {'tipo': 'actualizado', 'id': carro.pk, 'cambios': {campo: datos[campo] for campo in cambiados}}
+    if 'estado' in cambiados:
+        mensaje['estado_anterior'] = anterior['estado']
+    return carro.empresa_id, mensaje
+
+
+def publicar_carro_guardado(carro, anterior=None):
+    """Publica el alta o los cambios de un carro; si cambió de empresa, sale de una y entra en la otra."""
+    if anterior is None:
+        publicar([mensaje_creado(carro)])
+    elif anterior['empresa_id'] != carro.empresa_id:
+        publicar([mensaje_eliminado(anterior['empresa_id'], carro.pk), mensaje_creado(carro)])
+    else:
+        publicar([mensaje for mensaje in [mensaje_actualizado(carro, anterior)] if mensaje])
+
+
+async def stream_sse(canal, carro_id=None):
+    """
+    Eventos del canal en formato SSE. Manda un comentario cada CARROS_EVENTOS_PING
+    segundos para mantener viva la conexión y la cierra tras CARROS_EVENTOS_DURACION_MAX
+    (el navegador se reconecta solo), así no quedan suscripciones de clientes caídos.
+    """
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + settings.CARROS_EVENTOS_DURACION_MAX
+    async with get_broker().suscribir(canal) as suscripcion:
+        yield 'retry: 3000\n\n'
+        while loop.time() < fin:
+            mensaje = await suscripcion.recibir(min(settings.CARROS_EVENTOS_PING, fin - loop.time()))
+            if mensaje is None:
+                yield ': ping\n\n'
+                continue
+            if carro_id is not None and json.loads(mensaje).get('id', carro_id) != carro_id:
+                continue
+            yield f'data: {mensaje}\n\n'
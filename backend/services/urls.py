@@ -15,10 +15,15 @@ router.register(r'reclamos', ReclamoViewSet, basename='reclamo')
 
 
 urlpatterns = [
+    path('empresas/<int:pk>/eventos/', views.eventos_empresa, name='eventos_empresa'),
     path('', include(router.urls)),
     path('customers/me/', get_my_customer_id, name='get_my_customer_id'),
     path('admin/users/', views.admin_users_list, name='admin_users_list'),
+    path('admin/analytics/', views.admin_analytics, name='admin_analytics'),
+    path('admin/metrics/', views.admin_metrics, name='admin_metrics'),
     path('admin/reclamos/', views.admin_reclamos_list, name='admin_reclamos_list'),
+    path('admin/reclamos/buscar/', views.admin_reclamos_buscar, name='admin_reclamos_buscar'),
     path('admin/reclamos/<int:pk>/responder/', views.admin_responder_reclamo, name='admin_responder_reclamo'),
+    path('culqi/webhook/', views.culqi_webhook, name='culqi_webhook'),
     path('docs/', include_docs_urls(title="Services API"))
 ]
@@ -1,14 +1,38 @@
 from rest_framework import viewsets, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.decorators import action, api_view, authentication_classes, permission_classes
 from django.shortcuts import get_object_or_404
-from django.db.models import Sum, Count, Q
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
+from adrf.shortcuts import aget_object_or_404
+from adrf.viewsets import ViewSet as AsyncViewSet
+from asgiref.sync import sync_to_async
 import logging
 import requests
 import datetime
 from django.conf import settings
 from .models import Carro, Empresa, Plan, Customer, Card, Subscription, Reclamo
+from .analitica import analitica_plataforma
+from .autenticacion import aautenticar_token
+from .busqueda import buscar
+from .cache import cache_response
+from .cola import asignar_bahias, estado_cola, eta_carro
+from .culqi_gateway import CULQI_ERRORS, open_async_gateway
+from .estadisticas import PERIODOS, calcular_estadisticas, serie_estadisticas
+from .eventos import leer_evento, registrar_evento, webhook_autorizado
+from .exportar import FORMATOS as FORMATOS_EXPORTACION, respuesta_exportacion
+from .lotes import LoteInvalido, cambiar_estados, crear_carros, leer_csv
+from .pagination import AdminPagination, BusquedaPagination, CarroCursorPagination
+from .placas import autocompletar, historial
+from .planes import filtrar_planes, listar_planes
+from .replicas import leer_de_replica
+from .suscripciones import CULQI_SUBSCRIPTIONS_PATH, SUSCRIPCION_INACTIVA, suscripciones_a_dict
+from .tiempo_real import canal_empresa, emitir_ticket, leer_ticket, stream_sse
 from .serializer import (
     CarroSerializer, EmpresaSerializer, PlanSerializer, CustomerSerializer, CardSerializer, CreateCardSerializer, SubscriptionSerializer, CreateSubscriptionSerializer, ReclamoSerializer
 )
@@ -18,9 +42,9 @@ from rest_framework import serializers
 
 logger = logging.getLogger(__name__)
 
-CULQI_CUSTOMER_URL = "https://api.culqi.com/v2/customers"
-CULQI_TOKEN_URL = "https://secure.culqi.com/v2/tokens"
-CULQI_SUBSCRIPTION_URL = "https://api.culqi.com/v2/recurrent/subscriptions/create"
+CULQI_CUSTOMER_PATH = "customers"
+CULQI_CARD_PATH = "cards"
+CULQI_SUBSCRIPTION_CREATE_PATH = "recurrent/subscriptions/create"
 
 # Inicializar el cliente Culqi con las credenciales
 culqi = Culqi(
@@ -35,71 +59,141 @@ class EmpresaViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Devuelve la empresa del usuario si existe, si no, un queryset vacío
-        return Empresa.objects.filter(usuario=self.request.user)
+        return Empresa.objects.filter(pk=self.request.tenant.empresa_id)
+
+    def get_object(self):
+        # La única empresa visible es la del usuario, que ya resolvió el middleware
+        empresa = self.request.tenant.empresa
+        if empresa is None or not self.request.tenant.es_suya(self.kwargs[self.lookup_field]):
+            raise Http404
+        self.check_object_permissions(self.request, empresa)
+        return empresa
+
+    @cache_response
+    @leer_de_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         # Solo permite crear una empresa si el usuario no tiene una
-        if Empresa.objects.filter(usuario=self.request.user).exists():
-            from rest_framework.exceptions import ValidationError
+        if self.request.tenant.empresa is not None:
             raise ValidationError("Ya tienes una empresa registrada.")
         serializer.save(usuario=self.request.user)
 
     @action(detail=True, methods=['get'])
+    @cache_response
+    @leer_de_replica
     def estadisticas(self, request, pk=None):
         """
         Obtiene estadísticas reales de la empresa del usuario actual
         """
+        # get_object solo devuelve la empresa del usuario (404 si es otra)
+        empresa = self.get_object()
         try:
-            empresa = self.get_object()
-            
-            # Verificar que la empresa pertenece al usuario
-            if empresa.usuario != request.user:
-                return Response(
-                    {'error': 'No tienes permisos para ver estas estadísticas.'},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Obtener carros de la empresa
-            carros = Carro.objects.filter(empresa=empresa)
-            
-            # Calcular estadísticas
-            total_carros = carros.count()
-            carros_terminados = carros.filter(estado='terminado').count()
-            carros_pendientes = carros.filter(Q(estado='espera') | Q(estado='proceso')).count()
-            
-            # Calcular ingresos totales (solo carros terminados)
-            ingresos_totales = carros.filter(estado='terminado').aggregate(
-                total=Sum('precio')
-            )['total'] or 0
-            
-            # Estadísticas por estado
-            stats_por_estado = carros.values('estado').annotate(
-                cantidad=Count('id')
-            ).order_by('estado')
-            
-            # Carros por mes (últimos 6 meses)
-            from django.utils import timezone
-            from datetime import timedelta
-            hace_6_meses = timezone.now() - timedelta(days=180)
-            carros_recientes = carros.filter(dia_llegada__gte=hace_6_meses)
-            
-            estadisticas = {
-                'carros_registrados': total_carros,
-                'carros_terminados': carros_terminados,
-                'carros_pendientes': carros_pendientes,
-                'ingresos_totales': float(ingresos_totales),
-                'promedio_por_carro': float(ingresos_totales / carros_terminados) if carros_terminados > 0 else 0,
-                'stats_por_estado': list(stats_por_estado),
-                'carros_ultimo_mes': carros_recientes.count(),
-                'empresa_info': {
-                    'nombre': empresa.nombre,
-                    'ruc': empresa.ruc,
-                    'direccion': empresa.direccion
-                }
-            }
-            
+            estadisticas = calcular_estadisticas([empresa])[empresa.id]
             return Response(estadisticas, status=status.HTTP_200_OK)
-            
+
+        except Exception as e:
+            logger.error(f"Error al obtener estadísticas: {str(e)}")
+            return Response(
+                {'error': 'Error al obtener las estadísticas.'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=True, methods=['get'])
+    @cache_response
+    @leer_de_replica
+    def serie(self, request, pk=None):
+        """
+        Serie para gráficos: ?periodo=dia|semana|mes&desde=AAAA-MM-DD&hasta=AAAA-MM-DD
+        """
+        empresa = self.get_object()
+        periodo = request.query_params.get('periodo', 'dia')
+        if periodo not in PERIODOS:
+            return Response({'error': f"periodo debe ser uno de: {', '.join(PERIODOS)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        fechas = {}
+        for name in ('desde', 'hasta'):
+            value = request.query_params.get(name)
+            try:
+                fechas[name] = parse_date(value) if value else None
+            except ValueError:
+                fechas[name] = None
+            if value and fechas[name] is None:
+                return Response({'error': f'{name}: formato de fecha inválido, use AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serie = serie_estadisticas(empresa, periodo, **fechas)
+        return Response({'periodo': periodo, 'serie': serie}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path='eventos/ticket')
+    def ticket_eventos(self, request, pk=None):
+        """
+        Ticket de corta duración para abrir /api/empresas/<id>/eventos/?ticket=...
+        con EventSource, que no envía cabeceras.
+        """
+        # Como en el stream, el staff puede ver cualquier empresa
+        empresa = get_object_or_404(Empresa, pk=pk) if request.user.is_staff else self.get_object()
+        return Response({
+            'ticket': emitir_ticket(request.user, empresa.pk),
+            'expires_in': settings.CARROS_EVENTOS_TICKET_TTL,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'])
+    def exportar(self, request, pk=None):
+        """
+        Descarga el historial de carros de la empresa: ?formato=csv|xlsx, con
+        ?desde=&hasta= (fecha de llegada, AAAA-MM-DD) y ?estado= opcionales.
+        Se envía en streaming, sin cargar los carros en memoria.
+        """
+        empresa = self.get_object()
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS_EXPORTACION:
+            return Response({'error': f"formato debe ser uno de: {', '.join(FORMATOS_EXPORTACION)}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        carros = Carro.objects.filter(empresa=empresa)
+        estado = request.query_params.get('estado')
+        if estado:
+            if estado not in dict(Carro.ESTADO_CHOICES):
+                return Response({'error': 'Estado inválido.'}, status=status.HTTP_400_BAD_REQUEST)
+            carros = carros.filter(estado=estado)
+        # Rango de datetimes (y no dia_llegada__date) para usar el índice (empresa, dia_llegada)
+        for name, lookup, hora in (('desde', 'gte', datetime.time.min), ('hasta', 'lte', datetime.time.max)):
+            value = request.query_params.get(name)
+            try:
+                fecha = parse_date(value) if value else None
+            except ValueError:
+                fecha = None
+            if value and fecha is None:
+                return Response({'error': f'{name}: formato de fecha inválido, use AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+            if fecha:
+                limite = timezone.make_aware(datetime.datetime.combine(fecha, hora))
+                carros = carros.filter(**{f'dia_llegada__{lookup}': limite})
+
+        nombre = f"carros-{empresa.id}-{timezone.localdate():%Y%m%d}"
+        return respuesta_exportacion(request, carros, formato, nombre)
+
+    @action(detail=False, methods=['get'], url_path='estadisticas')
+    @cache_response
+    @leer_de_replica
+    def estadisticas_lote(self, request):
+        """
+        Estadísticas de varias empresas en una sola llamada: ?ids=1,2,3
+        (sin ids, todas las empresas visibles para el usuario), con una sola
+        consulta de agregación. Es la que usa CompanyList.jsx; como cada usuario
+        ve solo su empresa, para él devuelve como mucho una.
+        """
+        empresas = self.get_queryset()
+        ids = request.query_params.get('ids')
+        if ids:
+            try:
+                ids = [int(i) for i in ids.split(',') if i.strip()]
+            except ValueError:
+                return Response({'error': 'ids debe ser una lista de números separados por comas.'}, status=status.HTTP_400_BAD_REQUEST)
+            empresas = empresas.filter(id__in=ids)
+
+        try:
+            estadisticas = calcular_estadisticas(empresas)
+            return Response({str(empresa_id): datos for empresa_id, datos in estadisticas.items()}, status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Error al obtener estadísticas: {str(e)}")
             return Response(
@@ -111,20 +205,80 @@ class CarroViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = CarroSerializer
     queryset = Carro.objects.all()
+    pagination_class = CarroCursorPagination
+
+    @leer_de_replica
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Carro.objects.filter(empresa__usuario=self.request.user)
+        # Sin join con Empresa: la empresa del usuario viene de request.tenant
+        queryset = Carro.objects.filter(empresa_id=self.request.tenant.empresa_id)
+        if self.action == 'list':
+            queryset = self.filter_list_queryset(queryset)
+        return queryset
+
+    def filter_list_queryset(self, queryset):
+        """
+        Filtros del listado: ?empresa=, ?estado=, ?placa= (prefijo) y
+        ?llegada_desde= / ?llegada_hasta= (fecha o fecha-hora ISO).
+        """
+        params = self.request.query_params
+
+        empresa_id = params.get('empresa')
+        if empresa_id:
+            if not empresa_id.isdigit():
+                raise ValidationError({'empresa': 'Debe ser un id numérico.'})
+            queryset = queryset.filter(empresa_id=empresa_id)
+
+        estado = params.get('estado')
+        if estado:
+            estados_validos = dict(Carro.ESTADO_CHOICES)
+            if estado not in estados_validos:
+                raise ValidationError({'estado': f"Debe ser uno de: {', '.join(estados_validos)}."})
+            queryset = queryset.filter(estado=estado)
+
+        placa = params.get('placa')
+        if placa:
+            queryset = queryset.placa_prefijo(placa)
+
+        desde = self.parse_fecha_param('llegada_desde')
+        if desde:
+            queryset = queryset.filter(dia_llegada__gte=desde)
+        hasta = self.parse_fecha_param('llegada_hasta', fin_del_dia=True)
+        if hasta:
+            queryset = queryset.filter(dia_llegada__lte=hasta)
+        return queryset
+
+    def parse_fecha_param(self, name, fin_del_dia=False):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            dia = parse_date(value)
+            fecha = None if dia else parse_datetime(value)
+        except ValueError:
+            dia = fecha = None
+        if dia:
+            hora = datetime.time.max if fin_del_dia else datetime.time.min
+            fecha = datetime.datetime.combine(dia, hora)
+        elif fecha is None:
+            raise ValidationError({name: 'Formato de fecha inválido, use AAAA-MM-DD.'})
+        if timezone.is_naive(fecha):
+            fecha = timezone.make_aware(fecha)
+        return fecha
 
     def perform_create(self, serializer):
-        empresa_id = self.request.data.get('empresa')
-        empresa = get_object_or_404(Empresa, id=empresa_id, usuario=self.request.user)
-        serializer.save(empresa=empresa)
+        if not self.request.tenant.es_suya(self.request.data.get('empresa')):
+            raise Http404
+        serializer.save(empresa=self.request.tenant.empresa)
 
     def check_permission(self, instance):
-        if instance.empresa.usuario != self.request.user:
+        if not self.request.tenant.es_suya(instance.empresa_id):
             return Response({'error': 'No tienes permiso para acceder a este carro.'}, status=status.HTTP_403_FORBIDDEN)
         return None
 
+    @cache_response
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
         permission_error = self.check_permission(instance)
@@ -150,64 +304,162 @@ class CarroViewSet(viewsets.ModelViewSet):
             return permission_error
         return super().destroy(request, *args, **kwargs)
 
-class CulqiPlansViewSet(viewsets.ViewSet):
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Registro masivo de carros: un arreglo JSON de carros, o un CSV con
+        encabezado en el campo `archivo` (multipart). La empresa va en cada fila o,
+        para todas, en ?empresa= (o en el campo `empresa` del formulario).
+        Si alguna fila es inválida no se registra ninguna.
+        """
+        archivo = request.FILES.get('archivo')
+        empresa = request.query_params.get('empresa') or (request.data.get('empresa') if archivo else None)
+        try:
+            filas = leer_csv(archivo) if archivo else request.data
+            ok, resultados = crear_carros(request.tenant.empresa_id, filas, empresa)
+        except LoteInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not ok:
+            return Response({'error': 'Hay filas inválidas, no se registró ningún carro.', 'resultados': resultados}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'creados': len(resultados), 'resultados': resultados}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-estado')
+    def bulk_estado(self, request):
+        """
+        Cambio de estado masivo: [{"id": 1, "estado": "proceso"}, ...] o
+        {"ids": [1, 2], "estado": "terminado"}. Al pasar a terminado se registra
+        dia_salida. Si algún cambio es inválido no se aplica ninguno.
+        """
+        cambios = request.data
+        if isinstance(cambios, dict) and 'ids' in cambios:
+            ids = cambios['ids'] if isinstance(cambios['ids'], list) else []
+            cambios = [{'id': carro_id, 'estado': cambios.get('estado')} for carro_id in ids]
+        try:
+            ok, resultados = cambiar_estados(request.tenant.empresa_id, cambios)
+        except LoteInvalido as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not ok:
+            return Response({'error': 'Hay cambios inválidos, no se aplicó ninguno.', 'resultados': resultados}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'actualizados': len(resultados), 'resultados': resultados}, status=status.HTTP_200_OK)
+
+    def empresa_del_usuario(self, request):
+        empresa_id = request.query_params.get('empresa')
+        if not empresa_id or not empresa_id.isdigit():
+            raise ValidationError({'empresa': 'Debe indicar el id numérico de la empresa.'})
+        if not request.tenant.es_suya(empresa_id):
+            raise Http404
+        return request.tenant.empresa
+
+    @action(detail=False, methods=['get'], url_path='cola')
+    def cola(self, request):
+        """
+        Cola de lavado de la empresa (?empresa=): carros en proceso con su bahía y
+        fin estimado, y carros en espera en orden con su posición e inicio/fin
+        estimados según la duración histórica de cada tipo de servicio (precio).
+        """
+        empresa = self.empresa_del_usuario(request)
+        return Response(estado_cola(empresa.id))
+
+    @action(detail=False, methods=['post'], url_path='cola/asignar')
+    def asignar_cola(self, request):
+        """Pasa a proceso a los primeros carros en espera, uno por cada bahía libre."""
+        empresa = self.empresa_del_usuario(request)
+        asignados = asignar_bahias(empresa.id)
+        return Response({
+            'asignados': [{'id': carro.id, 'placa': carro.placa, 'bahia': bahia} for carro, bahia in asignados],
+            'cola': estado_cola(empresa.id),
+        })
+
+    @action(detail=False, methods=['get'], url_path=r'historial/(?P<placa>[A-Za-z0-9-]+)')
+    def historial(self, request, placa=None):
+        """
+        Historial de un cliente por placa (sin distinguir guiones ni mayúsculas) en
+        las empresas del usuario, o solo en ?empresa=: visitas, gasto total de los
+        carros terminados, última visita y datos del último carro.
+        """
+        carros = self.get_queryset()
+        empresa_id = request.query_params.get('empresa')
+        if empresa_id:
+            if not empresa_id.isdigit():
+                raise ValidationError({'empresa': 'Debe ser un id numérico.'})
+            carros = carros.filter(empresa_id=empresa_id)
+        return Response(historial(carros, placa))
+
+    @action(detail=False, methods=['get'], url_path='buscar')
+    def buscar_carros(self, request):
+        """
+        Búsqueda de texto (?q=) en placa, marca, modelo, color y teléfono de los
+        carros del usuario (o de ?empresa=), por relevancia y paginada (?page=).
+        """
+        q = request.query_params.get('q', '').strip()
+        if not q:
+            return Response({'error': 'Debe indicar el texto a buscar en q.'}, status=status.HTTP_400_BAD_REQUEST)
+        carros = self.get_queryset()
+        empresa_id = request.query_params.get('empresa')
+        if empresa_id:
+            if not empresa_id.isdigit():
+                raise ValidationError({'empresa': 'Debe ser un id numérico.'})
+            carros = carros.filter(empresa_id=empresa_id)
+        paginator = BusquedaPagination()
+        page = paginator.paginate_queryset(buscar(carros, q), request)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='placas')
+    def placas(self, request):
+        """Autocompletado de placas ya registradas en la empresa (?empresa=) que empiezan con ?q=."""
+        empresa = self.empresa_del_usuario(request)
+        try:
+            limite = max(1, min(int(request.query_params.get('limite', 10)), 50))
+        except ValueError:
+            raise ValidationError({'limite': 'Debe ser un número.'})
+        return Response({'resultados': autocompletar(empresa.id, request.query_params.get('q', ''), limite)})
+
+    @action(detail=True, methods=['get'])
+    def eta(self, request, pk=None):
+        """Posición en la cola y horas estimadas de inicio y fin del carro."""
+        instance = self.get_object()
+        eta = eta_carro(instance)
+        if eta is None:
+            return Response({'error': 'El carro ya no está en la cola.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(eta)
+
+class CulqiPlansViewSet(AsyncViewSet):
     permission_classes = [IsAuthenticated]
 
-    def list(self, request):
+    async def list(self, request):
         """
-        Lista los planes disponibles en Culqi. Puedes aplicar filtros usando los parámetros GET.
+        Lista los planes disponibles. Se sirven desde la tabla Plan (sincronizada con
+        `manage.py sync_culqi_plans`); Culqi solo se consulta si aún no hay planes locales.
+        Acepta los filtros amount, min_amount, max_amount, status y limit.
         """
         if not hasattr(settings, 'CULQI_PRIVATE_KEY'):
             logger.error("CULQI_PRIVATE_KEY no está definido en settings.")
             return Response({'error': 'Culqi private key no configurada.'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        url = "https://api.culqi.com/v2/recurrent/plans"
-
-        # Parámetros permitidos para filtrar planes
-        allowed_params = [
-            'amount', 'status', 'min_amount', 'max_amount',
-            'creation_date_from', 'creation_date_to', 
-            'limit', 'before', 'after'
-        ]
-
-        # Filtrar solo los parámetros válidos y no nulos
-        querystring = {k: v for k, v in request.GET.items() if k in allowed_params and v is not None}
-
-        headers = {
-            "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-            "Content-Type": "application/json"
-        }
-
         try:
-            response = requests.get(url, headers=headers, params=querystring)
-            response.raise_for_status()
-            culqi_response = response.json()
-
-            data = culqi_response.get('data')
-            if isinstance(data, dict):
-                plans = [data]
-            elif isinstance(data, list):
-                plans = data
-            else:
-                plans = []
-
-            return Response({
-                'plans': plans,
-                'paging': culqi_response.get('paging', {}),
-                'cursors': culqi_response.get('cursors', {}),
-                'remaining_items': culqi_response.get('remaining_items', 0)
-            }, status=status.HTTP_200_OK)
-
-        except requests.exceptions.RequestException as e:
+            plans = filtrar_planes(await sync_to_async(listar_planes)(), request.GET)
+        except ValueError:
+            return Response({'error': 'Filtros de planes inválidos.'}, status=status.HTTP_400_BAD_REQUEST)
+        except CULQI_ERRORS as e:
             logger.error(f"Error al realizar la solicitud a Culqi: {e}")
             return Response({'error': 'Error al obtener los planes de Culqi'}, status=status.HTTP_400_BAD_REQUEST)
 
+        return Response({
+            'plans': plans,
+            'paging': {},
+            'cursors': {},
+            'remaining_items': 0
+        }, status=status.HTTP_200_OK)
+
 
-class CustomerViewSet(viewsets.ViewSet):
+class CustomerViewSet(AsyncViewSet):
     permission_classes = [IsAuthenticated]
     serializer_class = CustomerSerializer
 
     @action(detail=False, methods=['get'])
+    @cache_response
     def me(self, request):
         try:
             customer = Customer.objects.get(user=request.user)
@@ -233,25 +485,21 @@ class CustomerViewSet(viewsets.ViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    def create(self, request):
+    async def create(self, request):
         try:
             data = request.data
             user = request.user
             
             # Verificar si ya existe un customer para este usuario
-            if hasattr(user, 'customer'):
+            if await Customer.objects.filter(user=user).aexists():
                 return Response(
                     {"error": "Ya existe un perfil de cliente para este usuario."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
             # Crear customer en Culqi
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(CULQI_CUSTOMER_URL, json=data, headers=headers)
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.post(CULQI_CUSTOMER_PATH, json=data)
             response.raise_for_status()
             culqi_customer = response.json()
 
@@ -273,10 +521,10 @@ class CustomerViewSet(viewsets.ViewSet):
                 creation_timestamp = culqi_customer['creation_date'] / 1000.0
                 customer_data['creation_date'] = datetime.datetime.fromtimestamp(creation_timestamp)
 
-            customer = Customer.objects.create(**customer_data)
+            customer = await Customer.objects.acreate(**customer_data)
             return Response(CustomerSerializer(customer).data, status=status.HTTP_201_CREATED)
 
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al crear el cliente en Culqi: {str(e)}")
             return Response(
                 {"error": "No se pudo crear el cliente en Culqi."},
@@ -300,9 +548,9 @@ class CustomerViewSet(viewsets.ViewSet):
             )
 
     @action(detail=True, methods=['patch'])
-    def update_customer(self, request, pk=None):
+    async def update_customer(self, request, pk=None):
         try:
-            customer = Customer.objects.get(culqi_id=pk, user=request.user)
+            customer = await Customer.objects.aget(culqi_id=pk, user=request.user)
             
             # Validar datos requeridos
             required_fields = ['first_name', 'last_name']
@@ -325,22 +573,17 @@ class CustomerViewSet(viewsets.ViewSet):
             # Log del payload para debugging
             logger.info(f"Payload para Culqi: {payload}")
             
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-                "Content-Type": "application/json"
-            }
-
             # Actualizar en Culqi
-            culqi_response = requests.patch(
-                f"{CULQI_CUSTOMER_URL}/{customer.culqi_id}",
-                json=payload,
-                headers=headers
-            )
+            async with open_async_gateway(request) as gateway:
+                culqi_response = await gateway.patch(
+                    f"{CULQI_CUSTOMER_PATH}/{customer.culqi_id}",
+                    json=payload
+                )
             
             # Log de respuesta Culqi
             logger.info(f"Respuesta Culqi: {culqi_response.text}")
             
-            if not culqi_response.ok:
+            if not culqi_response.is_success:
                 culqi_error = culqi_response.json()
                 logger.error(f"Error Culqi: {culqi_error}")
                 return Response(
@@ -351,7 +594,7 @@ class CustomerViewSet(viewsets.ViewSet):
             # Actualizar en BD local
             for key, value in payload.items():
                 setattr(customer, key, value)
-            customer.save()
+            await customer.asave()
 
             return Response(CustomerSerializer(customer).data)
 
@@ -360,7 +603,7 @@ class CustomerViewSet(viewsets.ViewSet):
                 {"error": "Cliente no encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error de conexión con Culqi: {str(e)}")
             return Response(
                 {"error": "Error de conexión con el servicio de pago"},
@@ -374,15 +617,9 @@ class CustomerViewSet(viewsets.ViewSet):
             )
 
     @action(detail=False, methods=['patch'])
-    def edit(self, request):
+    async def edit(self, request):
         try:
-            customer = Customer.objects.get(user=request.user)
-            
-            # Preparar headers para Culqi
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-                "Content-Type": "application/json"
-            }
+            customer = await Customer.objects.aget(user=request.user)
             
             # Construir payload
             payload = {}
@@ -397,17 +634,17 @@ class CustomerViewSet(viewsets.ViewSet):
             logger.info(f"Actualizando cliente {customer.culqi_id} con payload: {payload}")
 
             # Actualizar en Culqi
-            culqi_response = requests.patch(
-                f"{CULQI_CUSTOMER_URL}/{customer.culqi_id}",
-                json=payload,
-                headers=headers
-            )
+            async with open_async_gateway(request) as gateway:
+                culqi_response = await gateway.patch(
+                    f"{CULQI_CUSTOMER_PATH}/{customer.culqi_id}",
+                    json=payload
+                )
             culqi_response.raise_for_status()
 
             # Actualizar en BD local
             for key, value in payload.items():
                 setattr(customer, key, value)
-            customer.save()
+            await customer.asave()
 
             logger.info(f"Cliente actualizado exitosamente: {customer.culqi_id}")
             return Response(CustomerSerializer(customer).data)
@@ -417,7 +654,7 @@ class CustomerViewSet(viewsets.ViewSet):
                 {"error": "Cliente no encontrado"},
                 status=status.HTTP_404_NOT_FOUND
             )
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error Culqi: {str(e)}")
             return Response(
                 {"error": str(e)},
@@ -425,9 +662,7 @@ class CustomerViewSet(viewsets.ViewSet):
             )
 
 
-CULQI_CARD_URL = "https://api.culqi.com/v2/cards"
-
-class CardViewSet(viewsets.ViewSet):
+class CardViewSet(AsyncViewSet):
     permission_classes = [IsAuthenticated]
 
     def list(self, request):
@@ -442,17 +677,12 @@ class CardViewSet(viewsets.ViewSet):
         serializer = CardSerializer(card)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-    def create(self, request):
+    async def create(self, request):
         # Crea una tarjeta en Culqi a partir de customer_id y token_id
         serializer = CreateCardSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        headers = {
-            "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-            "content-type": "application/json"
-        }
-
         payload = {
             "customer_id": data['customer_id'],
             "token_id": data['token_id'],
@@ -465,7 +695,8 @@ class CardViewSet(viewsets.ViewSet):
             payload['authentication_3DS'] = auth_3DS
 
         try:
-            response = requests.post(CULQI_CARD_URL, json=payload, headers=headers)
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.post(CULQI_CARD_PATH, json=payload)
             response.raise_for_status()
             culqi_response = response.json()
 
@@ -477,7 +708,7 @@ class CardViewSet(viewsets.ViewSet):
             if creation_timestamp:
                 creation_dt = datetime.datetime.utcfromtimestamp(creation_timestamp / 1000.0)
 
-            card_obj = Card.objects.create(
+            card_obj = await Card.objects.acreate(
                 user=request.user,
                 card_id=card_id,
                 customer_id=customer_id,
@@ -487,34 +718,30 @@ class CardViewSet(viewsets.ViewSet):
             )
 
             return Response(CardSerializer(card_obj).data, status=status.HTTP_201_CREATED)
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al crear la tarjeta en Culqi: {e}")
             return Response({"error": "No se pudo crear la tarjeta en Culqi."}, status=status.HTTP_400_BAD_REQUEST)
 
-    def partial_update(self, request, pk=None):
+    async def partial_update(self, request, pk=None):
         # Actualiza la tarjeta en Culqi (nuevo token_id y/o metadata)
-        card = get_object_or_404(Card, pk=pk, user=request.user)
+        card = await aget_object_or_404(Card, pk=pk, user=request.user)
         token_id = request.data.get('token_id')
         metadata = request.data.get('metadata', {})
 
         if not token_id and not metadata:
             raise ValidationError("Debe proporcionar al menos token_id o metadata para actualizar.")
 
-        headers = {
-            "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-            "content-type": "application/json"
-        }
-
         payload = {}
         if token_id:
             payload["token_id"] = token_id
         if metadata:
             payload["metadata"] = metadata
 
-        card_url = f"{CULQI_CARD_URL}/{card.card_id}"
+        card_path = f"{CULQI_CARD_PATH}/{card.card_id}"
 
         try:
-            response = requests.patch(card_url, json=payload, headers=headers)
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.patch(card_path, json=payload)
             response.raise_for_status()
             culqi_response = response.json()
 
@@ -526,134 +753,77 @@ class CardViewSet(viewsets.ViewSet):
 
             if metadata:
                 card.metadata = culqi_response.get('metadata', {})
-            card.save()
+            await card.asave()
 
             return Response(CardSerializer(card).data, status=status.HTTP_200_OK)
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al actualizar la tarjeta en Culqi: {e}")
             return Response({"error": "No se pudo actualizar la tarjeta en Culqi."}, status=status.HTTP_400_BAD_REQUEST)
 
-    def destroy(self, request, pk=None):
+    async def destroy(self, request, pk=None):
         # Elimina la tarjeta en Culqi y localmente
-        card = get_object_or_404(Card, pk=pk, user=request.user)
+        card = await aget_object_or_404(Card, pk=pk, user=request.user)
 
-        headers = {
-            "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-            "content-type": "application/json"
-        }
-
-        card_url = f"{CULQI_CARD_URL}/{card.card_id}"
+        card_path = f"{CULQI_CARD_PATH}/{card.card_id}"
 
         try:
-            response = requests.delete(card_url, headers=headers)
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.delete(card_path)
             if response.status_code not in [200,204]:
                 return Response({"error": "No se pudo eliminar la tarjeta en Culqi."}, status=status.HTTP_400_BAD_REQUEST)
 
-            card.delete()
+            await card.adelete()
             return Response(status=status.HTTP_204_NO_CONTENT)
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al eliminar la tarjeta en Culqi: {e}")
             return Response({"error": "No se pudo eliminar la tarjeta en Culqi."}, status=status.HTTP_400_BAD_REQUEST)
         
         
-class SubscriptionViewSet(viewsets.ViewSet):
+class SubscriptionViewSet(AsyncViewSet):
     permission_classes = [IsAuthenticated]
 
     def list(self, request):
-        try:
-            # Obtener customer del usuario actual
-            customer = Customer.objects.get(user=request.user)
-            
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-                "Content-Type": "application/json"
-            }
-            
-            # Filtrar por customer_id
-            querystring = {
-                'customer_id': customer.culqi_id
-            }
-            
-            response = requests.get(
-                "https://api.culqi.com/v2/recurrent/subscriptions",
-                headers=headers,
-                params=querystring
-            )
-            response.raise_for_status()
-            return Response(response.json())
-            
-        except Customer.DoesNotExist:
-            return Response(
-                {"error": "Cliente no encontrado"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error al listar suscripciones: {str(e)}")
-            return Response(
-                {"error": f"Error al obtener suscripciones: {str(e)}"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        """
+        Lista las suscripciones del usuario desde la tabla local Subscription, que se
+        mantiene al día con los webhooks de Culqi y `manage.py reconcile_subscriptions`.
+        """
+        suscripciones = Subscription.objects.filter(user=request.user).order_by('-creation_date', '-id')
+        return Response({
+            'data': suscripciones_a_dict(suscripciones),
+            'paging': {},
+            'cursors': {},
+            'remaining_items': 0
+        })
 
     def retrieve(self, request, pk=None):
-        try:
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}"
-            }
-            response = requests.get(
-                f"https://api.culqi.com/v2/recurrent/subscriptions/{pk}",
-                headers=headers
-            )
-            response.raise_for_status()
-            return Response(response.json())
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error al consultar suscripción: {str(e)}")
+        suscripcion = get_object_or_404(Subscription, subscription_id=pk, user=request.user)
+        return Response(suscripciones_a_dict([suscripcion])[0])
+
+    async def destroy(self, request, pk=None):
+        # Verificar en la base de datos que la suscripción pertenece al usuario
+        suscripcion = await aget_object_or_404(Subscription, subscription_id=pk)
+        if suscripcion.user_id != request.user.id:
             return Response(
-                {"error": "Error al obtener la suscripción"},
-                status=status.HTTP_400_BAD_REQUEST
+                {"error": "No tienes permiso para cancelar esta suscripción"},
+                status=status.HTTP_403_FORBIDDEN
             )
 
-    def destroy(self, request, pk=None):
         try:
-            # Verificar que la suscripción pertenece al usuario
-            customer = Customer.objects.get(user=request.user)
-            headers = {
-                "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}"
-            }
-            
-            # Primero verificar que la suscripción existe y pertenece al usuario
-            response = requests.get(
-                f"https://api.culqi.com/v2/recurrent/subscriptions/{pk}",
-                headers=headers
-            )
-            subscription_data = response.json()
-            
-            if subscription_data.get('customer', {}).get('id') != customer.culqi_id:
-                return Response(
-                    {"error": "No tienes permiso para cancelar esta suscripción"},
-                    status=status.HTTP_403_FORBIDDEN
-                )
-            
-            # Proceder con la cancelación
-            response = requests.delete(
-                f"https://api.culqi.com/v2/recurrent/subscriptions/{pk}",
-                headers=headers
-            )
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.delete(f"{CULQI_SUBSCRIPTIONS_PATH}/{pk}")
             response.raise_for_status()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-            
-        except Customer.DoesNotExist:
-            return Response(
-                {"error": "Cliente no encontrado"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al cancelar suscripción: {str(e)}")
             return Response(
                 {"error": "Error al cancelar la suscripción"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    def create(self, request):
+        suscripcion.status = SUSCRIPCION_INACTIVA
+        await suscripcion.asave(update_fields=['status'])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    async def create(self, request):
         """
         Crea una suscripción en Culqi a partir del card_id y el plan_id,
         indicando que se aceptan términos y condiciones (tyc = True).
@@ -662,11 +832,6 @@ class SubscriptionViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
-        headers = {
-            "Authorization": f"Bearer {settings.CULQI_PRIVATE_KEY}",
-            "Content-Type": "application/json"
-        }
-
         payload = {
             "card_id": data['card_id'],
             "plan_id": data['plan_id'],
@@ -675,7 +840,8 @@ class SubscriptionViewSet(viewsets.ViewSet):
         }
 
         try:
-            response = requests.post(CULQI_SUBSCRIPTION_URL, json=payload, headers=headers)
+            async with open_async_gateway(request) as gateway:
+                response = await gateway.post(CULQI_SUBSCRIPTION_CREATE_PATH, json=payload)
             response.raise_for_status()
             subscription_data = response.json()
 
@@ -693,21 +859,26 @@ class SubscriptionViewSet(viewsets.ViewSet):
             if next_billing_timestamp is not None:
                 next_billing_dt = datetime.datetime.fromtimestamp(next_billing_timestamp)
 
-            # Guardar en la base de datos local
-            subscription = Subscription.objects.create(
-                user=request.user,
+            customer_id = await Customer.objects.filter(user=request.user).values_list('culqi_id', flat=True).afirst()
+
+            # Guardar en la base de datos local (el webhook de Culqi pudo haberla creado ya)
+            subscription, _ = await Subscription.objects.aupdate_or_create(
                 subscription_id=subscription_id,
-                plan_id=data['plan_id'],
-                card_id=data['card_id'],
-                status=status_sub,
-                creation_date=creation_dt,
-                next_billing_date=next_billing_dt,
-                metadata=subscription_data.get('metadata', {})
+                defaults={
+                    'user': request.user,
+                    'plan_id': data['plan_id'],
+                    'card_id': data['card_id'],
+                    'customer_id': customer_id,
+                    'status': status_sub,
+                    'creation_date': creation_dt,
+                    'next_billing_date': next_billing_dt,
+                    'metadata': subscription_data.get('metadata', {}),
+                }
             )
 
             return Response(SubscriptionSerializer(subscription).data, status=status.HTTP_201_CREATED)
 
-        except requests.exceptions.RequestException as e:
+        except CULQI_ERRORS as e:
             logger.error(f"Error al crear la suscripción en Culqi: {e}")
             return Response({"error": "No se pudo crear la suscripción en Culqi."}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -725,25 +896,134 @@ class ReclamoViewSet(viewsets.ModelViewSet):
 class UserAdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
-        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser']
+        fields = ['id', 'username', 'first_name', 'last_name', 'email', 'is_staff', 'is_superuser', 'is_active']
+
+ROLES_USUARIO = {
+    'superuser': Q(is_superuser=True),
+    'staff': Q(is_staff=True),
+    'regular': Q(is_staff=False, is_superuser=False),
+}
+
+def filtrar_usuarios(usuarios, params):
+    """Filtros del listado de usuarios: ?q= (nombre, usuario o email) y ?rol=superuser|staff|regular."""
+    q = params.get('q', '').strip()
+    if q:
+        usuarios = usuarios.filter(
+            Q(username__icontains=q) | Q(first_name__icontains=q) |
+            Q(last_name__icontains=q) | Q(email__icontains=q)
+        )
+    rol = params.get('rol')
+    if rol and rol != 'all':
+        if rol not in ROLES_USUARIO:
+            raise ValidationError({'rol': f"Debe ser uno de: {', '.join(ROLES_USUARIO)}."})
+        usuarios = usuarios.filter(ROLES_USUARIO[rol])
+    return usuarios
+
+def filtrar_reclamos(reclamos, params):
+    """Filtros del listado de reclamos: ?q= (nombre, email o mensaje) y ?estado=."""
+    q = params.get('q', '').strip()
+    if q:
+        # Conserva el orden del listado; la búsqueda por relevancia es /admin/reclamos/buscar/
+        reclamos = buscar(reclamos, q).order_by(*reclamos.query.order_by)
+    estado = params.get('estado')
+    if estado and estado != 'all':
+        estados_validos = dict(Reclamo.ESTADO_CHOICES)
+        if estado not in estados_validos:
+            raise ValidationError({'estado': f"Debe ser uno de: {', '.join(estados_validos)}."})
+        reclamos = reclamos.filter(estado=estado)
+    return reclamos
+
+def reclamos_por_estado():
+    conteo = dict(Reclamo.objects.values_list('estado').order_by().annotate(total=Count('id')))
+    return {estado: conteo.get(estado, 0) for estado, _ in Reclamo.ESTADO_CHOICES}
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@leer_de_replica
 def admin_users_list(request):
+    """Usuarios paginados (?page=, ?page_size=), del más nuevo al más antiguo."""
     User = get_user_model()
-    users = User.objects.all()
-    data = UserAdminSerializer(users, many=True).data
-    return Response(data)
+    users = filtrar_usuarios(User.objects.order_by('-id'), request.query_params)
+    paginator = AdminPagination()
+    page = paginator.paginate_queryset(users, request)
+    return paginator.get_paginated_response(UserAdminSerializer(page, many=True).data)
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@leer_de_replica
 def admin_reclamos_list(request):
-    reclamos = Reclamo.objects.all().order_by('-fecha')
-    data = ReclamoSerializer(reclamos, many=True).data
-    return Response(data)
+    """
+    Reclamos paginados (?page=, ?page_size=), del más reciente al más antiguo.
+    `por_estado` trae el total de cada estado para las tarjetas del panel.
+    """
+    reclamos = filtrar_reclamos(Reclamo.objects.order_by('-fecha', '-id'), request.query_params)
+    paginator = AdminPagination()
+    page = paginator.paginate_queryset(reclamos, request)
+    response = paginator.get_paginated_response(ReclamoSerializer(page, many=True).data)
+    response.data['por_estado'] = reclamos_por_estado()
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@leer_de_replica
+def admin_reclamos_buscar(request):
+    """Búsqueda de texto (?q=) en nombre, email y mensaje de los reclamos, por relevancia y paginada."""
+    q = request.query_params.get('q', '').strip()
+    if not q:
+        return Response({'error': 'Debe indicar el texto a buscar en q.'}, status=status.HTTP_400_BAD_REQUEST)
+    reclamos = filtrar_reclamos(Reclamo.objects.all(), {'estado': request.query_params.get('estado')})
+    paginator = BusquedaPagination()
+    page = paginator.paginate_queryset(buscar(reclamos, q), request)
+    return paginator.get_paginated_response(ReclamoSerializer(page, many=True).data)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@leer_de_replica
+def admin_metrics(request):
+    """
+    Métricas del panel de administración: totales y los últimos ?ultimos= (5 por
+    defecto, máximo 50) usuarios y reclamos, con consultas que usan índices.
+    """
+    try:
+        ultimos = min(max(int(request.query_params.get('ultimos', 5)), 0), 50)
+    except ValueError:
+        return Response({'error': 'ultimos debe ser un número.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    User = get_user_model()
+    por_estado = reclamos_por_estado()
+    return Response({
+        'clientes': User.objects.count(),
+        'empresas': Empresa.objects.count(),
+        'reclamos': sum(por_estado.values()),
+        'reclamos_por_estado': por_estado,
+        'ultimos_usuarios': UserAdminSerializer(User.objects.order_by('-id')[:ultimos], many=True).data,
+        'ultimos_reclamos': ReclamoSerializer(Reclamo.objects.order_by('-fecha', '-id')[:ultimos], many=True).data,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@leer_de_replica
+def admin_analytics(request):
+    """
+    Analítica global de la plataforma (todas las empresas): carros por estado,
+    ingresos por día y por mes (?desde=&hasta=), suscripciones activas por plan y
+    reclamos pendientes. Se lee de los resúmenes de `manage.py refresh_platform_stats`.
+    """
+    fechas = {}
+    for name in ('desde', 'hasta'):
+        value = request.query_params.get(name)
+        try:
+            fechas[name] = parse_date(value) if value else None
+        except ValueError:
+            fechas[name] = None
+        if value and fechas[name] is None:
+            return Response({'error': f'{name}: formato de fecha inválido, use AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(analitica_plataforma(**fechas))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_response
 def get_my_customer_id(request):
     customer = Customer.objects.filter(user=request.user).first()
     if not customer or not customer.culqi_id:
@@ -765,3 +1045,75 @@ def admin_responder_reclamo(request, pk):
         reclamo.estado = estado
     reclamo.save()
     return Response(ReclamoSerializer(reclamo).data)
+
+@api_view(['POST'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def culqi_webhook(request):
+    """
+    Recibe los eventos de Culqi. Solo los guarda en CulqiEvent y responde de
+    inmediato; `manage.py process_culqi_events` aplica en lotes los de
+    suscripciones, tarjetas y customers (los demás, como los cargos, quedan
+    registrados). Los eventos repetidos (mismo id) se ignoran.
+    """
+    if not webhook_autorizado(request):
+        return Response({'error': 'Credenciales inválidas'}, status=status.HTTP_401_UNAUTHORIZED)
+    try:
+        evento = leer_evento(request.data)
+    except ValueError as e:
+        logger.error(f"Evento de Culqi inválido: {e}")
+        return Response({'error': 'Evento inválido'}, status=status.HTTP_400_BAD_REQUEST)
+    registrar_evento(evento)
+    return Response({'received': True}, status=status.HTTP_200_OK)
+
+
+async def _usuario_de_token(request):
+    # Solo la cabecera: el token de acceso no se acepta en la URL (queda en logs e historial)
+    scheme, _, key = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'token' or not key:
+        return None
+    try:
+        user, _ = await aautenticar_token(key)
+    except AuthenticationFailed:
+        return None
+    return user
+
+
+async def eventos_empresa(request, pk):
+    """
+    Cambios de los carros de la empresa en tiempo real (Server-Sent Events):
+    {"tipo": "creado" | "actualizado" | "eliminado" | "resincronizar", "id": ...}.
+    "actualizado" trae solo los campos que cambiaron en "cambios" (y "estado_anterior"
+    si cambió el estado). Con ?carro=<id> solo llegan los eventos de ese carro.
+    Se autentica con la cabecera Authorization o, desde el navegador, con
+    ?ticket= (POST /api/empresas/<id>/eventos/ticket/).
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Los eventos en tiempo real requieren el servidor ASGI (backend.asgi)'}, status=501)
+    ticket = request.GET.get('ticket')
+    if ticket is not None:
+        # El acceso a la empresa ya se comprobó al emitir el ticket
+        if leer_ticket(ticket, pk) is None:
+            return JsonResponse({'error': 'Ticket inválido o vencido'}, status=401)
+    else:
+        usuario = await _usuario_de_token(request)
+        if usuario is None:
+            return JsonResponse({'error': 'Token inválido'}, status=401)
+        empresas = Empresa.objects.filter(pk=pk)
+        if not usuario.is_staff:
+            empresas = empresas.filter(usuario=usuario)
+        if not await empresas.aexists():
+            return JsonResponse({'error': 'Empresa no encontrada'}, status=404)
+    carro_id = request.GET.get('carro')
+    if carro_id is not None and not carro_id.isdigit():
+        return JsonResponse({'error': 'carro debe ser un id'}, status=400)
+
+    response = StreamingHttpResponse(
+        stream_sse(canal_empresa(pk), int(carro_id) if carro_id else None), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Que nginx no acumule el stream en su buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
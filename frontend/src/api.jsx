@@ -27,13 +27,47 @@ api.interceptors.request.use(
   }
 );
 
+// Con tokens firmados el de acceso dura pocos minutos: se pide otro con el de
+// refresco (que también cambia). Una sola renovación a la vez para todas las solicitudes.
+let refreshing = null;
+
+export const refreshAccessToken = () => {
+  if (!refreshing) {
+    const user = JSON.parse(localStorage.getItem('user') || 'null');
+    if (!user?.refresh) {
+      return Promise.reject(new Error('Sin token de refresco'));
+    }
+    refreshing = axios
+      .post(`${api.defaults.baseURL}/refresh_token`, { refresh: user.refresh })
+      .then(({ data }) => {
+        localStorage.setItem('user', JSON.stringify({ ...user, token: data.token, refresh: data.refresh }));
+        return data.token;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 // Interceptor para manejar respuestas y errores de autenticación
 api.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
     if (error.response && error.response.status === 401) {
+      const config = error.config;
+      if (!config._retried) {
+        try {
+          const token = await refreshAccessToken();
+          config._retried = true;
+          config.headers.Authorization = `Token ${token}`;
+          return api(config);
+        } catch {
+          // Sin refresco o ya no vale: hay que volver a iniciar sesión
+        }
+      }
       // Token inválido o expirado
       localStorage.removeItem('user');
       localStorage.removeItem('token');
@@ -24,9 +24,50 @@ const AddCar = () => {
   const [showModelPicker, setShowModelPicker] = useState(false);
   const [customBrand, setCustomBrand] = useState('');
   const [customModel, setCustomModel] = useState('');
+  const [placaSugerencias, setPlacaSugerencias] = useState([]);
+  const [historial, setHistorial] = useState(null);
   const navigate = useNavigate();
   const { companyId } = useParams();
 
+  // Autocompletado de placas de clientes que ya vinieron
+  useEffect(() => {
+    if (formData.placa.replace(/-/g, '').length < 2) {
+      setPlacaSugerencias([]);
+      return;
+    }
+    const timeout = setTimeout(async () => {
+      try {
+        const response = await api.get('/api/carros/placas/', { params: { empresa: companyId, q: formData.placa, limite: 5 } });
+        setPlacaSugerencias(response.data.resultados.filter(sugerencia => sugerencia.placa !== formData.placa));
+      } catch (error) {
+        console.error('Error fetching plates:', error);
+      }
+    }, 150);
+    return () => clearTimeout(timeout);
+  }, [formData.placa, companyId]);
+
+  const seleccionarPlaca = async (placa) => {
+    setPlacaSugerencias([]);
+    setFormData(prevState => ({ ...prevState, placa }));
+    try {
+      const response = await api.get(`/api/carros/historial/${placa}/`, { params: { empresa: companyId } });
+      setHistorial(response.data);
+      const ultimo = response.data.ultimo_carro;
+      if (ultimo) {
+        // Solo se completan los campos que el usuario todavía no llenó
+        setFormData(prevState => ({
+          ...prevState,
+          marca: prevState.marca || ultimo.marca || '',
+          modelo: prevState.modelo || ultimo.modelo || '',
+          color: prevState.color || ultimo.color || '',
+          numero_telefono: prevState.numero_telefono || ultimo.numero_telefono || '',
+        }));
+      }
+    } catch (error) {
+      console.error('Error fetching plate history:', error);
+    }
+  };
+
   // Datos predefinidos
   const colors = [
     { name: 'Blanco', value: 'blanco', hex: '#FFFFFF', icon: '⚪' },
@@ -270,16 +311,37 @@ const AddCar = () => {
           <form onSubmit={handleSubmit} className="space-y-6" encType="multipart/form-data">
             <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
               {/* Placa */}
-              <InputField
-                label="Placa"
-                name="placa"
-                type="text"
-                placeholder="ABC123 (se formatea automáticamente)"
-                value={formData.placa}
-                onChange={handleChange}
-                required
-                icon={<Tag className="text-red-400" size={18} />}
-              />
+              <div className="relative">
+                <InputField
+                  label="Placa"
+                  name="placa"
+                  type="text"
+                  placeholder="ABC123 (se formatea automáticamente)"
+                  value={formData.placa}
+                  onChange={handleChange}
+                  required
+                  icon={<Tag className="text-red-400" size={18} />}
+                />
+                {placaSugerencias.length > 0 && (
+                  <div className="absolute z-10 w-full mt-1 bg-white border border-red-200 rounded-xl shadow-lg overflow-hidden">
+                    {placaSugerencias.map(sugerencia => (
+                      <button
+                        key={sugerencia.placa_normalizada}
+                        type="button"
+                        onClick={() => seleccionarPlaca(sugerencia.placa)}
+                        className="w-full text-left px-4 py-2 font-mono hover:bg-red-50"
+                      >
+                        {sugerencia.placa}
+                      </button>
+                    ))}
+                  </div>
+                )}
+                {historial && historial.visitas > 0 && (
+                  <p className="mt-2 text-sm text-gray-600">
+                    Cliente frecuente: {historial.visitas} visitas, S/ {historial.gasto_total.toFixed(2)} en total
+                  </p>
+                )}
+              </div>
 
               {/* Marca con selector */}
               <div className="relative">
@@ -19,18 +19,14 @@ const AdminDashboardMetrics = () => {
   useEffect(() => {
     const fetchMetrics = async () => {
       try {
-        const [usersRes, reclamosRes, empresasRes] = await Promise.all([
-          api.get('/api/admin/users/'),
-          api.get('/api/admin/reclamos/'),
-          api.get('/api/empresas/'),
-        ]);
+        const res = await api.get('/api/admin/metrics/?ultimos=5');
         setMetrics({
-          clientes: usersRes.data.length,
-          reclamos: reclamosRes.data.length,
-          empresas: empresasRes.data.length,
+          clientes: res.data.clientes,
+          reclamos: res.data.reclamos,
+          empresas: res.data.empresas,
         });
-        setUltimosUsuarios(usersRes.data.slice(-5).reverse());
-        setUltimosReclamos(reclamosRes.data.slice(0, 5));
+        setUltimosUsuarios(res.data.ultimos_usuarios);
+        setUltimosReclamos(res.data.ultimos_reclamos);
       } catch {
         // ...
       } finally {
@@ -24,42 +24,48 @@ const AdminReclamosList = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [filterEstado, setFilterEstado] = useState('all');
   const [selectedReclamo, setSelectedReclamo] = useState(null);
+  const [page, setPage] = useState(1);
+  const [totalReclamos, setTotalReclamos] = useState(0);
+  const [porEstado, setPorEstado] = useState({ pendiente: 0, atendido: 0, cerrado: 0 });
+  const [hasNext, setHasNext] = useState(false);
+  const [hasPrevious, setHasPrevious] = useState(false);
 
+  // La búsqueda, el filtro y la paginación se hacen en el servidor
   useEffect(() => {
     const fetchReclamos = async () => {
+      setLoading(true);
       try {
-        const res = await api.get('/api/admin/reclamos/');
-        setReclamos(res.data);
+        const params = new URLSearchParams({ page, estado: filterEstado });
+        if (searchTerm) params.append('q', searchTerm);
+        const res = await api.get(`/api/admin/reclamos/?${params.toString()}`);
+        setReclamos(res.data.results);
+        setTotalReclamos(res.data.count);
+        setPorEstado(res.data.por_estado);
+        setHasNext(Boolean(res.data.next));
+        setHasPrevious(Boolean(res.data.previous));
+        setError('');
       } catch (err) {
         setError('No se pudieron cargar los reclamos.');
       } finally {
         setLoading(false);
       }
     };
-    fetchReclamos();
-  }, []);
+    // Espera a que el usuario deje de escribir antes de buscar
+    const timeout = setTimeout(fetchReclamos, 300);
+    return () => clearTimeout(timeout);
+  }, [page, searchTerm, filterEstado]);
 
-  const filteredReclamos = reclamos.filter(reclamo => {
-    const matchesSearch = reclamo.nombre?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         reclamo.email?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         reclamo.mensaje?.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesFilter = filterEstado === 'all' || reclamo.estado === filterEstado;
-    
-    return matchesSearch && matchesFilter;
-  });
+  useEffect(() => {
+    setPage(1);
+  }, [searchTerm, filterEstado]);
 
-  const getEstadisticas = () => {
-    const total = reclamos.length;
-    const pendientes = reclamos.filter(r => r.estado === 'pendiente').length;
-    const atendidos = reclamos.filter(r => r.estado === 'atendido').length;
-    const cerrados = reclamos.filter(r => r.estado === 'cerrado').length;
-    
-    return { total, pendientes, atendidos, cerrados };
+  const stats = {
+    total: porEstado.pendiente + porEstado.atendido + porEstado.cerrado,
+    pendientes: porEstado.pendiente,
+    atendidos: porEstado.atendido,
+    cerrados: porEstado.cerrado,
   };
 
-  const stats = getEstadisticas();
-
   return (
     <div className="min-h-screen bg-gradient-to-br from-white via-red-50 to-red-100 p-6">
       <div className="max-w-7xl mx-auto">
@@ -184,7 +190,7 @@ const AdminReclamosList = () => {
             {/* Estadísticas rápidas */}
             <div className="flex items-center justify-center">
               <div className="text-center">
-                <div className="text-2xl font-bold text-red-700">{filteredReclamos.length}</div>
+                <div className="text-2xl font-bold text-red-700">{totalReclamos}</div>
                 <div className="text-sm text-gray-600">reclamos encontrados</div>
               </div>
             </div>
@@ -227,7 +233,7 @@ const AdminReclamosList = () => {
                 </thead>
                 <tbody>
                   <AnimatePresence>
-                    {filteredReclamos.map((reclamo, index) => (
+                    {reclamos.map((reclamo, index) => (
                       <motion.tr
                         key={reclamo.id}
                         initial={{ opacity: 0, y: 20 }}
@@ -323,7 +329,7 @@ const AdminReclamosList = () => {
         </motion.div>
 
         {/* Paginación */}
-        {filteredReclamos.length > 0 && (
+        {reclamos.length > 0 && (
           <motion.div
             initial={{ opacity: 0, y: 20 }}
             animate={{ opacity: 1, y: 0 }}
@@ -331,20 +337,24 @@ const AdminReclamosList = () => {
             className="mt-8 flex items-center justify-between bg-white/60 backdrop-blur-xl rounded-3xl p-6 border border-red-200 shadow-2xl"
           >
             <div className="text-gray-600">
-              Mostrando {filteredReclamos.length} de {reclamos.length} reclamos
+              Mostrando {reclamos.length} de {totalReclamos} reclamos (página {page})
             </div>
             <div className="flex items-center space-x-2">
               <motion.button
                 whileHover={{ scale: 1.05 }}
                 whileTap={{ scale: 0.95 }}
-                className="px-4 py-2 bg-white/80 backdrop-blur-sm border border-red-200 text-red-700 rounded-xl font-semibold hover:bg-red-50 transition-all duration-300"
+                disabled={!hasPrevious}
+                onClick={() => setPage(p => p - 1)}
+                className="px-4 py-2 bg-white/80 backdrop-blur-sm border border-red-200 text-red-700 rounded-xl font-semibold hover:bg-red-50 transition-all duration-300 disabled:opacity-50"
               >
                 Anterior
               </motion.button>
               <motion.button
                 whileHover={{ scale: 1.05 }}
                 whileTap={{ scale: 0.95 }}
-                className="px-4 py-2 bg-gradient-to-r from-red-600 to-red-700 text-white rounded-xl font-semibold shadow-lg hover:shadow-xl transition-all duration-300"
+                disabled={!hasNext}
+                onClick={() => setPage(p => p + 1)}
+                className="px-4 py-2 bg-gradient-to-r from-red-600 to-red-700 text-white rounded-xl font-semibold shadow-lg hover:shadow-xl transition-all duration-300 disabled:opacity-50"
               >
                 Siguiente
               </motion.button>
@@ -357,6 +367,14 @@ const AdminReclamosList = () => {
           <AdminReclamoResponder 
             reclamo={reclamoResponder} 
             onResponded={updated => {
+              const anterior = reclamos.find(x => x.id === updated.id);
+              if (anterior && anterior.estado !== updated.estado) {
+                setPorEstado(prev => ({
+                  ...prev,
+                  [anterior.estado]: prev[anterior.estado] - 1,
+                  [updated.estado]: prev[updated.estado] + 1,
+                }));
+              }
               setReclamos(reclamos.map(x => x.id === updated.id ? updated : x));
               setReclamoResponder(null);
             }} 
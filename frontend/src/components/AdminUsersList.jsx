@@ -10,34 +10,38 @@ const AdminUsersList = () => {
   const [searchTerm, setSearchTerm] = useState('');
   const [filterRole, setFilterRole] = useState('all');
   const [selectedUser, setSelectedUser] = useState(null);
+  const [page, setPage] = useState(1);
+  const [totalUsers, setTotalUsers] = useState(0);
+  const [hasNext, setHasNext] = useState(false);
+  const [hasPrevious, setHasPrevious] = useState(false);
 
+  // La búsqueda, el filtro y la paginación se hacen en el servidor
   useEffect(() => {
     const fetchUsers = async () => {
+      setLoading(true);
       try {
-        const res = await api.get('/api/admin/users/');
-        setUsers(res.data);
+        const params = new URLSearchParams({ page, rol: filterRole });
+        if (searchTerm) params.append('q', searchTerm);
+        const res = await api.get(`/api/admin/users/?${params.toString()}`);
+        setUsers(res.data.results);
+        setTotalUsers(res.data.count);
+        setHasNext(Boolean(res.data.next));
+        setHasPrevious(Boolean(res.data.previous));
+        setError('');
       } catch (err) {
         setError('No se pudieron cargar los usuarios.');
       } finally {
         setLoading(false);
       }
     };
-    fetchUsers();
-  }, []);
+    // Espera a que el usuario deje de escribir antes de buscar
+    const timeout = setTimeout(fetchUsers, 300);
+    return () => clearTimeout(timeout);
+  }, [page, searchTerm, filterRole]);
 
-  const filteredUsers = users.filter(user => {
-    const matchesSearch = user.first_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         user.last_name?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         user.email?.toLowerCase().includes(searchTerm.toLowerCase()) ||
-                         user.username?.toLowerCase().includes(searchTerm.toLowerCase());
-    
-    const matchesFilter = filterRole === 'all' || 
-                         (filterRole === 'staff' && user.is_staff) ||
-                         (filterRole === 'superuser' && user.is_superuser) ||
-                         (filterRole === 'regular' && !user.is_staff && !user.is_superuser);
-    
-    return matchesSearch && matchesFilter;
-  });
+  useEffect(() => {
+    setPage(1);
+  }, [searchTerm, filterRole]);
 
   const getRoleBadge = (user) => {
     if (user.is_superuser) {
@@ -164,7 +168,7 @@ const AdminUsersList = () => {
             {/* Estadísticas rápidas */}
             <div className="flex items-center justify-center">
               <div className="text-center">
-                <div className="text-2xl font-bold text-red-700">{filteredUsers.length}</div>
+                <div className="text-2xl font-bold text-red-700">{totalUsers}</div>
                 <div className="text-sm text-gray-600">usuarios encontrados</div>
               </div>
             </div>
@@ -206,7 +210,7 @@ const AdminUsersList = () => {
                 </thead>
                 <tbody>
                   <AnimatePresence>
-                    {filteredUsers.map((user, index) => (
+                    {users.map((user, index) => (
                       <motion.tr
                         key={user.id}
                         initial={{ opacity: 0, y: 20 }}
@@ -284,7 +288,7 @@ const AdminUsersList = () => {
         </motion.div>
 
         {/* Paginación */}
-        {filteredUsers.length > 0 && (
+        {users.length > 0 && (
           <motion.div
             initial={{ opacity: 0, y: 20 }}
             animate={{ opacity: 1, y: 0 }}
@@ -292,20 +296,24 @@ const AdminUsersList = () => {
             className="mt-8 flex items-center justify-between bg-white/60 backdrop-blur-xl rounded-3xl p-6 border border-red-200 shadow-2xl"
           >
             <div className="text-gray-600">
-              Mostrando {filteredUsers.length} de {users.length} usuarios
+              Mostrando {users.length} de {totalUsers} usuarios (página {page})
             </div>
             <div className="flex items-center space-x-2">
               <motion.button
                 whileHover={{ scale: 1.05 }}
                 whileTap={{ scale: 0.95 }}
-                className="px-4 py-2 bg-white/80 backdrop-blur-sm border border-red-200 text-red-700 rounded-xl font-semibold hover:bg-red-50 transition-all duration-300"
+                disabled={!hasPrevious}
+                onClick={() => setPage(p => p - 1)}
+                className="px-4 py-2 bg-white/80 backdrop-blur-sm border border-red-200 text-red-700 rounded-xl font-semibold hover:bg-red-50 transition-all duration-300 disabled:opacity-50"
               >
                 Anterior
               </motion.button>
               <motion.button
                 whileHover={{ scale: 1.05 }}
                 whileTap={{ scale: 0.95 }}
-                className="px-4 py-2 bg-gradient-to-r from-red-600 to-red-700 text-white rounded-xl font-semibold shadow-lg hover:shadow-xl transition-all duration-300"
+                disabled={!hasNext}
+                onClick={() => setPage(p => p + 1)}
+                className="px-4 py-2 bg-gradient-to-r from-red-600 to-red-700 text-white rounded-xl font-semibold shadow-lg hover:shadow-xl transition-all duration-300 disabled:opacity-50"
               >
                 Siguiente
               </motion.button>
@@ -3,6 +3,7 @@ import { useParams, Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { Car, ArrowLeft, Calendar, Phone, Palette, DollarSign, MapPin, Camera } from 'lucide-react';
 import api from '../api';
+import { subscribeToCarEvents } from '../utils/carEvents';
 
 const CarDetail = () => {
   const { carId, companyId } = useParams();
@@ -26,6 +27,14 @@ const CarDetail = () => {
     fetchCarDetails();
   }, [carId]);
 
+  useEffect(() => {
+    return subscribeToCarEvents(companyId, (event) => {
+      if (event.tipo === 'actualizado') {
+        setCar(prevCar => (prevCar ? { ...prevCar, ...event.cambios } : prevCar));
+      }
+    }, carId);
+  }, [companyId, carId]);
+
   const getStatusColor = (status) => {
     switch(status) {
       case 'espera': return 'bg-yellow-200 text-yellow-800';
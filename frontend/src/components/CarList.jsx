@@ -1,56 +1,115 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { Link, useParams, useNavigate } from 'react-router-dom';
 import { motion, AnimatePresence, useMotionValue, useTransform, useSpring } from 'framer-motion';
 import { Car, Plus, Edit, Trash2, AlertCircle, Search, Grid, List, Camera, Phone, Palette, Calendar, Clock, Zap, Star, Target, TrendingUp, DollarSign } from 'lucide-react';
 import api from '../api';
+import { applyCarEvent, subscribeToCarEvents } from '../utils/carEvents';
+
+// Misma normalización que el backend (normalizar_placa): 'abc-123' y 'ABC123' son iguales
+const normalizePlate = (plate) => (plate || '').toUpperCase().replace(/[^A-Z0-9]/g, '');
 
 const CarList = () => {
   const [cars, setCars] = useState([]);
-  const [filteredCars, setFilteredCars] = useState([]);
   const [error, setError] = useState('');
   const [isLoading, setIsLoading] = useState(true);
+  const [nextPage, setNextPage] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [searchTerm, setSearchTerm] = useState('');
+  const [plateFilter, setPlateFilter] = useState('');
   const [filterStatus, setFilterStatus] = useState('all');
+  const [dateFrom, setDateFrom] = useState('');
+  const [dateTo, setDateTo] = useState('');
   const [viewMode, setViewMode] = useState('grid');
   const [sortBy, setSortBy] = useState('date');
   const [sortOrder, setSortOrder] = useState('desc');
   const { companyId } = useParams();
   const navigate = useNavigate();
+  const filtersRef = useRef({});
+
+  // La placa se envía al dejar de escribir, no en cada tecla
+  useEffect(() => {
+    const timer = setTimeout(() => setPlateFilter(normalizePlate(searchTerm)), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  // Los filtros los aplica el servidor (?estado=, ?placa=, ?llegada_desde=, ?llegada_hasta=),
+  // así se filtra toda la empresa y no solo las páginas ya cargadas
+  const carsUrl = () => {
+    const params = new URLSearchParams({ empresa: companyId });
+    if (filterStatus !== 'all') params.set('estado', filterStatus);
+    if (plateFilter) params.set('placa', plateFilter);
+    if (dateFrom) params.set('llegada_desde', dateFrom);
+    if (dateTo) params.set('llegada_hasta', dateTo);
+    return `/api/carros/?${params}`;
+  };
 
+  // Al cambiar un filtro se vuelve a la primera página: el cursor anterior es de otra consulta
   useEffect(() => {
+    filtersRef.current = { filterStatus, plateFilter, url: carsUrl() };
+    let ignore = false;
     const fetchCars = async () => {
+      setIsLoading(true);
+      setNextPage(null);
       try {
-        const response = await api.get(`/api/carros/?empresa=${companyId}`);
-        setCars(response.data);
-        setFilteredCars(response.data);
+        const response = await api.get(carsUrl());
+        if (ignore) return;
+        setCars(response.data.results);
+        setNextPage(response.data.next);
       } catch (error) {
+        if (ignore) return;
         console.error("Error fetching cars:", error);
         setError('No se pudieron cargar los carros. Por favor, inténtalo de nuevo.');
       } finally {
-        setIsLoading(false);
+        if (!ignore) setIsLoading(false);
       }
     };
 
     fetchCars();
-  }, [companyId]);
+    return () => {
+      ignore = true;
+    };
+  }, [companyId, filterStatus, plateFilter, dateFrom, dateTo]);
+
+  // Los eventos llegan para todos los carros de la empresa: solo se muestran los
+  // que cumplen el estado y la placa filtrados
+  const matchesFilters = (car) => {
+    const { filterStatus, plateFilter } = filtersRef.current;
+    return (filterStatus === 'all' || car.estado === filterStatus) &&
+      (!plateFilter || normalizePlate(car.placa).startsWith(plateFilter));
+  };
 
+  // Cambios de estado, altas y bajas llegan por SSE sin volver a pedir la lista
   useEffect(() => {
-    let results = cars.filter(car =>
-      (car.marca.toLowerCase().includes(searchTerm.toLowerCase()) ||
-       car.modelo.toLowerCase().includes(searchTerm.toLowerCase()) ||
-       car.placa.toLowerCase().includes(searchTerm.toLowerCase()) ||
-       (car.color && car.color.toLowerCase().includes(searchTerm.toLowerCase())) ||
-       (car.numero_telefono && car.numero_telefono.includes(searchTerm))) &&
-      (filterStatus === 'all' || car.estado === filterStatus)
-    );
-
-    // Ordenar resultados
-    results = sortCars(results, sortBy, sortOrder);
-    
-    setFilteredCars(results);
-  }, [searchTerm, filterStatus, sortBy, sortOrder, cars]);
-
+    return subscribeToCarEvents(companyId, (event) => {
+      if (event.tipo === 'resincronizar') {
+        api.get(filtersRef.current.url).then(response => {
+          setCars(response.data.results);
+          setNextPage(response.data.next);
+        }).catch(error => console.error("Error fetching cars:", error));
+        return;
+      }
+      setCars(prevCars => applyCarEvent(prevCars, event).filter(matchesFilters));
+    });
+  }, [companyId]);
 
+  const loadMoreCars = async () => {
+    if (!nextPage) return;
+    setIsLoadingMore(true);
+    const url = filtersRef.current.url;
+    try {
+      // next ya trae los filtros y el cursor
+      const response = await api.get(nextPage);
+      // Si cambiaron los filtros mientras cargaba, la página es de otra consulta
+      if (filtersRef.current.url !== url) return;
+      setCars(prevCars => [...prevCars, ...response.data.results]);
+      setNextPage(response.data.next);
+    } catch (error) {
+      console.error("Error fetching cars:", error);
+      setError('No se pudieron cargar más carros. Por favor, inténtalo de nuevo.');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
 
   const sortCars = (cars, sortBy, sortOrder) => {
     return [...cars].sort((a, b) => {
@@ -86,6 +145,9 @@ const CarList = () => {
     });
   };
 
+  // El orden se aplica sobre las páginas ya cargadas
+  const filteredCars = sortCars(cars, sortBy, sortOrder);
+
   const handleDelete = async (carId) => {
     if (window.confirm('¿Estás seguro de que quieres eliminar este carro?')) {
       try {
@@ -276,7 +338,7 @@ const CarList = () => {
           <div className="relative h-56 overflow-hidden">
             {car.foto ? (
               <motion.img
-                src={car.foto}
+                src={car.foto_miniaturas?.['512'] || car.foto}
                 alt={`${car.marca} ${car.modelo}`}
                 className="w-full h-full object-cover"
                 whileHover={{ scale: 1.1 }}
@@ -420,7 +482,7 @@ const CarList = () => {
         >
           {car.foto ? (
             <img
-              src={car.foto}
+              src={car.foto_miniaturas?.['128'] || car.foto}
               alt={`${car.marca} ${car.modelo}`}
               className="w-full h-full object-cover"
             />
@@ -577,7 +639,7 @@ const CarList = () => {
               <Search className="absolute left-4 top-1/2 transform -translate-y-1/2 text-red-400" size={20} />
               <input
                 type="text"
-                placeholder="Buscar por marca, modelo, placa, color o teléfono..."
+                placeholder="Buscar por placa..."
                 className="w-full pl-12 pr-4 py-4 rounded-2xl border-2 border-red-500/30 focus:outline-none focus:ring-4 focus:ring-red-500/20 focus:border-red-500 transition-all duration-300 bg-white/80 backdrop-blur-xl text-gray-800 placeholder-gray-500"
                 value={searchTerm}
                 onChange={(e) => setSearchTerm(e.target.value)}
@@ -637,6 +699,28 @@ const CarList = () => {
                   </motion.button>
                 ))}
               </div>
+
+              {/* Rango de fechas de llegada */}
+              <div className="flex items-center space-x-2">
+                <Calendar size={18} className="text-red-400" />
+                <input
+                  type="date"
+                  aria-label="Llegada desde"
+                  className="px-3 py-2 rounded-xl border border-red-200/50 bg-white/80 text-sm text-gray-700 focus:outline-none focus:border-red-500"
+                  value={dateFrom}
+                  max={dateTo || undefined}
+                  onChange={(e) => setDateFrom(e.target.value)}
+                />
+                <span className="text-gray-500 text-sm">a</span>
+                <input
+                  type="date"
+                  aria-label="Llegada hasta"
+                  className="px-3 py-2 rounded-xl border border-red-200/50 bg-white/80 text-sm text-gray-700 focus:outline-none focus:border-red-500"
+                  value={dateTo}
+                  min={dateFrom || undefined}
+                  onChange={(e) => setDateTo(e.target.value)}
+                />
+              </div>
             </motion.div>
           </div>
 
@@ -693,6 +777,17 @@ const CarList = () => {
                   )}
                 </AnimatePresence>
               )}
+              {nextPage && (
+                <div className="flex justify-center mt-10">
+                  <button
+                    onClick={loadMoreCars}
+                    disabled={isLoadingMore}
+                    className="px-8 py-3 bg-gradient-to-r from-red-600 to-red-700 text-white font-semibold rounded-2xl hover:from-red-700 hover:to-red-800 transition-all duration-300 shadow-lg disabled:opacity-60"
+                  >
+                    {isLoadingMore ? 'Cargando...' : 'Cargar más carros'}
+                  </button>
+                </div>
+              )}
             </>
           )}
         </div>
@@ -47,8 +47,9 @@ const CompanyList = () => {
     
     setLoadingStats(true);
     try {
-      const response = await api.get(`/api/empresas/${company.id}/estadisticas/`);
-      setStatistics(response.data);
+      // Endpoint por lotes (?ids=1,2,3): una sola consulta para todas las empresas pedidas
+      const response = await api.get('/api/empresas/estadisticas/', { params: { ids: company.id } });
+      setStatistics(response.data[company.id]);
     } catch (error) {
       console.error('Error al cargar estadísticas:', error);
       setError('No se pudieron cargar las estadísticas.');
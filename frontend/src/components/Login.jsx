@@ -43,7 +43,7 @@ const Login = () => {
     
     try {
       const response = await axios.post('http://localhost:8000/login', { username, password });
-      const userData = { ...response.data.user, token: response.data.token };
+      const userData = { ...response.data.user, token: response.data.token, refresh: response.data.refresh };
       
       login(userData);
       
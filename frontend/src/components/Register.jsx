@@ -65,7 +65,7 @@ const Register = () => {
     
     try {
       const response = await axios.post('http://localhost:8000/signup', { username, email, password });
-      login({ ...response.data.user, token: response.data.token });
+      login({ ...response.data.user, token: response.data.token, refresh: response.data.refresh });
       navigate('/');
     } catch (error) {
       setError('El registro falló. Por favor, inténtalo de nuevo.');
@@ -1,4 +1,6 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
+import api from '../api';
+import { getToken } from '../utils/auth';
 
 const AuthContext = createContext();
 
@@ -26,6 +28,15 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    // Invalida el token en el servidor; el header va explícito porque el
+    // interceptor lo leería de localStorage cuando ya se borró. Se lee de
+    // localStorage porque el interceptor pudo haberlo renovado.
+    const token = getToken();
+    if (token) {
+      api
+        .post('/logout', null, { headers: { Authorization: `Token ${token}` }, _retried: true })
+        .catch(() => {});
+    }
     setUser(null);
     localStorage.removeItem('user');
     localStorage.removeItem('token'); // Limpiar también el token por si acaso
@@ -0,0 +1,74 @@
+import api from '../api';
+import { getToken } from './auth';
+
+// Cambios de los carros de una empresa en tiempo real (SSE).
+// Devuelve una función para cerrar la conexión.
+export const subscribeToCarEvents = (companyId, onEvent, carId = null) => {
+  if (!getToken() || typeof EventSource === 'undefined') {
+    return () => {};
+  }
+  let source = null;
+  let closed = false;
+
+  const open = (ticket) => {
+    // EventSource no envía cabeceras: en la URL va un ticket de corta duración,
+    // nunca el token de acceso
+    const params = new URLSearchParams({ ticket });
+    if (carId) {
+      params.set('carro', carId);
+    }
+    let opened = false;
+    source = new EventSource(`${api.defaults.baseURL}/api/empresas/${companyId}/eventos/?${params}`);
+    source.onopen = () => {
+      opened = true;
+    };
+    source.onmessage = (message) => {
+      try {
+        onEvent(JSON.parse(message.data));
+      } catch (error) {
+        console.error('Error parsing car event:', error);
+      }
+    };
+    // EventSource se reconecta solo, pero con la misma URL: si el ticket ya venció
+    // (401) se pide otro y se abre otra conexión. Si nunca llegó a conectarse
+    // (p. ej. el servidor no es ASGI, 501) se deja de intentar.
+    source.onerror = () => {
+      if (source.readyState !== EventSource.CLOSED) {
+        return;
+      }
+      source.close();
+      if (opened && !closed) {
+        connect();
+      }
+    };
+  };
+
+  // El POST pasa por el interceptor de api, que renueva el token de acceso si venció
+  const connect = () => {
+    api.post(`/api/empresas/${companyId}/eventos/ticket/`)
+      .then(({ data }) => !closed && open(data.ticket))
+      .catch((error) => console.error('Error opening car events:', error));
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    if (source) {
+      source.close();
+    }
+  };
+};
+
+// Aplica un evento a una lista de carros ya cargada
+export const applyCarEvent = (cars, event) => {
+  switch (event.tipo) {
+    case 'creado':
+      return cars.some(car => car.id === event.id) ? cars : [event.carro, ...cars];
+    case 'actualizado':
+      return cars.map(car => (car.id === event.id ? { ...car, ...event.cambios } : car));
+    case 'eliminado':
+      return cars.filter(car => car.id !== event.id);
+    default:
+      return cars;
+  }
+};